@@ -1,3 +1,4 @@
+from .models import load_model, get_pipeline, get_model_stats
 from .ngram import extract_ngrams
 from .vocabulary import *
 from .sec_tag import *
@@ -1,7 +1,9 @@
 import re
 import os
+import threading
 import traceback
 from enum import Enum
+from functools import lru_cache
 
 SCRIPT_DIR = os.path.dirname(__file__)
 
@@ -9,8 +11,17 @@ over_several_period_rule = re.compile(r"(within the last|in the last|for the pas
 for_the_past_period_rule = re.compile(r"(for the past|for the last|over the past|over the last|for)(\s+\d*(\.\d*)*|\s+(\w+)(\s+\w*)?(\s+\w*)?(\s+\w*)?(\s+\w*)?(\s+\w*)?)?(\s+weeks|\s+week|\s+months|\s+month|\s+years|\s+year)", re.IGNORECASE|re.MULTILINE)
 space_rule = r"[\s+]"
 negative_window = 4
+word_rule = re.compile(r"\w+")
+# rule text containing any of these is treated as a regex rather than a plain phrase
+rule_special_chars = re.compile(r"[.^$*+?{}\[\]\\|()]")
+scan_tags = ("[PREN]", "[FSTT]", "[ONEW]", "[POST]")
 all_terms = dict()
+all_rules = dict()
+# one alternation of all of a category's triggers, a sentence none of them match can skip the category's rules
+all_patterns = dict()
 inited = False
+# the triggers are loaded once and only read afterwards, the lock keeps threads from loading them at the same time
+init_lock = threading.Lock()
 
 def load_terms(key):
     try:
@@ -30,14 +41,87 @@ def context_init():
     print("Context init...")
     global inited
     global all_terms
+    with init_lock:
+        if not inited:
+            all_terms["negated"] = load_terms("negex")
+            all_terms["experiencier"] = load_terms("experiencer")
+            all_terms["historical"] = load_terms("history")
+            all_terms["hypothetical"] = load_terms("hypothetical")
+
+            for key, rules in all_terms.items():
+                # tuples, so the shared rules can't be changed by a caller
+                all_rules[key] = tuple(compile_rules(rules))
+                all_patterns[key] = compile_alternation(all_rules[key])
+
+            inited = True
+    return all_terms
+
+
+class ContextRule(object):
+
+    def __init__(self, rule: str):
+        self.rule = rule
+        rule_tokens = rule.strip().split('\t\t')
+        self.text = rule_tokens[0]
+        self.tag = rule_tokens[1].strip().split("[")[1]
+        self.regex = re.compile(r"\b(%s)\b" % self.text, re.IGNORECASE | re.MULTILINE)
+        if rule_special_chars.search(self.text):
+            self.words = None
+        else:
+            # a plain phrase can only match a sentence that contains each of its words
+            self.words = frozenset(w.casefold() for w in word_rule.findall(self.text)) or None
+
+    def may_match(self, sentence_words):
+        return self.words is None or self.words <= sentence_words
+
+    def __repr__(self):
+        return '%s(%s, %s)' % (self.__class__.__name__, self.text, self.tag)
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(rule: str):
+    return ContextRule(rule)
+
+
+def compile_rules(rules):
+    # longest rules first, same order as sorting the raw rule lines
+    return [compile_rule(rule) for rule in sorted(rules, key=len, reverse=True)]
+
+
+def compile_alternation(rules):
+    # matches where any of the rules' regexes would
+    if len(rules) == 0:
+        return None
+    return re.compile(r"\b(?:%s)\b" % '|'.join('(?:%s)' % r.text for r in rules), re.IGNORECASE | re.MULTILINE)
+
+
+def get_context_rules():
     if not inited:
-        all_terms["negated"] = load_terms("negex")
-        all_terms["experiencier"] = load_terms("experiencer")
-        all_terms["historical"] = load_terms("history")
-        all_terms["hypothetical"] = load_terms("hypothetical")
+        context_init()
+    return all_rules
+
+
+def get_context_patterns():
+    if not inited:
+        context_init()
+    return all_patterns
+
+
+def sentence_words(eval_sentence: str):
+    return frozenset(w.casefold() for w in word_rule.findall(eval_sentence))
 
-        inited = True
-    return all_terms
+
+@lru_cache(maxsize=4096)
+def term_words(expected_term: str):
+    # the words rewriting a sentence for expected_term can add to it: the term, joined into one token by
+    # build_eval_sentence, and the 'no' of the dash and future occurrence negations
+    return sentence_words(repr(expected_term).replace(" ", "_")) | sentence_words(expected_term) | {'no'}
+
+
+def build_eval_sentence(sentence: str, target_phrase: str):
+    target_replace = repr(target_phrase).replace(" ", "_")
+    eval_sentence = sentence.replace(target_phrase, target_replace)
+    return ".%s." % eval_sentence
 
 
 class ContextFeature(object):
@@ -101,94 +185,120 @@ def stop_trigger(ipt: str):
     return ipt.startswith("[CONJ]") or ipt.startswith("[PSEU]") or ipt.startswith("[POST]")  or ipt.startswith("[PREN]")  or ipt.startswith("[PREP]") or ipt.startswith("[POSP]") or ipt.startswith("[FSTT]") or ipt.startswith("[ONEW]")
   
 
-def run_individual_context(sentence: str, target_phrase: str, key: str, rules, phrase_regex):
+def scan_sentence(eval_sentence: str, sentence: str, target_phrase: str, key: str, phrase_regex):
     found = []
     custom_window = windows[key]
 
-    try:
-        target_replace = repr(target_phrase).replace(" ", "_")
-        eval_sentence = sentence.replace(target_phrase, target_replace)
-        eval_sentence = ".%s." % eval_sentence
+    sentence_tokens = eval_sentence.strip().split(' ')
+    matched_phrase = ''
+    sentence_tokens_length = len(sentence_tokens)
+    i = -1
+
+    for sentence_token in sentence_tokens:
+        i += 0
+        stripped = sentence_token.strip()
+        if stripped.startswith("[PREN]") or stripped.startswith("[FSTT]") or stripped.startswith("[ONEW]"):
+            j = i + 1
+            break_trigger = False
+            while j < sentence_tokens_length:
+                matched_phrase += (sentence_tokens[j] + " ")
+                if j >= (sentence_tokens_length - 1) or j > custom_window or stop_trigger(sentence_tokens[j].strip()):
+                    break_trigger = True
+
+                if break_trigger:
+                    phrase_regex_matches = re.finditer(phrase_regex, matched_phrase)
+                    if any(True for _ in phrase_regex_matches):
+                        found.append(ContextFeature(target_phrase, matched_phrase, sentence, eval_sentence,
+                                                    key))
+                        break_trigger = False
+                        matched_phrase = ''
+                j += 1
+
+        if stripped.startswith("[POST]") or stripped.startswith("[FSTT]"):
+            j = i - 1
+            break_trigger = False
+            while j >= 0:
+                matched_phrase = " " + sentence_tokens[j]
+                if j == 0 or j < (i - negative_window) or stop_trigger(sentence_tokens[j].strip()):
+                    break_trigger = True
+
+                if break_trigger:
+                    phrase_regex_matches = re.finditer(phrase_regex, matched_phrase)
+                    if any(True for _ in phrase_regex_matches):
+                        found.append(ContextFeature(target_phrase, matched_phrase, sentence, eval_sentence,
+                                                    key))
+                        break_trigger = False
+                        matched_phrase = ''
+                j -= 1
 
-        if key == "historical":
-            over_several_period_match = re.findall(over_several_period_rule, eval_sentence)
-            if any(True for _ in over_several_period_match):
-                rules.append("%s\t\t[CONJ]" % over_several_period_match[0][0].strip())
+    return found
+
+
+def get_period_rules(eval_sentence: str):
+    period_rules = []
+    over_several_period_match = re.findall(over_several_period_rule, eval_sentence)
+    if any(True for _ in over_several_period_match):
+        period_rules.append("%s\t\t[CONJ]" % over_several_period_match[0][0].strip())
+
+    for_the_past_period_match = re.findall(for_the_past_period_rule, eval_sentence)
+    if any(True for _ in for_the_past_period_match):
+        period_rules.append("%s\t\t[CONJ]" % for_the_past_period_match[0][0].strip())
+    return period_rules
+
+
+def run_individual_context(sentence: str, target_phrase: str, key: str, rules, phrase_regex, words=None,
+                           first_only=False, pattern=None):
+    # words may be any superset of the words of the evaluated sentence, rules whose words aren't all in it are skipped.
+    # pattern is the alternation of rules (see compile_alternation), when it doesn't match none of them are run.
+    found = []
+
+    try:
+        if rules and not isinstance(rules[0], ContextRule):
+            rules = compile_rules(rules)
 
-            for_the_past_period_match = re.findall(for_the_past_period_rule, eval_sentence)
-            if any(True for _ in for_the_past_period_match):
-                rules.append("%s\t\t[CONJ]" % for_the_past_period_match[0][0].strip())
+        eval_sentence = build_eval_sentence(sentence, target_phrase)
+        if words is None:
+            words = sentence_words(eval_sentence)
+        if pattern is not None and not pattern.search(eval_sentence):
+            # the rules don't change the sentence until one matches, so none of them can
+            rules = tuple()
 
-        rules.sort(key=len, reverse=True)
+        if key == "historical":
+            # period rules only apply to this sentence, so they are merged into a copy of the rules
+            period_rules = [compile_rule(r) for r in get_period_rules(eval_sentence)]
+            if period_rules:
+                rules = sorted(list(rules) + period_rules, key=lambda r: len(r.rule), reverse=True)
 
         rule_match = 0
         for rule in rules:
-            rule_tokens = rule.strip().split('\t\t')
-            rule_text = rule_tokens[0]
-
-            rule_builder_regex = re.compile(r"\b(%s)\b" % rule_text, re.IGNORECASE | re.MULTILINE)
-            all_matched = re.finditer(rule_builder_regex, eval_sentence)
-            if all_matched:
-                prev_end = 0
-                new_eval_sentence = ''
-                for matched in all_matched:
-                    start = matched.start()
-                    end   = matched.end()
-                    tokens = rule_tokens[1].strip().split("[")
-                    match_text = str(matched.group(0)).strip().replace(" ", "_")
-                    repl = "[%s%s[/%s" % (tokens[1], match_text, tokens[1])
-                    rule_match += 1
-                    new_eval_sentence += eval_sentence[prev_end:start]
-                    new_eval_sentence += repl
-                    prev_end = end
-                new_eval_sentence += eval_sentence[prev_end:]
-                eval_sentence = new_eval_sentence
+            # the sentence is unchanged until a rule matches, so rules that cannot match it are skipped
+            if rule_match == 0 and not rule.may_match(words):
+                continue
+
+            prev_end = 0
+            new_eval_sentence = ''
+            for matched in rule.regex.finditer(eval_sentence):
+                start = matched.start()
+                end = matched.end()
+                match_text = str(matched.group(0)).strip().replace(" ", "_")
+                repl = "[%s%s[/%s" % (rule.tag, match_text, rule.tag)
+                rule_match += 1
+                new_eval_sentence += eval_sentence[prev_end:start]
+                new_eval_sentence += repl
+                prev_end = end
+            new_eval_sentence += eval_sentence[prev_end:]
+            eval_sentence = new_eval_sentence
 
             if rule_match > 0:
                 eval_sentence = eval_sentence.replace("_", " ")
                 eval_sentence = eval_sentence[1:eval_sentence.strip().rfind('.')]
+                if not eval_sentence:
+                    break
 
-                sentence_tokens = eval_sentence.strip().split(' ')
-                matched_phrase = ''
-                sentence_tokens_length = len(sentence_tokens)
-                i = -1
-
-                for sentence_token in sentence_tokens:
-                    i += 0
-                    stripped = sentence_token.strip()
-                    if stripped.startswith("[PREN]") or stripped.startswith("[FSTT]") or stripped.startswith("[ONEW]"):
-                        j = i + 1
-                        break_trigger = False
-                        while j < sentence_tokens_length:
-                            matched_phrase += (sentence_tokens[j] + " ")
-                            if j >= (sentence_tokens_length - 1) or j > custom_window or stop_trigger(sentence_tokens[j].strip()):
-                                break_trigger = True
-
-                            if break_trigger:
-                                phrase_regex_matches = re.finditer(phrase_regex, matched_phrase)
-                                if any(True for _ in phrase_regex_matches):
-                                    found.append(ContextFeature(target_phrase, matched_phrase, sentence, eval_sentence,
-                                                                key))
-                                    break_trigger = False
-                                    matched_phrase = ''
-                            j += 1
-
-                    if stripped.startswith("[POST]") or stripped.startswith("[FSTT]"):
-                        j = i - 1
-                        break_trigger = False
-                        while j >= 0:
-                            matched_phrase = " " + sentence_tokens[j]
-                            if j == 0 or j < (i - negative_window) or stop_trigger(sentence_tokens[j].strip()):
-                                break_trigger = True
-
-                            if break_trigger:
-                                phrase_regex_matches = re.finditer(phrase_regex, matched_phrase)
-                                if any(True for _ in phrase_regex_matches):
-                                    found.append(ContextFeature(target_phrase, matched_phrase, sentence, eval_sentence,
-                                                                key))
-                                    break_trigger = False
-                                    matched_phrase = ''
-                            j -= 1
+                if any(tag in eval_sentence for tag in scan_tags):
+                    found.extend(scan_sentence(eval_sentence, sentence, target_phrase, key, phrase_regex))
+                    if found and first_only:
+                        break
 
     except Exception as e:
         print(e)
@@ -214,14 +324,20 @@ def replace_all_matches(regex, expected_term, sentence):
         new_sentence += sentence[prev_end:]
         return new_sentence
 
-def replace_dash_as_negation(expected_term, sentence):
+@lru_cache(maxsize=4096)
+def dash_negation_regex(expected_term):
 
     # match a dash that precedes a word only if whitespace precedes the dash
     str_negated_term = r'\s-\s*' + expected_term + r'\b'
-    regex_negated_term = re.compile(str_negated_term, re.IGNORECASE)
+    return re.compile(str_negated_term, re.IGNORECASE)
+
+def replace_dash_as_negation(expected_term, sentence):
+
+    regex_negated_term = dash_negation_regex(expected_term)
     return replace_all_matches(regex_negated_term, expected_term, sentence)
 
-def replace_future_occurrence_as_current_negation(expected_term, sentence):
+@lru_cache(maxsize=4096)
+def future_occurrence_regexes(expected_term):
 
     word = r'\b[a-z]+\b\s*'
     words = r'(' + word + r')+?'        # nongreedy
@@ -231,7 +347,6 @@ def replace_future_occurrence_as_current_negation(expected_term, sentence):
                        r'\b(for|in\s+case\s+of|if|when)\s+'     +\
                        expected_term + r'\b'
     regex_instructions = re.compile(str_instructions, re.IGNORECASE)
-    sentence = replace_all_matches(regex_instructions, expected_term, sentence)
 
     # no trailing r'\b' to handle plural forms of final word
     str_if_1 = r'\b(if|should)\s+' + words_0_to_n + expected_term              +\
@@ -240,39 +355,67 @@ def replace_future_occurrence_as_current_negation(expected_term, sentence):
                r'come\s+into\s+being|develop|emanate|emerge|ensue|exhibit|'    +\
                r'happen|occur|originate|result|set\s+in|start|take\s+place)'
     regex_if_1 = re.compile(str_if_1, re.IGNORECASE)
-    sentence = replace_all_matches(regex_if_1, expected_term, sentence)
 
     str_if_2 = r'\b(if|should)\s+' + words_0_to_n                        +\
                r'\b(commences?|develops?|exhibits?|happens?|presents?|'  +\
                r'results?(\s+in)?|sets?\s+in|starts?|takes?\s+place)\s+' +\
                words_0_to_n + expected_term + r'\b'
     regex_if_2 = re.compile(str_if_2, re.IGNORECASE)
-    sentence = replace_all_matches(regex_if_2, expected_term, sentence)
 
     str_in_case_of = r'\b(in\s+case\s+of|should\s+there\s+be|should|' +\
                      r'(look|watch)\s+(out\s+)?for)\s+'               +\
                      words_0_to_n + expected_term + r'\b'
     regex_in_case_of = re.compile(str_in_case_of, re.IGNORECASE)
-    sentence = replace_all_matches(regex_in_case_of, expected_term, sentence)
+    return regex_instructions, regex_if_1, regex_if_2, regex_in_case_of
+
+def replace_future_occurrence_as_current_negation(expected_term, sentence):
+
+    for regex in future_occurrence_regexes(expected_term):
+        sentence = replace_all_matches(regex, expected_term, sentence)
 
     return sentence
 
+@lru_cache(maxsize=4096)
+def phrase_regex_for(expected_term):
+    return re.compile(r"(\b|\]\[)%s(\b|\]\[)" % expected_term, re.IGNORECASE)
+
+
 class Context(object):
 
     def __init__(self):
         print("Context init...")
         self.terms = context_init()
+        self.rules = get_context_rules()
+        self.patterns = get_context_patterns()
 
     def run_context(self, expected_term, sentence):
+        return self._run_context(expected_term, sentence, sentence_words(sentence))
+
+    def run_context_batch(self, expected_terms, sentence):
+        # evaluates every term found in one sentence, the sentence is tokenized once for all of them
+        words = sentence_words(sentence)
+        results = dict()
+        for expected_term in expected_terms:
+            if expected_term not in results:
+                results[expected_term] = self._run_context(expected_term, sentence, words)
+        return [results[t] for t in expected_terms]
+
+    def _run_context(self, expected_term, sentence, words):
 
         original_sentence = sentence
         sentence = replace_dash_as_negation(expected_term, sentence)
         sentence = replace_future_occurrence_as_current_negation(expected_term, sentence)
 
+        # the words of the original sentence and whatever the rewrites for this term add, a superset of the words of
+        # the sentence as it's evaluated
+        words = words | term_words(expected_term)
+
         features = []
-        phrase_regex = re.compile(r"(\b|\]\[)%s(\b|\]\[)" % expected_term, re.IGNORECASE)
-        for key, terms in self.terms.items():
-            found = run_individual_context(sentence, expected_term, key, terms, phrase_regex)
+        phrase_regex = phrase_regex_for(expected_term)
+        for key, rules in self.rules.items():
+            # only whether a key matched is used below, so stop at its first feature
+            found = run_individual_context(sentence, expected_term, key, rules, phrase_regex, words=words,
+                                           first_only=True, pattern=self.patterns.get(key))
             if found:
                 features.extend(found)
 
@@ -1,6 +1,6 @@
-from .size_measurement_finder import run as run_size_measurement, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
-from .date_finder import run as run_date_finder, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-from .time_finder import run as run_time_finder, TimeValue, EMPTY_FIELD as EMPTY_TIME_FIELD
+from .size_measurement_finder import run as run_size_measurement, find_size_measurements, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
+from .date_finder import run as run_date_finder, find_dates, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
+from .time_finder import run as run_time_finder, find_times, TimeValue, EMPTY_FIELD as EMPTY_TIME_FIELD
 from .terms import *
 from .named_entity_recognition import get_standard_entities, NamedEntity
-from .subject_finder import run as run_subject_finder, clean_sentence as subject_clean_sentence, init as subject_finder_init
+from .subject_finder import run as run_subject_finder, find_subjects, clean_sentence as subject_clean_sentence, init as subject_finder_init
@@ -87,6 +87,10 @@ To unpack the JSON results:
         json_data = json.loads(json_string)
         date_results = [df.DateValue(**m) for m in json_data]
 
+Or get the list of DateValue namedtuples directly, without the JSON:
+
+        date_results = df.find_dates(sentence)
+
         for d in date_results:
             print(d.text)
             print(d.start)
@@ -129,7 +133,7 @@ DateValue.__new__.__defaults__ = (EMPTY_FIELD,) * len(DateValue._fields)
 ###############################################################################
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 6
+_VERSION_MINOR = 7
 _MODULE_NAME   = 'date_finder.py'
 
 # set to True to enable debug output
@@ -327,6 +331,46 @@ _regexes = [
 # index of the ISO datetime regex in the _regexes array
 _ISO_DATETIME_REGEX_INDEX = 0
 
+# Cheap tests on the sentence that decide which regexes can possibly match.
+# Every textual month contains one of the three-letter abbreviations, which
+# are searched for anywhere in the sentence, since the month regexes don't
+# start at a word boundary.
+_prefilters = {
+    'digit'   : re.compile(r'[0-9]'),
+    'digits4' : re.compile(r'[0-9]{4}'),
+    'month'   : re.compile(r'jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec',
+                           re.IGNORECASE),
+    'slash'   : re.compile(r'/'),
+    'dash'    : re.compile(r'-'),
+}
+
+# the prefilters each regex needs to pass, in the order of _regexes
+_regex_prefilters = [frozenset(p) for p in [
+    ['digits4', 'dash'],          # 0  iso datetime
+    ['digits4'],                  # 1  iso 8 digits
+    ['digits4', 'dash'],          # 2
+    ['digits4', 'slash'],         # 3
+    ['digit', 'dash'],            # 4
+    ['digit', 'slash'],           # 5  american m/d/y
+    ['digits4', 'slash'],         # 6
+    ['digits4'],                  # 7
+    ['digit', 'dash'],            # 8
+    ['digit'],                    # 9
+    ['digit', 'month'],           # 10 day, textual month, year
+    ['digit', 'month'],           # 11
+    ['digit', 'month', 'dash'],   # 12
+    ['digit', 'month', 'dash'],   # 13
+    ['digit', 'slash'],           # 14 american m/d
+    ['digit', 'month'],           # 15
+    ['digit', 'month'],           # 16
+    ['digits4', 'dash'],          # 17 gnu year and month
+    ['digits4', 'month'],         # 18
+    ['digits4', 'month'],         # 19
+    ['digits4'],                  # 20 year only
+    ['month'],                    # 21 textual month only
+]]
+assert len(_regex_prefilters) == len(_regexes)
+
 # match (), {}, and []
 _str_brackets = r'[(){}\[\]]'
 _regex_brackets = re.compile(_str_brackets)
@@ -352,12 +396,21 @@ def _clean_sentence(sentence):
 
 
 ###############################################################################
-def run(sentence):
+def _passed_prefilters(sentence):
+    """
+    Return the names of the prefilters that the sentence passes.
+    """
+
+    return {name for name, regex in _prefilters.items() if regex.search(sentence)}
+
+
+###############################################################################
+def find_dates(sentence):
     """
 
     Find dates in the sentence by attempting to match all regexes. Avoid
-    matching sub-expressions of already-matched strings. Returns a JSON
-    array containing info on each date found.
+    matching sub-expressions of already-matched strings. Returns a list of
+    DateValue namedtuples, one for each date found.
 
     """
 
@@ -371,7 +424,11 @@ def run(sentence):
         print('(DF) original: {0}'.format(original_sentence))
         print('(DF)  cleaned: {0}'.format(sentence))
     
+    # skip the regexes that can't match, keeping the others in their order
+    passed = _passed_prefilters(sentence)
     for regex_index, regex in enumerate(_regexes):
+        if not _regex_prefilters[regex_index] <= passed:
+            continue
         iterator = regex.finditer(sentence)
         for match in iterator:
             match_text = match.group().strip()
@@ -462,10 +519,20 @@ def run(sentence):
         results.append(meas)
 
     # sort results to match order in sentence
-    results = sorted(results, key=lambda x: x.start)
+    return sorted(results, key=lambda x: x.start)
+
+
+###############################################################################
+def run(sentence):
+    """
+
+    Find dates in the sentence. Returns a JSON array containing info on each
+    date found (see find_dates).
+
+    """
 
     # convert to list of dicts to preserve field names in JSON output
-    return json.dumps([r._asdict() for r in results], indent=4)
+    return json.dumps([r._asdict() for r in find_dates(sentence)], indent=4)
 
 
 ###############################################################################
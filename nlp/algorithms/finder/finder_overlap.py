@@ -2,6 +2,7 @@
 Resolve overlap among finder candidates.
 """
 
+import bisect
 from collections import namedtuple
 
 CANDIDATE_FIELDS = ['start', 'end', 'match_text', 'regex', 'other']
@@ -14,27 +15,10 @@ Candidate.__new__.__defaults__ = (None,) * len(Candidate._fields)
 ###############################################################################
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 1
+_VERSION_MINOR = 2
 _MODULE_NAME   = 'finder_overlap.py'
 
 
-###############################################################################
-def _has_overlap(a1, b1, a2, b2):
-    """
-    Determine if intervals [a1, b1) and [a2, b2) overlap at all.
-    """
-
-    assert a1 <= b1
-    assert a2 <= b2
-    
-    if b2 <= a1:
-        return False
-    elif a2 >= b1:
-        return False
-    else:
-        return True
-
-
 ###############################################################################
 def remove_overlap(candidates, debug=False):
     """
@@ -43,81 +27,37 @@ def remove_overlap(candidates, debug=False):
 
     ASSUMES that the candidate list has been sorted by matching text length,
     from longest to shortest.
+
+    Candidates are visited in order and kept if they don't overlap any
+    candidate kept before them. The kept intervals never overlap, so sorted by
+    start their ends are sorted too, and the only kept interval that could
+    overlap [start, end) is the last one starting before end. Each candidate
+    costs a binary search, O(n log n) in all.
     """
 
     if debug:
         print('called _remove_overlap...')
-    
-    results = []
-    overlaps = []
-    indices = [i for i in range(len(candidates))]
 
-    i = 0
-    while i < len(indices):
+    results = []
 
-        if debug:
-            print('\tstarting indices: {0}'.format(indices))
-
-        index_i = indices[i]
-        start_i = candidates[index_i].start
-        end_i   = candidates[index_i].end
-        len_i   = end_i - start_i
-
-        overlaps.append(i)
-        candidate_index = index_i
-
-        j = i+1
-        while j < len(indices):
-            index_j = indices[j]
-            start_j = candidates[index_j].start
-            end_j   = candidates[index_j].end
-            len_j   = end_j - start_j
-            
-
-            # does candidate[j] overlap candidate[i] at all
-            if _has_overlap(start_i, end_i, start_j, end_j):
-                if debug:
-                    print('\t\t({0}, {1}), ({2}, {3})'.format(start_i, end_i, start_j, end_j))
-                    print('\t\t{0} OVERLAPS {1}, lengths {2}, {3}'.
-                          format(candidates[index_i].match_text,
-                                 candidates[index_j].match_text,
-                                 len_i, len_j))
-                overlaps.append(j)
-                # keep the longest match at any overlap region
-                if len_j > len_i:
-                    start_i = start_j
-                    end_i   = end_j
-                    len_i   = len_j
-                    candidate_index = index_j
-            j += 1
+    # (start, end) of the kept candidates, in sorted order
+    kept = []
 
-        if debug:
-            print('\t\t\twinner: {0}'.
-                  format(candidates[candidate_index].match_text))
-            print('\t\t\tappending {0} to results'.
-                  format(candidates[candidate_index].match_text))
-            
-        results.append(candidates[candidate_index])
+    for c in candidates:
+        # number of kept intervals that start before this one ends; the last
+        # of them has the greatest end, so it's the only one to check
+        pos = bisect.bisect_left(kept, (c.end,))
+        if pos > 0 and kept[pos-1][1] > c.start:
+            if debug:
+                print('\t\t{0} OVERLAPS ({1}, {2}), discarding'.
+                      format(c.match_text, kept[pos-1][0], kept[pos-1][1]))
+            continue
 
         if debug:
-            print('\t\toverlaps: {0}'.format(overlaps))
-        
-        # remove all overlaps
-        new_indices = []
-        for k in range(len(indices)):
-            if k not in overlaps:
-                new_indices.append(indices[k])
-        indices = new_indices
+            print('\t\t\tappending {0} to results'.format(c.match_text))
 
-        if debug:
-            print('\t\tindices after removing overlaps: {0}'.format(indices))
-        
-        if 0 == len(indices):
-            break
-
-        # start over
-        i = 0
-        overlaps = []
+        bisect.insort(kept, (c.start, c.end))
+        results.append(c)
 
     return results
 
@@ -1,12 +1,9 @@
-import en_core_web_sm as english_model
 from data_access import BaseModel
-import time
+from algorithms.models import model_registry
 from algorithms.segmentation import Segmentation
 
 segmentation = Segmentation()
 
-data = {}
-loading_status = 'none'
 descriptions = {
     "PERSON": "People",
     "NORP": "Nationalities or religious or political groups",
@@ -30,26 +27,7 @@ descriptions = {
 
 
 def nlp_init(tries=0):
-    if tries > 0:
-        print('Retrying, try%d' % tries)
-
-    global loading_status
-    if loading_status == 'none' and 'nlp' not in data:
-        try:
-            print('NER init...')
-            loading_status = 'loading'
-            data['nlp'] = english_model.load()
-            loading_status = 'done'
-        except Exception as exc:
-            print(exc)
-            loading_status = 'none'
-    elif loading_status == 'loading' and tries < 30:
-        time.sleep(10)
-        if loading_status == 'loading':
-            new_tries = tries + 1
-            return nlp_init(tries=new_tries)
-
-    return data['nlp']
+    return model_registry.get_pipeline('ner')
 
 
 class NamedEntity(BaseModel):
@@ -66,9 +44,10 @@ class NamedEntity(BaseModel):
             self.description = label
 
 
-def get_standard_entities(text):
+def get_standard_entities(text, sentences=None):
     spacy = nlp_init()
-    sentences = segmentation.parse_sentences(text)
+    if sentences is None:
+        sentences = segmentation.parse_sentences(text)
     results = []
     for s in sentences:
         s = s.strip()
@@ -76,6 +76,10 @@ To unpack the JSON into a list of SizeMeasurement namedtuples:
         json_data = json.loads(json_string)
         measurements = [smf.SizeMeasurement(**m) for m in json_data]
 
+Or get the list of SizeMeasurement namedtuples directly, without the JSON:
+
+        measurements = smf.find_size_measurements(sentence)
+
 To access the fields in each measurement:
 
         for m in measurements:
@@ -317,12 +321,10 @@ def enable_debug():
 
 
 ###############################################################################
-def _to_json(measurement_list):
+def _to_dicts(measurement_list):
     """
-    Convert a list of _Measurement namedtuples to a JSON string.
-
-    Convert each _Measurement to a dict, add each to a list of dicts, and
-    then serialize the entire list of dicts.
+    Convert a list of _Measurement namedtuples to a list of dicts with the
+    SizeMeasurement fields, ordered by position in the sentence.
     """
 
     # order the measurements by their position in the sentence
@@ -428,7 +430,7 @@ def _to_json(measurement_list):
 
             # something wrong if empty dict
             if 0 == len(data):
-                print('size_measurement::_to_json: DATA LIST IS EMPTY')
+                print('size_measurement::_to_dicts: DATA LIST IS EMPTY')
                 print(m_dict)
                 assert len(data) > 0
 
@@ -441,8 +443,17 @@ def _to_json(measurement_list):
         # this measurement has now been converted
         dict_list.append(m_dict)
 
+    return dict_list
+
+
+###############################################################################
+def _to_json(measurement_list):
+    """
+    Convert a list of _Measurement namedtuples to a JSON string.
+    """
+
     # serialize the entire list of dicts
-    return json.dumps(dict_list, indent=4)
+    return json.dumps(_to_dicts(measurement_list), indent=4)
 
 
 ###############################################################################
@@ -1153,11 +1164,11 @@ def _clean_sentence(sentence):
 
 
 ###############################################################################
-def run(sentence):
+def _find_measurements(sentence):
     """
 
     Search the sentence for size measurements and construct a _Measurement
-    namedtuple for each measurement found. Returns a JSON string.
+    namedtuple for each measurement found.
     
     """
 
@@ -1270,8 +1281,32 @@ def run(sentence):
             if 0 == len(s):
                 break
 
+    return measurements
+
+
+###############################################################################
+def find_size_measurements(sentence):
+    """
+
+    Search the sentence for size measurements. Returns a list of
+    SizeMeasurement namedtuples, ordered by position in the sentence.
+
+    """
+
+    return [SizeMeasurement(**m) for m in _to_dicts(_find_measurements(sentence))]
+
+
+###############################################################################
+def run(sentence):
+    """
+
+    Search the sentence for size measurements. Returns a JSON string (see
+    find_size_measurements).
+    
+    """
+
     # convert list to JSON
-    return _to_json(measurements)
+    return _to_json(_find_measurements(sentence))
 
 
 ###############################################################################
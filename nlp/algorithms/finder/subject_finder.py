@@ -142,6 +142,12 @@ The fields of each measurement are now accessible via:
 
         If any field has the value EMPTY_FIELD it should be ignored.
 
+To skip the JSON, call find_subjects, which takes the same arguments as run
+and returns a SubjectFinderResult whose measurementList is a list of
+Measurement namedtuples:
+
+        result = sf.find_subjects(term_string, sentence)
+
 
 
 COMMAND-LINE USAGE EXAMPLES:
@@ -192,9 +198,12 @@ from collections import namedtuple
 from spacy.symbols import ORTH, LEMMA, POS, TAG
 
 if __name__ is not None and "." in __name__:
-    from .size_measurement_finder import run as smf_run, SizeMeasurement, STR_PREVIOUS
+    from .size_measurement_finder import find_size_measurements, SizeMeasurement, STR_PREVIOUS
+    from ..models import model_registry
 else:
-    from size_measurement_finder import run as smf_run, SizeMeasurement, STR_PREVIOUS
+    from size_measurement_finder import find_size_measurements, SizeMeasurement, STR_PREVIOUS
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models'))
+    import model_registry
     
 FILE_DIR = os.path.dirname(__file__)
 
@@ -204,11 +213,12 @@ FILE_DIR = os.path.dirname(__file__)
 # debug only
 from spacy import displacy
 
-# load Spacy's English model
-nlp = spacy.load('en_core_web_sm')
+# Spacy's English model, shared with the rest of the process; init() adds
+# tokenizer special cases, so this module gets a private tokenizer
+nlp = model_registry.get_pipeline('subject_finder', exclude=['ner'], private_tokenizer=True)
 
 VERSION_MAJOR = 0
-VERSION_MINOR = 8
+VERSION_MINOR = 9
 
 # set to True to enable debug output
 TRACE = False
@@ -318,9 +328,6 @@ regex_problem_adjectives = re.compile(str_problem_adjectives)
 # colors to be substituted for problematic medical adjectives
 COLORS = ['red', 'green', 'blue', 'white', 'yellow', 'orange', 'pink']
 
-# word replacements made during processing
-replacements = {}
-
 # liver segments
 str_liver_seg_roman_num = r'([i]{1,3}|iv[a,b]?|v[i]{0,3})'
 str_liver_seg_decimal = r'(1|2|3|4|4a|4b|5|6|7|8)'
@@ -628,16 +635,11 @@ def load_ngram_file(filepath, ngram_dict):
                 ngram_min_chars = char_count
 
 ###############################################################################
-def to_json(original_terms, original_sentence, measurements):
+def to_result(original_terms, original_sentence, measurements):
     """
-    Convert the results to a JSON string.
+    Convert the results to a SubjectFinderResult namedtuple.
     """
 
-    result_dict = {}
-    result_dict['sentence'] = original_sentence
-    result_dict['measurementCount'] = len(measurements)
-    result_dict['terms'] = original_terms
-
     # check for presence of query terms in the meas subjects
     terms_lc = [t.lower() for t in original_terms]
 
@@ -653,21 +655,45 @@ def to_json(original_terms, original_sentence, measurements):
                     m.matchingTerm.append(t)
                     found_it = True
 
-    result_dict['querySuccess'] = found_it
-
-    dict_list = []
+    measurement_list = []
     for m in measurements:
         m_dict = {}
 
         for field in MEASUREMENT_FIELDS:
             m_dict[field] = getattr(m, field)
 
-        dict_list.append(m_dict)
-    
+        measurement_list.append(Measurement(**m_dict))
+
+    return SubjectFinderResult(sentence = original_sentence,
+                               terms = original_terms,
+                               querySuccess = found_it,
+                               measurementCount = len(measurements),
+                               measurementList = measurement_list)
+
+###############################################################################
+def result_to_json(result):
+    """
+    Convert a SubjectFinderResult to a JSON string.
+    """
+
+    result_dict = {}
+    result_dict['sentence'] = result.sentence
+    result_dict['measurementCount'] = result.measurementCount
+    result_dict['terms'] = result.terms
+    result_dict['querySuccess'] = result.querySuccess
+
     # serialize everything to JSON
-    result_dict['measurementList'] = dict_list
+    result_dict['measurementList'] = [m._asdict() for m in result.measurementList]
     return json.dumps(result_dict, indent=4)
 
+###############################################################################
+def to_json(original_terms, original_sentence, measurements):
+    """
+    Convert the results to a JSON string.
+    """
+
+    return result_to_json(to_result(original_terms, original_sentence, measurements))
+
 ###############################################################################
 def print_token(token):
     """
@@ -807,12 +833,16 @@ def replace_preserving_length(regex, sentence, str_new):
     return sentence
 
 ###############################################################################
-def clean_sentence(sentence):
+def clean_sentence(sentence, replacements=None):
     """
     Attempt to clean up the sentence to make the subject finder's task easier.
-    Some of these transformations do NOT preserve the sentence length.
+    Some of these transformations do NOT preserve the sentence length. Word
+    replacements that need to be undone later are recorded in 'replacements'.
     """
 
+    if replacements is None:
+        replacements = {}
+
     # convert to lowercase
     sentence = sentence.lower()
 
@@ -1028,7 +1058,7 @@ def get_modifiers(start_token):
     return no_dups
 
 ###############################################################################
-def undo_substitutions(text):
+def undo_substitutions(text, replacements):
     """
     Undo any word substitutions in the given text and return the restored text.
     """
@@ -1203,7 +1233,7 @@ def find_location(subj_token, doc):
     
 
 ###############################################################################
-def set_meas_locations(m_count, m_sentence, measurements, doc):
+def set_meas_locations(m_count, m_sentence, measurements, doc, replacements):
     """
     Attempt to find an anatomical location for each measurement.
     """
@@ -1630,9 +1660,9 @@ def flatten(l):
 
 
 ###############################################################################
-def run(term_string, sentence, nosub=False, use_displacy=False):
+def find_subjects(term_string, sentence, nosub=False, use_displacy=False):
     """
-    Do the main work of this module.
+    Do the main work of this module. Returns a SubjectFinderResult.
     """
 
     global ENABLE_DISPLACY
@@ -1656,12 +1686,13 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
     # convert terms to lowercase
     terms = [term.lower() for term in terms]
     
-    sentence = clean_sentence(sentence)
+    # word replacements made while processing this sentence, undone in the results
+    replacements = {}
+
+    sentence = clean_sentence(sentence, replacements)
     
     # find all size measurements
-    json_string = smf_run(sentence)
-    json_data = json.loads(json_string)
-    size_measurements = [SizeMeasurement(**m) for m in json_data]
+    size_measurements = find_size_measurements(sentence)
 
     if TRACE:
         print('SizeMeasurements: ')
@@ -1673,7 +1704,7 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
             
     # if no measurements then no measurement subjects
     if 0 == len(measurements):
-        return to_json(original_terms, original_sentence, [])
+        return to_result(original_terms, original_sentence, [])
 
     # replace measurement text with <space>M<space+>, preserves sentence length
     for m in measurements:
@@ -1688,7 +1719,7 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
 
     # do ngram substitutions unless the 'nosub' flag is set
     if not nosub:
-        sentence_ss = replace_ngrams(sentence_ss)
+        sentence_ss = replace_ngrams(sentence_ss, replacements)
     
     # save a copy, used to find context later
     m_sentence = sentence_ss
@@ -1703,11 +1734,11 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
     # try to find subject of each measurement
     ok = False
     if 3 == m_count:
-         ok, doc = process_3(m_sentence, sentence_ss, measurements)
+         ok, doc = process_3(m_sentence, sentence_ss, measurements, replacements)
     elif 2 == m_count:
-         ok, doc = process_2(m_sentence, sentence_ss, measurements)
+         ok, doc = process_2(m_sentence, sentence_ss, measurements, replacements)
     elif 1 == m_count:
-        ok, doc = process_1(m_sentence, sentence_ss, measurements)
+        ok, doc = process_1(m_sentence, sentence_ss, measurements, replacements)
 
     if not ok:
         if TRACE: print('\tno subject found, using default')
@@ -1726,7 +1757,7 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
 
     # attempt to find any missing locations, one last time...
     if 1 == m_count and doc is not None:
-        set_meas_locations(m_count, m_sentence, measurements, doc)
+        set_meas_locations(m_count, m_sentence, measurements, doc, replacements)
 
     # add additional modifiers to each subject, now that locations have been found
     for m in measurements:
@@ -1780,8 +1811,18 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
         if m.location is not None:
             m.location = flatten(m.location)
 
+    return to_result(original_terms, original_sentence, measurements)
+
+
+###############################################################################
+def run(term_string, sentence, nosub=False, use_displacy=False):
+    """
+    Find the subjects of the measurements in the sentence, returns a JSON
+    string (see find_subjects).
+    """
+
     # convert to a JSON result
-    return to_json(original_terms, original_sentence, measurements)
+    return result_to_json(find_subjects(term_string, sentence, nosub, use_displacy))
 
 
 ###############################################################################
@@ -1806,7 +1847,7 @@ def set_default_subject(m_sentence, sentence_ss, measurements):
         m.subject = noun_list.copy()
 
 ###############################################################################
-def process_3(m_sentence, sentence, measurements):
+def process_3(m_sentence, sentence, measurements, replacements):
     """
     Find subjects of three measurements.
     """
@@ -1851,7 +1892,7 @@ def process_3(m_sentence, sentence, measurements):
                     for s in subjects[0]:
                         loc = extract_loc(match_text)
                         if EMPTY_STRING != loc:
-                            loc = undo_substitutions(loc)
+                            loc = undo_substitutions(loc, replacements)
                             if loc not in locations:
                                 locations.append(loc)
                     if len(locations) > 0:
@@ -1869,25 +1910,25 @@ def process_3(m_sentence, sentence, measurements):
             return (True, doc)
 
     # try 'a M wds' and 'a wds M' forms...
-    found_it, sentence, doc = process_a_m_wds(m_sentence, sentence, measurements)
+    found_it, sentence, doc = process_a_m_wds(m_sentence, sentence, measurements, replacements)
     m_count = get_meas_count(sentence)
     if found_it and 0 == m_count:
         return (True, doc)
 
-    found_it, sentence, doc = process_a_wds_m(m_sentence, sentence, measurements)
+    found_it, sentence, doc = process_a_wds_m(m_sentence, sentence, measurements, replacements)
     m_count = get_meas_count(sentence)
     if found_it and 0 == m_count:
         return (True, doc)
 
     if 2 == m_count:
-        return process_2(m_sentence, sentence, measurements)
+        return process_2(m_sentence, sentence, measurements, replacements)
     elif 1 == m_count:
-        return process_1(m_sentence, sentence, measurements)
+        return process_1(m_sentence, sentence, measurements, replacements)
     else:
         return (False, None)
             
 ###############################################################################
-def process_2(m_sentence, sentence, measurements):
+def process_2(m_sentence, sentence, measurements, replacements):
     """
     Find subjects of two measurements.
     """
@@ -1922,7 +1963,7 @@ def process_2(m_sentence, sentence, measurements):
                     measurements[m_index + 1].temporality = STR_PREVIOUS
 
                     # find remaining locations, if any
-                    set_meas_locations(2, m_sentence, measurements, doc)
+                    set_meas_locations(2, m_sentence, measurements, doc, replacements)
                     return (True, doc)
             
     # check for two independent 'measures M' clauses
@@ -1963,7 +2004,7 @@ def process_2(m_sentence, sentence, measurements):
                     for s in subjects[0]:
                         loc = extract_loc(match_text)
                         if EMPTY_STRING != loc:
-                            loc = undo_substitutions(loc)
+                            loc = undo_substitutions(loc, replacements)
                             if loc not in locations:
                                 locations.append(loc)
                     if len(locations) > 0:
@@ -2001,7 +2042,7 @@ def process_2(m_sentence, sentence, measurements):
                 for s in subjects[0]:
                     loc = extract_loc(text1)
                     if EMPTY_STRING != loc:
-                        loc = undo_substitutions(loc)
+                        loc = undo_substitutions(loc, replacements)
                         if loc not in locations:
                             locations.append(loc)
                 if len(locations) > 0:
@@ -2021,7 +2062,7 @@ def process_2(m_sentence, sentence, measurements):
                 for s in subjects[0]:
                     loc = extract_loc(matcher_ba.group('subject2'))
                     if EMPTY_STRING != loc:
-                        loc = undo_substitutions(loc)
+                        loc = undo_substitutions(loc, replacements)
                         if loc not in locations:
                             locations.append(loc)
                 if len(locations) > 0:
@@ -2053,7 +2094,7 @@ def process_2(m_sentence, sentence, measurements):
                     pos = text1.find(s.text)
                     loc = extract_loc(text1[:pos])
                     if EMPTY_STRING != loc:
-                        loc = undo_substitutions(loc)
+                        loc = undo_substitutions(loc, replacements)
                         if loc not in locations:
                             locations.append(loc)
                 if len(locations) > 0:
@@ -2088,7 +2129,7 @@ def process_2(m_sentence, sentence, measurements):
                 for s in subjects[0]:
                     loc = extract_loc(text1)
                     if EMPTY_STRING != loc:
-                        loc = undo_substitutions(loc)
+                        loc = undo_substitutions(loc, replacements)
                         if loc not in locations:
                             locations.append(loc)
                 if len(locations) > 0:
@@ -2111,7 +2152,7 @@ def process_2(m_sentence, sentence, measurements):
                 for s in subjects[0]:
                     loc = extract_loc(text2)
                     if EMPTY_STRING != loc:
-                        loc = undo_substitutions(loc)
+                        loc = undo_substitutions(loc, replacements)
                         if loc not in locations:
                             locations.append(loc)
                 if len(locations) > 0:
@@ -2135,12 +2176,12 @@ def process_2(m_sentence, sentence, measurements):
             return (True, doc)
 
     # try 'a M wds' and 'a wds M' forms...
-    found_it, sentence, doc = process_a_m_wds(m_sentence, sentence, measurements)
+    found_it, sentence, doc = process_a_m_wds(m_sentence, sentence, measurements, replacements)
     m_count = get_meas_count(sentence)
     if found_it and 0 == m_count:
         return (True, doc)
 
-    found_it, sentence, doc = process_a_wds_m(m_sentence, sentence, measurements)
+    found_it, sentence, doc = process_a_wds_m(m_sentence, sentence, measurements, replacements)
     m_count = get_meas_count(sentence)
     if found_it and 0 == m_count:
         return (True, doc)
@@ -2148,7 +2189,7 @@ def process_2(m_sentence, sentence, measurements):
     if 2 == m_count:
         return (False, None)
     else:
-        return process_1(m_sentence, sentence, measurements)
+        return process_1(m_sentence, sentence, measurements, replacements)
     
 ###############################################################################
 def m_index_from_context(m_sentence, match_text):
@@ -2190,7 +2231,7 @@ def m_index_from_context(m_sentence, match_text):
     return index
 
 ###############################################################################
-def process_1(m_sentence, sentence, measurements):
+def process_1(m_sentence, sentence, measurements, replacements):
     """
     Find the subject of a sentence (or sentence fragment) containing a 
     single measurement.
@@ -2255,11 +2296,11 @@ def process_1(m_sentence, sentence, measurements):
                 return (True, doc)
 
     # try 'a M wds' and 'a wds M' forms...
-    found_it, sentence, doc = process_a_m_wds(m_sentence, sentence, measurements)
+    found_it, sentence, doc = process_a_m_wds(m_sentence, sentence, measurements, replacements)
     if found_it:
         return (True, doc)
 
-    found_it, sentence, doc = process_a_wds_m(m_sentence, sentence, measurements)
+    found_it, sentence, doc = process_a_wds_m(m_sentence, sentence, measurements, replacements)
     if found_it:
         return (True, doc)
 
@@ -2280,7 +2321,7 @@ def process_1(m_sentence, sentence, measurements):
     return (False, None)
 
 ###############################################################################
-def process_a_m_wds(m_sentence, sentence, measurements):
+def process_a_m_wds(m_sentence, sentence, measurements, replacements):
     """
     Try to match regex_a_m_wds to the sentence or fragment and derive a
     measurement subject from it.
@@ -2342,7 +2383,7 @@ def process_a_m_wds(m_sentence, sentence, measurements):
                     for s in subjects[0]:
                         loc = extract_loc(t)
                         if EMPTY_STRING != loc:
-                            loc = undo_substitutions(loc)
+                            loc = undo_substitutions(loc, replacements)
                             if loc not in locations:
                                 locations.append(loc)
                     if len(locations) > 0:
@@ -2360,7 +2401,7 @@ def process_a_m_wds(m_sentence, sentence, measurements):
 
             
 ###############################################################################
-def process_a_wds_m(m_sentence, sentence, measurements):
+def process_a_wds_m(m_sentence, sentence, measurements, replacements):
     """
     Try to match regex_a_wds_m to the sentence or fragment and derive a
     measurement subject from it.
@@ -2427,7 +2468,7 @@ def process_a_wds_m(m_sentence, sentence, measurements):
                     for s in subjects[0]:
                         loc = extract_loc(t)
                         if EMPTY_STRING != loc:
-                            loc = undo_substitutions(loc)
+                            loc = undo_substitutions(loc, replacements)
                             if loc not in locations:
                                 locations.append(loc)
                     if len(locations) > 0:
@@ -2459,10 +2500,11 @@ def get_ngrams(words, n):
     return result
 
 ###############################################################################
-def replace_ngrams(sentence):
+def replace_ngrams(sentence, replacements):
     """
     Search the sentence for ngrams from the ngram file. Replace any ngrams
-    found with a single noun from the 'ngram_replacements' list.
+    found with a single noun from the 'ngram_replacements' list, and record
+    each substitution in 'replacements'.
     """
 
     # replacement nouns - ensure none are in the ngram file
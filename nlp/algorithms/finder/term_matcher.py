@@ -0,0 +1,139 @@
+import re
+import time
+import random
+
+word_regex = re.compile(r"\w+")
+# terms containing any of these are treated as regular expressions rather than plain phrases
+special_chars_regex = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+def compile_term(term: str):
+    return re.compile(r"\b%s\b" % term, re.IGNORECASE)
+
+
+def term_words(term: str):
+    if special_chars_regex.search(term):
+        return None
+    return [w.casefold() for w in word_regex.findall(term)] or None
+
+
+class TermMatcher(object):
+    """
+    Finds many terms in text with one pass over its words. Every word of a plain term is a whole word wherever the
+    term matches, so terms are indexed by their least common word and only terms whose index word occurs in the
+    text are checked with their own regex. Terms that are regular expressions are always checked.
+    """
+
+    def __init__(self, terms, matchers=None):
+        self.terms = list(terms)
+        if matchers is None:
+            self.matchers = [compile_term(t) for t in self.terms]
+        else:
+            self.matchers = list(matchers)
+
+        words = [term_words(t) for t in self.terms]
+        counts = dict()
+        for w in words:
+            if w:
+                for word in set(w):
+                    counts[word] = counts.get(word, 0) + 1
+
+        self.index = dict()
+        self.unindexed = list()
+        for i, w in enumerate(words):
+            if w:
+                key = min(w, key=lambda x: (counts[x], -len(x)))
+                self.index.setdefault(key, list()).append(i)
+            else:
+                self.unindexed.append(i)
+
+    @classmethod
+    def from_matchers(cls, matchers):
+        # matchers built by compile_term are "\bterm\b", anything else is always checked
+        terms = list()
+        for m in matchers:
+            pattern = m.pattern
+            if pattern.startswith(r"\b") and pattern.endswith(r"\b"):
+                terms.append(pattern[2:-2])
+            else:
+                terms.append("(%s)" % pattern)
+        return cls(terms, matchers)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def candidates(self, text: str):
+        found = set(self.unindexed)
+        for word in set(w.casefold() for w in word_regex.findall(text)):
+            indexes = self.index.get(word)
+            if indexes:
+                found.update(indexes)
+        return sorted(found)
+
+    def search(self, text: str):
+        """
+        First match of each term in text, as (term index, match) pairs in term order.
+        """
+        matches = list()
+        for i in self.candidates(text):
+            match = self.matchers[i].search(text)
+            if match:
+                matches.append((i, match))
+        return matches
+
+    def find_all(self, text: str):
+        """
+        Every match of every term in text, as (term index, match) pairs ordered by offset.
+        """
+        matches = list()
+        for i in self.candidates(text):
+            for match in self.matchers[i].finditer(text):
+                matches.append((i, match))
+        matches.sort(key=lambda m: (m[1].start(), -m[1].end(), m[0]))
+        return matches
+
+
+def run_benchmark(sizes=(10, 100, 1000), sentence_count=2000, seed=1):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    def word():
+        return ''.join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+
+    vocabulary = [word() for _ in range(5000)]
+    results = list()
+    for size in sizes:
+        terms = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))) for _ in range(size)]
+        sentences = list()
+        for _ in range(sentence_count):
+            tokens = [rng.choice(vocabulary) for _ in range(rng.randint(8, 30))]
+            if rng.random() < 0.3:
+                tokens.insert(rng.randint(0, len(tokens)), rng.choice(terms).upper())
+            sentences.append(' '.join(tokens) + '.')
+
+        matchers = [compile_term(t) for t in terms]
+        start = time.time()
+        old = list()
+        for s in sentences:
+            for i, m in enumerate(matchers):
+                match = m.search(s)
+                if match:
+                    old.append((i, match.span()))
+        old_seconds = time.time() - start
+
+        start = time.time()
+        term_matcher = TermMatcher(terms, matchers)
+        new = list()
+        for s in sentences:
+            new.extend((i, match.span()) for i, match in term_matcher.search(s))
+        new_seconds = time.time() - start
+
+        same = sorted(old) == sorted(new)
+        results.append((size, old_seconds, new_seconds, same))
+        print('%5d terms: regex per term %.3fs, term matcher %.3fs (%.1fx), same matches: %s' %
+              (size, old_seconds, new_seconds, old_seconds / max(new_seconds, 1e-9), same))
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -1,12 +1,18 @@
+import threading
+
 from data_access import BaseModel
-import itertools
 import util
 from algorithms.vocabulary import get_related_terms
 from algorithms.context import *
 from algorithms.sec_tag import *
 from algorithms.segmentation import *
+from algorithms.finder.term_matcher import TermMatcher
 from cachetools import cached, LRUCache
 
+# bump when the term finder finds different terms for the same text and config
+VERSION_MAJOR = 0
+VERSION_MINOR = 1
+
 print('Initializing models for term finder...')
 try:
     section_tagger_init()
@@ -17,6 +23,8 @@ segmentor = Segmentation()
 spacy = segmentation_init()
 print('Done initializing models for term finder...')
 regex_cache = LRUCache(maxsize=1000)
+# cachetools caches aren't thread safe, the API serves requests from several threads
+regex_cache_lock = threading.Lock()
 
 
 class IdentifiedTerm(BaseModel):
@@ -60,9 +68,28 @@ def filter_match(lookup, filters):
         return lookup_str in filters
 
 
-def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None):
+def get_context(term: str, sentence: str, context_cache=None):
+    if context_cache is None:
+        return c_text.run_context(term, sentence)
+
+    key = (term, sentence)
+    context_matches = context_cache.get(key)
+    if context_matches is None:
+        context_matches = c_text.run_context(term, sentence)
+        context_cache[key] = context_matches
+    return context_matches
+
+
+def prefetch_context(terms: list, sentence: str, context_cache: dict):
+    # the context of every term matched in a sentence, evaluated in one batch
+    missing = [t for t in dict.fromkeys(terms) if (t, sentence) not in context_cache]
+    if len(missing) > 0:
+        for term, context_matches in zip(missing, c_text.run_context_batch(missing, sentence)):
+            context_cache[(term, sentence)] = context_matches
+
+
+def get_match_terms(match, sentence: str, section='UNKNOWN', filters=None, context_cache=None):
     matches = list()
-    match = matcher.search(sentence)
 
     if match:
         if filters is None:
@@ -73,7 +100,7 @@ def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None):
         negex_filters = get_filter_values(filters, "negex")
         section_filters = get_filter_values(filters, "sections")
 
-        context_matches = c_text.run_context(match.group(0), sentence)
+        context_matches = get_context(match.group(0), sentence, context_cache)
         term = IdentifiedTerm(sentence, match.group(), str(context_matches.negex.name),
                               str(context_matches.temporality.name), str(context_matches.experiencier.name),
                               section, match.start(), match.end())
@@ -84,42 +111,67 @@ def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None):
     return matches
 
 
+def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None, context_cache=None):
+    return get_match_terms(matcher.search(sentence), sentence, section, filters, context_cache)
+
+
+def is_excluded(excluded_matcher: TermMatcher, sentence: str, section='UNKNOWN', filters=None, context_cache=None):
+    for _, match in excluded_matcher.search(sentence):
+        if get_match_terms(match, sentence, section, filters, context_cache):
+            return True
+    return False
+
+
 def get_full_text_matches(matchers, text: str, filters=None, section_headers=None, section_texts=None,
-                          excluded_matchers=None):
+                          excluded_matchers=None, section_sentences=None):
     if filters is None:
         filters = {}
     if section_headers is None:
         section_headers = [UNKNOWN]
     if section_texts is None:
         section_texts = [text]
+    if not isinstance(matchers, TermMatcher):
+        matchers = TermMatcher.from_matchers(matchers)
+    if excluded_matchers and not isinstance(excluded_matchers, TermMatcher):
+        excluded_matchers = TermMatcher.from_matchers(excluded_matchers)
     has_exclusions = excluded_matchers and len(excluded_matchers) > 0
 
     found_terms = list()
+    # the same term is often matched (and checked against exclusions) more than once per sentence
+    context_cache = dict()
 
     for idx in range(0, len(section_headers)):
         section_text = section_texts[idx]
-        sentences = segmentor.parse_sentences(section_text, spacy=spacy)
+        section = section_headers[idx]
+        if section_sentences is not None:
+            sentences = section_sentences[idx]
+        else:
+            sentences = segmentor.parse_sentences(section_text, spacy=spacy)
         # section_code = ".".join([str(i) for i in section_headers[idx].treecode_list])
 
-        list_product = itertools.product(matchers, sentences)
-
-        for l in list_product:
-            found = get_matches(l[0], l[1], section_headers[idx], filters)
-            if found:
-                excluded = False
-                if has_exclusions:
-                    for e in excluded_matchers:
-                        if not excluded:
-                            found_excluded = get_matches(e, l[1], section_headers[idx], filters)
-                            if found_excluded:
-                                excluded = True
-                                break
-                if not excluded:
-                    found_terms.extend(found)
+        # all terms are matched in one pass over each sentence, results are still ordered by term, then sentence
+        found_by_term = dict()
+        for sentence in sentences:
+            excluded = None
+            matches = matchers.search(sentence)
+            if len(matches) > 0:
+                # every match's context is needed below, so they are evaluated together
+                prefetch_context([match.group(0) for _, match in matches], sentence, context_cache)
+            for i, match in matches:
+                found = get_match_terms(match, sentence, section, filters, context_cache)
+                if found:
+                    if excluded is None:
+                        excluded = has_exclusions and is_excluded(excluded_matchers, sentence, section, filters,
+                                                                  context_cache)
+                    if not excluded:
+                        found_by_term.setdefault(i, list()).extend(found)
+
+        for i in sorted(found_by_term.keys()):
+            found_terms.extend(found_by_term[i])
     return found_terms
 
 
-@cached(regex_cache)
+@cached(regex_cache, lock=regex_cache_lock)
 def get_matcher(t):
     return re.compile(r"\b%s\b" % t, re.IGNORECASE)
 
@@ -150,21 +202,24 @@ class TermFinder(BaseModel):
             self.excluded_matchers = [get_matcher(t) for t in excluded_terms]
         else:
             self.excluded_matchers = list()
+        self.term_matcher = TermMatcher.from_matchers(self.matchers)
+        self.excluded_term_matcher = TermMatcher.from_matchers(self.excluded_matchers)
 
     def get_term_matches(self, sentence: str, section='UNKNOWN'):
         term_matches = list()
-        for m in self.matchers:
-            cur = get_matches(m, sentence, section)
+        for _, match in self.term_matcher.search(sentence):
+            cur = get_match_terms(match, sentence, section)
             term_matches.extend(cur)
         return term_matches
 
-    def get_term_full_text_matches(self, full_text: str, section_headers=None, section_texts=None):
+    def get_term_full_text_matches(self, full_text: str, section_headers=None, section_texts=None,
+                                   section_sentences=None):
         if section_headers is None:
             section_headers = [UNKNOWN]
         if section_texts is None:
             section_texts = [full_text]
-        return get_full_text_matches(self.matchers, full_text, self.filters, section_headers, section_texts,
-                                     excluded_matchers=self.excluded_matchers)
+        return get_full_text_matches(self.term_matcher, full_text, self.filters, section_headers, section_texts,
+                                     excluded_matchers=self.excluded_term_matcher, section_sentences=section_sentences)
 
 
 if __name__ == "__main__":
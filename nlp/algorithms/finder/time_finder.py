@@ -133,6 +133,10 @@ To unpack the JSON results:
         json_data = json.loads(json_string)
         time_results = [df.TimeValue(**m) for m in json_data]
 
+Or get the list of TimeValue namedtuples directly, without the JSON:
+
+        time_results = tf.find_times(sentence)
+
         for t in time_results:
             print(t.text)
             print(t.start)
@@ -195,7 +199,7 @@ STR_PM = 'pm'
 
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 6
+_VERSION_MINOR = 7
 _MODULE_NAME = 'time_finder.py'
 
 # set to True to see debug output
@@ -430,6 +434,39 @@ _regexes = [
 # index of the ISO datetime regex in the _regexes array
 _ISO_DATETIME_REGEX_INDEX = 0
 
+# Cheap tests on the sentence that decide which regexes can possibly match.
+# The ISO datetime regex uses \d, which also matches non-ASCII digits.
+_prefilters = {
+    'digit'   : re.compile(r'\d'),
+    'digits2' : re.compile(r'[0-9]{2}'),
+    'digits4' : re.compile(r'[0-9]{4}'),
+    'colon'   : re.compile(r':'),
+    'dash'    : re.compile(r'-'),
+    'am_pm'   : re.compile(r'[aApP]\.?[mM]'),
+}
+
+# the prefilters each regex needs to pass, in the order of _regexes
+_regex_prefilters = [frozenset(p) for p in [
+    ['digit', 'dash'],            # 0  iso datetime
+    ['digits4'],                  # 1  iso hhmm with time zone
+    ['digits4'],                  # 2  iso hhmm
+    ['digits2'],                  # 3  iso hh
+    ['digits2'],                  # 4  iso time
+    ['digits4'],                  # 5  hhmmss, gmt delta
+    ['digits4'],                  # 6  hhmmss, time zone
+    ['digits4'],                  # 7  hhmmss
+    ['digits4'],                  # 8  hhmm
+    ['digit', 'colon', 'am_pm'],  # 9  12 hour notation with am/pm
+    ['digit', 'colon', 'am_pm'],  # 10
+    ['digit', 'colon', 'am_pm'],  # 11
+    ['digit', 'am_pm'],           # 12
+    ['digits2', 'colon'],         # 13 24 hour notation with colons
+    ['digits2', 'colon'],         # 14
+    ['digits2', 'colon'],         # 15
+    ['digit', 'colon'],           # 16
+]]
+assert len(_regex_prefilters) == len(_regexes)
+
 # match (), {}, and []
 _str_brackets = r'[(){}\[\]]'
 _regex_brackets = re.compile(_str_brackets)
@@ -455,12 +492,21 @@ def _clean_sentence(sentence):
 
 
 ###############################################################################
-def run(sentence):
+def _passed_prefilters(sentence):
+    """
+    Return the names of the prefilters that the sentence passes.
+    """
+
+    return {name for name, regex in _prefilters.items() if regex.search(sentence)}
+
+
+###############################################################################
+def find_times(sentence):
     """
 
     Find time expressions in the sentence by attempting to match all regexes.
-    Avoid matching sub-expressions of already-matched strings. Returns a JSON
-    array containing info on each date found.
+    Avoid matching sub-expressions of already-matched strings. Returns a list
+    of TimeValue namedtuples, one for each time expression found.
     
     """    
 
@@ -474,7 +520,11 @@ def run(sentence):
         print('original: {0}'.format(original_sentence))
         print(' cleaned: {0}'.format(sentence))
         
+    # skip the regexes that can't match, keeping the others in their order
+    passed = _passed_prefilters(sentence)
     for regex_index, regex in enumerate(_regexes):
+        if not _regex_prefilters[regex_index] <= passed:
+            continue
         iterator = regex.finditer(sentence)
         for match in iterator:
             match_text = match.group().strip()
@@ -592,10 +642,20 @@ def run(sentence):
         results.append(meas)
 
     # sort results to match order of occurrence in sentence
-    results = sorted(results, key=lambda x: x.start)
+    return sorted(results, key=lambda x: x.start)
+
+
+###############################################################################
+def run(sentence):
+    """
+
+    Find time expressions in the sentence. Returns a JSON array containing
+    info on each time expression found (see find_times).
     
+    """
+
     # convert to list of dicts to preserve field names in JSON output
-    return json.dumps([r._asdict() for r in results], indent=4)
+    return json.dumps([r._asdict() for r in find_times(sentence)], indent=4)
 
 
 ###############################################################################
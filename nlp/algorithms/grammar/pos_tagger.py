@@ -1,12 +1,9 @@
-import en_core_web_sm as english_model
 from data_access import BaseModel
-import time
+from algorithms.models import model_registry
 from algorithms.segmentation import Segmentation
 
 segmentation = Segmentation()
 
-data = {}
-loading_status = 'none'
 tags = {
     "CC": "Coordinating conjunction",
     "CD": "Cardinal number",
@@ -48,26 +45,8 @@ tags = {
 
 
 def nlp_init(tries=0):
-    if tries > 0:
-        print('Retrying, try%d' % tries)
-
-    global loading_status
-    if loading_status == 'none' and 'nlp' not in data:
-        try:
-            print('POSTagger init...')
-            loading_status = 'loading'
-            data['nlp'] = english_model.load()
-            loading_status = 'done'
-        except Exception as exc:
-            print(exc)
-            loading_status = 'none'
-    elif loading_status == 'loading' and tries < 30:
-        time.sleep(10)
-        if loading_status == 'loading':
-            new_tries = tries + 1
-            return nlp_init(tries=new_tries)
-
-    return data['nlp']
+    # tags and dependencies are reported, entities are not
+    return model_registry.get_pipeline('pos_tagger', exclude=['ner'])
 
 
 class Tag(BaseModel):
@@ -88,9 +67,10 @@ class Tag(BaseModel):
             self.description = tag
 
 
-def get_tags(text):
+def get_tags(text, sentences=None):
     spacy = nlp_init()
-    sentences = segmentation.parse_sentences(text)
+    if sentences is None:
+        sentences = segmentation.parse_sentences(text)
     results = []
     for s in sentences:
         s = s.strip()
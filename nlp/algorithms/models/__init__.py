@@ -0,0 +1 @@
+from .model_registry import load_model, get_pipeline, get_model_stats, SharedPipeline, DEFAULT_MODEL
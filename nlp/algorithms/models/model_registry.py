@@ -0,0 +1,159 @@
+"""
+Process-wide registry of spaCy models.
+
+Each model is loaded once per process by load_model. Callers get a
+SharedPipeline from get_pipeline: a lightweight view over the shared model that
+runs only the pipeline components the caller needs. Views share the model's
+vocab and weights, so adding a caller does not add another copy of the model to
+the worker's memory. A caller that customizes tokenization (for instance with
+special cases) asks for a private tokenizer, so its rules do not leak into the
+other callers' documents.
+
+Models are loaded lazily, on first use of a view. Load time and the change in
+process RSS for each model are recorded and available from get_model_stats.
+"""
+
+import os
+import threading
+import time
+
+import spacy
+
+DEFAULT_MODEL = 'en_core_web_sm'
+
+_lock = threading.RLock()
+_models = dict()
+_pipelines = dict()
+_stats = dict()
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        # peak rather than current RSS, but still a useful upper bound where /proc is unavailable
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def load_model(model_name=DEFAULT_MODEL):
+    nlp = _models.get(model_name)
+    if nlp is not None:
+        return nlp
+
+    with _lock:
+        if model_name not in _models:
+            print('Loading spaCy model {}...'.format(model_name))
+            rss_before = _rss_bytes()
+            start = time.time()
+            _models[model_name] = spacy.load(model_name)
+            elapsed = time.time() - start
+            rss_mb = (_rss_bytes() - rss_before) / (1024.0 * 1024.0)
+            _stats[model_name] = {
+                'load_seconds': round(elapsed, 3),
+                'rss_delta_mb': round(rss_mb, 1),
+                'pipeline': list(_models[model_name].pipe_names),
+                'pid': os.getpid()
+            }
+            print('Loaded spaCy model {} in {:.2f}s, RSS +{:.1f} MB'.format(model_name, elapsed, rss_mb))
+        return _models[model_name]
+
+
+class SharedPipeline(object):
+
+    def __init__(self, name, model_name=DEFAULT_MODEL, exclude=None, private_tokenizer=False, add_pipes=None):
+        self.name = name
+        self.model_name = model_name
+        if exclude is None:
+            self.exclude = set()
+        else:
+            self.exclude = set(exclude)
+        self.private_tokenizer = private_tokenizer
+        # factory names of extra components (e.g. 'sentencizer') created for this view only
+        if add_pipes is None:
+            self.add_pipes = list()
+        else:
+            self.add_pipes = list(add_pipes)
+        self._tokenizer = None
+        self._pipeline = None
+
+    @property
+    def nlp(self):
+        return load_model(self.model_name)
+
+    @property
+    def vocab(self):
+        return self.nlp.vocab
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            nlp = self.nlp
+            if self.private_tokenizer:
+                self._tokenizer = nlp.Defaults.create_tokenizer(nlp)
+            else:
+                self._tokenizer = nlp.tokenizer
+        return self._tokenizer
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            nlp = self.nlp
+            pipeline = [(name, proc) for name, proc in nlp.pipeline if name not in self.exclude]
+            pipeline.extend([(name, nlp.create_pipe(name)) for name in self.add_pipes])
+            self._pipeline = pipeline
+        return self._pipeline
+
+    @property
+    def pipe_names(self):
+        return [name for name, _ in self.pipeline]
+
+    def make_doc(self, text):
+        return self.tokenizer(text)
+
+    def __call__(self, text):
+        doc = self.make_doc(text)
+        for _, proc in self.pipeline:
+            doc = proc(doc)
+        return doc
+
+    def pipe(self, texts, batch_size=1000):
+        docs = (self.make_doc(text) for text in texts)
+        for _, proc in self.pipeline:
+            if hasattr(proc, 'pipe'):
+                docs = proc.pipe(docs, batch_size=batch_size)
+            else:
+                docs = _apply(proc, docs)
+        for doc in docs:
+            yield doc
+
+
+def _apply(proc, docs):
+    for doc in docs:
+        yield proc(doc)
+
+
+def get_pipeline(name, model_name=DEFAULT_MODEL, exclude=None, private_tokenizer=False, add_pipes=None):
+    with _lock:
+        if name not in _pipelines:
+            _pipelines[name] = SharedPipeline(name, model_name=model_name, exclude=exclude,
+                                              private_tokenizer=private_tokenizer, add_pipes=add_pipes)
+        return _pipelines[name]
+
+
+def get_model_stats():
+    with _lock:
+        return {
+            'models': {k: dict(v) for k, v in _stats.items()},
+            'pipelines': {k: {'model': v.model_name,
+                              'exclude': sorted(v.exclude),
+                              'add_pipes': list(v.add_pipes),
+                              'private_tokenizer': v.private_tokenizer}
+                          for k, v in _pipelines.items()},
+            'rss_mb': round(_rss_bytes() / (1024.0 * 1024.0), 1)
+        }
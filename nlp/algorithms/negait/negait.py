@@ -54,6 +54,11 @@ To unpack each negation:
 
         negations = [Negait(**n) for n in negation_list]
 
+Or get the NegaitResult directly, without the JSON:
+
+        negait_result = negait.find_negations(sentence)
+        negations = negait_result.negation_list
+
 The fields of each negation can be accessed as:
 
         n.is_morphological,
@@ -129,14 +134,12 @@ reject_set = set()
 
 
 ###############################################################################
-def to_json(original_sentence, morph_results, sent_results, double_results):
+def to_result(original_sentence, morph_results, sent_results, double_results):
     """
-    Convert the results to a JSON string.
+    Convert the results to a NegaitResult namedtuple.
     """
 
-    result_dict = {}
-    result_dict['sentence'] = original_sentence
-    result_dict['negation_list'] = []
+    negation_list = []
 
     for m in morph_results:
         m_dict = {}
@@ -147,7 +150,7 @@ def to_json(original_sentence, morph_results, sent_results, double_results):
         m_dict['index0']           = m.i
         m_dict['token1']           = EMPTY_FIELD
         m_dict['index1']           = EMPTY_FIELD
-        result_dict['negation_list'].append(m_dict)
+        negation_list.append(Negait(**m_dict))
 
     for s in sent_results:
         s_dict = {}
@@ -158,7 +161,7 @@ def to_json(original_sentence, morph_results, sent_results, double_results):
         s_dict['index0']           = s.i
         s_dict['token1']           = s.head.text
         s_dict['index1']           = s.head.i
-        result_dict['negation_list'].append(s_dict)
+        negation_list.append(Negait(**s_dict))
 
     for d in double_results:
         d_dict = {}
@@ -175,8 +178,21 @@ def to_json(original_sentence, morph_results, sent_results, double_results):
             d_dict['index0'] = d[1].i
             d_dict['token1'] = d[0].text
             d_dict['index1'] = d[0].i
-        result_dict['negation_list'].append(d_dict)
+        negation_list.append(Negait(**d_dict))
+
+    return NegaitResult(sentence=original_sentence, negation_list=negation_list)
 
+
+###############################################################################
+def to_json(original_sentence, morph_results, sent_results, double_results):
+    """
+    Convert the results to a JSON string.
+    """
+
+    result = to_result(original_sentence, morph_results, sent_results, double_results)
+    result_dict = {}
+    result_dict['sentence'] = result.sentence
+    result_dict['negation_list'] = [n._asdict() for n in result.negation_list]
     return json.dumps(result_dict, indent=4)
 
 
@@ -297,8 +313,10 @@ def double_negations(morph_results, sent_results):
         
 
 ###############################################################################
-def run(original_sentence, json_output=True):
+def _find_negations(original_sentence):
     """
+    The morphological, sentential and double negations in the sentence, as
+    spaCy tokens.
     """
 
     sentence = original_sentence.lower()
@@ -317,6 +335,25 @@ def run(original_sentence, json_output=True):
     # print('\t   sentential negations: {0}'.format(sent_results))
     # print('\t       double negations: {0}'.format(double_results))
 
+    return (morph_results, sent_results, double_results)
+
+
+###############################################################################
+def find_negations(original_sentence):
+    """
+    Returns a NegaitResult for the negations in the sentence.
+    """
+
+    return to_result(original_sentence, *_find_negations(original_sentence))
+
+
+###############################################################################
+def run(original_sentence, json_output=True):
+    """
+    """
+
+    morph_results, sent_results, double_results = _find_negations(original_sentence)
+
     if json_output:
         return to_json(original_sentence,
                        morph_results, sent_results, double_results)
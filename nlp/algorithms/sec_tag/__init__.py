@@ -2,3 +2,4 @@ from .section_tagger import section_tagger_init
 from .section_tagger import process_report as sec_tag_process
 from .section_tagger import sec_tag_file_path as get_sec_tag_source_tags
 from .section_tagger import UNKNOWN
+from .section_tagger import cid_to_concept_map, concept_to_cid_map
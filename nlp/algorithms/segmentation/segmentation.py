@@ -29,6 +29,25 @@ the module. This method takes a single argument:
 
     text:        the text to be tokenized into sentences
 
+The 'parse_sentences_batch' method segments a list of texts in one call,
+streaming them through spaCy with nlp.pipe. It returns a list of sentence
+lists, one per text, and takes these optional arguments:
+
+    batch_size:  number of texts spaCy processes per batch
+    n_process:   number of worker processes to split the texts across
+
+The spaCy pipeline used for segmentation depends on the Segmentation mode:
+
+    'full':        tagger and parser (default)
+    'parser':      the dependency parser only, which is what assigns sentence
+                   boundaries
+    'sentencizer': spaCy's rule-based sentencizer, no statistical components
+
+Use the --validate option to compare a mode against 'full' on the vitals
+test sentences used by the self-test. The 'parser' and 'sentencizer' modes
+are opt-in, with segmentation_mode in the [optimizations] section of the
+config file, until that comparison has been run and shows no differences.
+
 
 The module can be run from the command line for testing and debugging. It will
 process a JSON file properly configured for ClarityNLP SOLR ingest (i.e. each
@@ -54,6 +73,11 @@ after cleanup and token substitution (immediately prior to tokenization):
 
         python3 ./segmentation.py -f myfile.json --start 115 --end 134 --debug
 
+To check that the 'sentencizer' mode splits the test sentences the same way
+as the full pipeline:
+
+        python3 ./segmentation.py --validate --mode sentencizer
+
 
 """
 
@@ -63,13 +87,15 @@ import sys
 import json
 import time
 import optparse
-import en_core_web_sm as english_model
 from nltk.tokenize import sent_tokenize
 
 if __name__ == '__main__':
     import segmentation_helper as seg_helper
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models'))
+    import model_registry
 else:
     from algorithms.segmentation import segmentation_helper as seg_helper
+    from algorithms.models import model_registry
 
 VERSION_MAJOR = 0
 VERSION_MINOR = 1
@@ -79,50 +105,60 @@ TRACE = False
 
 MODULE_NAME = 'segmentation.py'
 
-data = {}
-loading_status = 'none'
+MODE_FULL = 'full'
+MODE_PARSER = 'parser'
+MODE_SENTENCIZER = 'sentencizer'
+
+# components of the shared en_core_web_sm model that each mode skips; the
+# entity recognizer never affects sentence boundaries
+_MODE_PIPELINES = {
+    MODE_FULL:        {'exclude': ['ner']},
+    MODE_PARSER:      {'exclude': ['tagger', 'ner']},
+    MODE_SENTENCIZER: {'exclude': ['tagger', 'parser', 'ner'],
+                       'add_pipes': ['sentencizer']},
+}
+
+DEFAULT_BATCH_SIZE = 50
 
 ###############################################################################
-def segmentation_init(tries=0):
-    if tries > 0:
-        print('Retrying, try%d' % tries)
+def _configured_mode():
+    # the mode from the config file, 'full' when it isn't set or not available
+    try:
+        import util
+        mode = util.segmentation_mode
+    except (ImportError, AttributeError):
+        return MODE_FULL
+    if mode not in _MODE_PIPELINES:
+        print('unknown segmentation mode {0}, using {1}'.format(mode, MODE_FULL))
+        return MODE_FULL
+    return mode
 
-    global loading_status
-    if loading_status == 'none' and 'nlp' not in data:
-        try:
-            print('Segmentation init...')
-            loading_status = 'loading'
-            data['nlp'] = english_model.load()
-            loading_status = 'done'
-        except Exception as exc:
-            print(exc)
-            loading_status = 'none'
-    elif loading_status == 'loading' and tries < 30:
-        time.sleep(10)
-        if loading_status == 'loading':
-            new_tries = tries + 1
-            return segmentation_init(tries=new_tries)
-
-    return data['nlp']
 
+DEFAULT_MODE = _configured_mode()
 
 ###############################################################################
-def parse_sentences_spacy(text, spacy=None):
+def segmentation_init(tries=0, mode=DEFAULT_MODE):
+    if mode not in _MODE_PIPELINES:
+        raise ValueError('unknown segmentation mode: {0}'.format(mode))
+    # shared en_core_web_sm instance, running only what the mode needs
+    return model_registry.get_pipeline('segmentation_' + mode,
+                                       **_MODE_PIPELINES[mode])
 
-    # spacy = segmentation_init()
-    # doc = spacy(text)
-    # return [sent.string.strip() for sent in doc.sents]
-    if not spacy:
-        spacy = segmentation_init()
+
+###############################################################################
+def _prepare_text(text):
 
     # Do some cleanup and substitutions before tokenizing. The substitutions
     # replace strings of tokens that tend to be incorrectly split with
     # a single token that will not be split.
     text = seg_helper.cleanup_report(text)
     text = seg_helper.do_substitutions(text)
+    return text
+
+
+###############################################################################
+def _doc_to_sentences(doc):
 
-    # now do the sentence tokenization with the substitutions in place
-    doc = spacy(text)
     sentences = [sent.string.strip() for sent in doc.sents]
 
     # fix various problems and undo the substitutions
@@ -135,10 +171,66 @@ def parse_sentences_spacy(text, spacy=None):
     return sentences
 
 
+###############################################################################
+def parse_sentences_spacy(text, spacy=None, mode=DEFAULT_MODE):
+
+    if not spacy:
+        spacy = segmentation_init(mode=mode)
+
+    # now do the sentence tokenization with the substitutions in place
+    doc = spacy(_prepare_text(text))
+    return _doc_to_sentences(doc)
+
+
+###############################################################################
+def _parse_sentences_chunk(args):
+
+    texts, batch_size, mode = args
+    return parse_sentences_batch(texts, batch_size=batch_size, mode=mode)
+
+
+###############################################################################
+def parse_sentences_batch(texts, spacy=None, batch_size=DEFAULT_BATCH_SIZE,
+                          n_process=1, mode=DEFAULT_MODE):
+    """
+    Segment a list of texts in one call. Returns a list of sentence lists,
+    in the same order as 'texts'.
+
+    With n_process > 1 the texts are split into contiguous chunks that are
+    segmented in a pool of forked worker processes.
+    """
+
+    texts = list(texts)
+    if 0 == len(texts):
+        return []
+
+    if n_process is not None and n_process > 1 and len(texts) > batch_size:
+        import multiprocessing
+
+        # load the model before forking so that workers share its pages
+        segmentation_init(mode=mode).pipeline
+        chunk_size = max(batch_size, (len(texts) + n_process - 1) // n_process)
+        chunks = [(texts[i:i+chunk_size], batch_size, mode)
+                  for i in range(0, len(texts), chunk_size)]
+        with multiprocessing.Pool(min(n_process, len(chunks))) as pool:
+            results = pool.map(_parse_sentences_chunk, chunks)
+        return [sentences for chunk in results for sentences in chunk]
+
+    if not spacy:
+        spacy = segmentation_init(mode=mode)
+
+    prepared = (_prepare_text(t) for t in texts)
+    return [_doc_to_sentences(doc)
+            for doc in spacy.pipe(prepared, batch_size=batch_size)]
+
+
 ###############################################################################
 class Segmentation(object):
 
-    def __init__(self):
+    def __init__(self, mode=DEFAULT_MODE):
+        if mode not in _MODE_PIPELINES:
+            raise ValueError('unknown segmentation mode: {0}'.format(mode))
+        self.mode = mode
         self.regex_multi_space = re.compile(r' +')
         self.regex_multi_newline = re.compile(r'\n+')
 
@@ -152,7 +244,12 @@ class Segmentation(object):
         return cleaned_text
 
     def parse_sentences(self, text, spacy=None):
-        return parse_sentences_spacy(text, spacy)
+        return parse_sentences_spacy(text, spacy, mode=self.mode)
+
+    def parse_sentences_batch(self, texts, batch_size=DEFAULT_BATCH_SIZE,
+                              n_process=1):
+        return parse_sentences_batch(texts, batch_size=batch_size,
+                                     n_process=n_process, mode=self.mode)
 
     def parse_sentences_nltk(self, text):
         # needs punkt
@@ -160,47 +257,49 @@ class Segmentation(object):
 
 
 ###############################################################################
-def run_tests():
-
-    seg_obj = Segmentation()
-
-    # sentences for testing vitals recognition
-    SENTENCES = [
-        'VS: T 95.6 HR 45 BP 75/30 RR 17 98% RA.',
-        'VS T97.3 P84 BP120/56 RR16 O2Sat98 2LNC',
-        'Height: (in) 74 Weight (lb): 199 BSA (m2): 2.17 m2 '                +\
-        'BP (mm Hg): 140/91 HR (bpm): 53',
-        'Vitals: T: 99 BP: 115/68 P: 79 R:21 O2: 97',
-        'Vitals - T 95.5 BP 132/65 HR 78 RR 20 SpO2 98%/3L',
-        'VS: T=98 BP= 122/58  HR= 7 RR= 20  O2 sat= 100% 2L NC',
-        'VS:  T-100.6, HR-105, BP-93/46, RR-16, Sats-98% 3L/NC',
-        'VS - Temp. 98.5F, BP115/65 , HR103 , R16 , 96O2-sat % RA',
-        'Vitals: Temp 100.2 HR 72 BP 184/56 RR 16 sats 96% on RA',
-        'PHYSICAL EXAM: O: T: 98.8 BP: 123/60   HR:97    R 16  O2Sats100%',
-        'VS before transfer were 85 BP 99/34 RR 20 SpO2% 99/bipap 10/5 50%.',
-        'In the ED, initial vs were: T 98 P 91 BP 122/63 R 20 O2 sat 95%RA.',
-        'In the ED initial vitals were HR 106, BP 88/56, RR 20, O2 Sat '     +\
-        '85% 3L.',
-        'In the ED, initial vs were: T=99.3, P=120, BP=111/57, RR=24, '      +\
-        'POx=100%.',
-        'Upon transfer her vitals were HR=120, BP=109/44, RR=29, POx=93% '   +\
-        'on 8L FM.',
-        'Vitals in PACU post-op as follows: BP 120/80 HR 60-80s RR  '        +\
-        'SaO2 96% 6L NC.',
-        'In the ED, initial vital signs were T 97.5, HR 62, BP 168/60, '     +\
-        'RR 18, 95% RA.',
-        'T 99.4 P 160 R 56 BP 60/36 mean 44 O2 sat 97% Wt 3025 grams '       +\
-        'Lt 18.5 inches HC 35 cm',
-        'In the ED, initial vital signs were T 97.0, BP 85/44, HR 107, '     +\
-        'RR 28, and SpO2 91% on NRB.',
-        'Prior to transfer, his vitals were BP 119/53 (105/43 sleeping), '   +\
-        'HR 103, RR 15, and SpO2 97% on NRB.',
-        'In the ED inital vitals were, Temperature 100.8, Pulse: 103, '      +\
-        'RR: 28, BP: 84/43, O2Sat: 88, O2 Flow: 100 (Non-Rebreather).',
-        'At clinic, he was noted to have increased peripheral edema and '    +\
-        'was sent to the ED where his vitals were T 97.1 HR 76 BP 148/80 '   +\
-        'RR 25 SpO2 92%/RA.',
-    ]
+# sentences for testing vitals recognition
+SENTENCES = [
+    'VS: T 95.6 HR 45 BP 75/30 RR 17 98% RA.',
+    'VS T97.3 P84 BP120/56 RR16 O2Sat98 2LNC',
+    'Height: (in) 74 Weight (lb): 199 BSA (m2): 2.17 m2 '                +\
+    'BP (mm Hg): 140/91 HR (bpm): 53',
+    'Vitals: T: 99 BP: 115/68 P: 79 R:21 O2: 97',
+    'Vitals - T 95.5 BP 132/65 HR 78 RR 20 SpO2 98%/3L',
+    'VS: T=98 BP= 122/58  HR= 7 RR= 20  O2 sat= 100% 2L NC',
+    'VS:  T-100.6, HR-105, BP-93/46, RR-16, Sats-98% 3L/NC',
+    'VS - Temp. 98.5F, BP115/65 , HR103 , R16 , 96O2-sat % RA',
+    'Vitals: Temp 100.2 HR 72 BP 184/56 RR 16 sats 96% on RA',
+    'PHYSICAL EXAM: O: T: 98.8 BP: 123/60   HR:97    R 16  O2Sats100%',
+    'VS before transfer were 85 BP 99/34 RR 20 SpO2% 99/bipap 10/5 50%.',
+    'In the ED, initial vs were: T 98 P 91 BP 122/63 R 20 O2 sat 95%RA.',
+    'In the ED initial vitals were HR 106, BP 88/56, RR 20, O2 Sat '     +\
+    '85% 3L.',
+    'In the ED, initial vs were: T=99.3, P=120, BP=111/57, RR=24, '      +\
+    'POx=100%.',
+    'Upon transfer her vitals were HR=120, BP=109/44, RR=29, POx=93% '   +\
+    'on 8L FM.',
+    'Vitals in PACU post-op as follows: BP 120/80 HR 60-80s RR  '        +\
+    'SaO2 96% 6L NC.',
+    'In the ED, initial vital signs were T 97.5, HR 62, BP 168/60, '     +\
+    'RR 18, 95% RA.',
+    'T 99.4 P 160 R 56 BP 60/36 mean 44 O2 sat 97% Wt 3025 grams '       +\
+    'Lt 18.5 inches HC 35 cm',
+    'In the ED, initial vital signs were T 97.0, BP 85/44, HR 107, '     +\
+    'RR 28, and SpO2 91% on NRB.',
+    'Prior to transfer, his vitals were BP 119/53 (105/43 sleeping), '   +\
+    'HR 103, RR 15, and SpO2 97% on NRB.',
+    'In the ED inital vitals were, Temperature 100.8, Pulse: 103, '      +\
+    'RR: 28, BP: 84/43, O2Sat: 88, O2 Flow: 100 (Non-Rebreather).',
+    'At clinic, he was noted to have increased peripheral edema and '    +\
+    'was sent to the ED where his vitals were T 97.1 HR 76 BP 148/80 '   +\
+    'RR 25 SpO2 92%/RA.',
+]
+
+
+###############################################################################
+def run_tests(mode=DEFAULT_MODE):
+
+    seg_obj = Segmentation(mode)
 
     seg_helper.enable_debug()
 
@@ -214,6 +313,32 @@ def run_tests():
     seg_helper.disable_debug()
 
 
+###############################################################################
+def validate_mode(mode, reference_mode=MODE_FULL, texts=None):
+    """
+    Segment 'texts' (the vitals test sentences by default) with both 'mode'
+    and 'reference_mode', one at a time and in a single batch. Returns a list
+    of (index, expected, actual) tuples for every text on which the results
+    differ; an empty list means the modes agree.
+    """
+
+    if texts is None:
+        texts = SENTENCES
+
+    expected = [parse_sentences_spacy(t, mode=reference_mode) for t in texts]
+    actual = [parse_sentences_spacy(t, mode=mode) for t in texts]
+    batched = parse_sentences_batch(texts, mode=mode)
+
+    mismatches = []
+    for i in range(len(texts)):
+        if actual[i] != expected[i]:
+            mismatches.append( (i, expected[i], actual[i]) )
+        elif batched[i] != expected[i]:
+            mismatches.append( (i, expected[i], batched[i]) )
+
+    return mismatches
+
+
 ###############################################################################
 def get_version():
     str1 = '{0} {1}.{2}'.format(MODULE_NAME, VERSION_MAJOR, VERSION_MINOR)
@@ -226,7 +351,7 @@ def get_version():
 def show_help():
     print(get_version())
     print("""
-    USAGE: python3 ./{0} -f <filename> [-s <start_indx> -e <end_indx>] [-dhvz]
+    USAGE: python3 ./{0} -f <filename> [-s <start_indx> -e <end_indx>] [-m <mode>] [-dhvz]
 
     OPTIONS:
 
@@ -234,6 +359,8 @@ def show_help():
         -s, --start    <integer>           Index of first record to process.
         -e, --end      <integer>           Index of final record to process.
                                            Indexing begins at 0.
+        -m, --mode     <string>            Segmentation mode: 'full'
+                                           (default), 'parser' or 'sentencizer'.
 
     FLAGS:
 
@@ -241,6 +368,8 @@ def show_help():
         -h, --help           Print this information and exit.
         -v, --version        Print version information and exit.
         -z, --selftest       Run self-tests and exit.
+        --validate           Compare the mode against 'full' on the self-test
+                             sentences and exit.
 
     """.format(MODULE_NAME))
 
@@ -248,8 +377,6 @@ def show_help():
 ###############################################################################
 if __name__ == '__main__':
 
-    seg_obj = Segmentation()
-
     optparser = optparse.OptionParser(add_help_option=False)
     optparser.add_option('-f', '--file', action='store',
                          dest='filepath')
@@ -265,6 +392,10 @@ if __name__ == '__main__':
                          dest='show_help', default=False)
     optparser.add_option('-z', '--selftest', action='store_true',
                          dest='selftest', default=False)
+    optparser.add_option('-m', '--mode', action='store',
+                         dest='mode', default=DEFAULT_MODE)
+    optparser.add_option('--validate', action='store_true',
+                         dest='validate', default=False)
 
     opts, other = optparser.parse_args(sys.argv)
 
@@ -276,10 +407,25 @@ if __name__ == '__main__':
         print(get_version())
         sys.exit(0)
 
+    if opts.mode not in _MODE_PIPELINES:
+        print('Unknown mode: {0}'.format(opts.mode))
+        sys.exit(-1)
+
+    seg_obj = Segmentation(opts.mode)
+
     if opts.selftest:
-        run_tests()
+        run_tests(opts.mode)
         sys.exit(0)
 
+    if opts.validate:
+        mismatches = validate_mode(opts.mode)
+        for index, expected, actual in mismatches:
+            print('[{0:3}]\texpected: {1}'.format(index, expected))
+            print('\tactual:   {0}'.format(actual))
+        print('{0}: {1} of {2} test sentences differ from {3}'.format(
+            opts.mode, len(mismatches), len(SENTENCES), MODE_FULL))
+        sys.exit(0 if 0 == len(mismatches) else 1)
+
     start_index = None
     if opts.start_index:
         start_index = int(opts.start_index)
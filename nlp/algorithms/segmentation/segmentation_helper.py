@@ -10,15 +10,14 @@ For import only.
 import re
 import os
 import sys
-import json
 
 # imports from other ClarityNLP modules
 try:
     # for normal operation via NLP pipeline
     from algorithms.finder.date_finder import run as \
         run_date_finder, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-    from algorithms.finder.size_measurement_finder import run as \
-        run_size_measurement, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
+    from algorithms.finder.size_measurement_finder import \
+        find_size_measurements, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
 except Exception as e:
     # If here, this module was executed directly from the segmentation
     # folder for testing. Construct path to nlp/algorithms/finder and
@@ -33,9 +32,8 @@ except Exception as e:
     sys.path.append(finder_dir)
     from date_finder import run as run_date_finder, \
         DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-    from size_measurement_finder import run as \
-        run_size_measurement, SizeMeasurement, EMPTY_FIELD as \
-        EMPTY_SMF_FIELD
+    from size_measurement_finder import find_size_measurements, \
+        SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
 
 VERSION_MAJOR = 0
 VERSION_MINOR = 2
@@ -162,14 +160,9 @@ def find_size_meas_subs(report, sub_list, text):
     """
     """
 
-    json_string = run_size_measurement(report)
-    if '[]' == json_string:
+    measurements = find_size_measurements(report)
+    if 0 == len(measurements):
         return report
-    
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of SizeMeasurement namedtuples
-    measurements = [SizeMeasurement(**m) for m in json_data]
 
     counter = 0
     prev_end = 0
@@ -78,6 +78,17 @@ To unpack the array of values:
             print(v.end)
             etc.
 
+To skip the JSON, call 'extract_values' with the same arguments as 'run'. It
+returns a ValueResult whose measurementList is a list of Value namedtuples,
+or None if no values were found.
+
+When the same terms are searched for in many sentences, split and clean them
+once with 'prepare_terms' and pass the result in place of the term string:
+
+        terms = ve.prepare_terms(search_term_string, enumlist, is_case_sensitive)
+        for sentence in sentences:
+            json_string = ve.run(terms, sentence, minval, maxval)
+
 The 'run' function has the following signature:
 
         def run(term_string, sentence, str_minval=None, str_maxval=None,
@@ -99,17 +110,18 @@ import re
 import os
 import sys
 import json
+from functools import lru_cache
 from collections import namedtuple
 
 # imports from ClarityNLP core
 try:
     # for normal operation via NLP pipeline
-    from algorithms.finder.date_finder import run as \
-        run_date_finder, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-    from algorithms.finder.time_finder import run as \
-        run_time_finder, TimeValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-    from algorithms.finder.size_measurement_finder import run as \
-        run_size_measurement, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
+    from algorithms.finder.date_finder import find_dates, \
+        DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
+    from algorithms.finder.time_finder import find_times, \
+        TimeValue, EMPTY_FIELD as EMPTY_DATE_FIELD
+    from algorithms.finder.size_measurement_finder import \
+        find_size_measurements, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
 except Exception as e:
     # If here, this module was executed directly from the value_extraction
     # folder for testing. Construct path to nlp/algorithms/finder and perform
@@ -121,13 +133,12 @@ except Exception as e:
         nlp_dir = this_module_dir[:pos+4]
         finder_dir = os.path.join(nlp_dir, 'algorithms', 'finder')
         sys.path.append(finder_dir)
-        from date_finder import run as run_date_finder, \
+        from date_finder import find_dates, \
             DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-        from time_finder import run as run_time_finder, \
+        from time_finder import find_times, \
             TimeValue, EMPTY_FIELD as EMPTY_TIME_FIELD
-        from size_measurement_finder import run as \
-            run_size_measurement, SizeMeasurement, EMPTY_FIELD as \
-            EMPTY_SMF_FIELD
+        from size_measurement_finder import find_size_measurements, \
+            SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
 
 
 # returned if no results found
@@ -161,11 +172,20 @@ STR_FRACTION_RANGE = 'FRACTION_RANGE'
 ValueMeasurement = namedtuple('ValueMeasurement',
                               'text start end num1 num2 cond matching_term')
 
+# query terms and enumlist terms split, sorted and cleaned by prepare_terms,
+# which can be passed to extract_values or run in place of the term string;
+# term_dict and filter_term_dict map the cleaned terms to the original terms
+PREPARED_TERMS_FIELDS = [
+    'terms', 'original_terms', 'filter_terms', 'original_filter_terms',
+    'is_enumlist', 'is_case_sensitive', 'term_dict', 'filter_term_dict'
+]
+PreparedTerms = namedtuple('PreparedTerms', PREPARED_TERMS_FIELDS)
+
 
 ###############################################################################
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 15
+_VERSION_MINOR = 16
 _MODULE_NAME = 'value_extractor.py'
 
 # set to True to enable debug output
@@ -317,9 +337,16 @@ _DURATION_GROUP_NAMES = ['dur_amt', 'dur_amt1']
 _str_enum_suffix = r'\s*(st|nd|rd|th)'
 _regex_enum_suffix = re.compile(_str_enum_suffix)
 
-# used to restore original terms and original filter terms
-_term_dict = {}
-_filter_term_dict = {}
+# number of query terms whose compiled regexes are kept
+_PATTERN_CACHE_SIZE = 1024
+
+_regex_bf = re.compile(_str_bf)
+
+# compiled regexes for a single query term
+_QueryPatterns = namedtuple('_QueryPatterns', [
+    'bf_fraction_range', 'fraction_range', 'fraction', 'units_range',
+    'bf_range', 'range', 'op_val', 'wds_val'
+])
 
 
 ###############################################################################
@@ -330,25 +357,19 @@ def enable_debug():
 
 
 ###############################################################################
-def _to_json(original_terms, original_sentence, results, filter_terms):
+def _to_value_result(prepared, original_sentence, results):
     """
-    Convert results to a JSON string.
+    Convert results to a ValueResult namedtuple.
     """
 
     if _TRACE:
-        print('calling _to_json...')
+        print('calling _to_value_result...')
 
     total = len(results)
-    has_enumlist = len(filter_terms) > 0
+    has_enumlist = len(prepared.filter_terms) > 0
     
-    result_dict = {}
-    result_dict['sentence'] = original_sentence
-    result_dict['measurementCount'] = len(results)
-    result_dict['terms'] = original_terms
-    result_dict['querySuccess'] = len(results) > 0
-
-    # build a list of dictionaries for the value measurements
-    dict_list = []
+    # build a list of Value namedtuples for the value measurements
+    value_list = []
     for m in results:
         m_dict = {}
 
@@ -360,9 +381,9 @@ def _to_json(original_terms, original_sentence, results, filter_terms):
         m_dict['start'] = m.start
         m_dict['end'] = m.end
         m_dict['condition'] = m.cond
-        m_dict['matchingTerm'] = _term_dict[m.matching_term]
+        m_dict['matchingTerm'] = prepared.term_dict[m.matching_term]
         if has_enumlist:
-            m_dict['x'] = _filter_term_dict[m.num1]
+            m_dict['x'] = prepared.filter_term_dict[m.num1]
         else:
             m_dict['x'] = m.num1
 
@@ -385,9 +406,24 @@ def _to_json(original_terms, original_sentence, results, filter_terms):
         m_dict['minValue'] = minval
         m_dict['maxValue'] = maxval
 
-        dict_list.append(m_dict)
+        value_list.append(Value(**m_dict))
+
+    return ValueResult(
+        sentence = original_sentence,
+        measurementCount = len(results),
+        terms = list(prepared.original_terms),
+        querySuccess = len(results) > 0,
+        measurementList = value_list)
 
-    result_dict['measurementList'] = dict_list
+
+###############################################################################
+def _to_json(value_result):
+    """
+    Convert a ValueResult to a JSON string.
+    """
+
+    result_dict = value_result._asdict()
+    result_dict['measurementList'] = [v._asdict() for v in value_result.measurementList]
     return json.dumps(result_dict, indent=4)
 
     
@@ -518,6 +554,53 @@ def _get_query_start(query_term):
     return str_start
 
 
+###############################################################################
+@lru_cache(maxsize=_PATTERN_CACHE_SIZE)
+def _get_query_patterns(query_term):
+    """
+    Compile the value extraction regexes for a query term. The query term has
+    already been cleaned (and lowercased unless the match is case sensitive),
+    so the term alone identifies the regexes.
+    """
+
+    str_start = _get_query_start(query_term)
+
+    return _QueryPatterns(
+        # two fractions with a range separator inbetween
+        bf_fraction_range = re.compile(str_start + _str_cond +
+                                       _str_bf_fraction_range),
+        fraction_range = re.compile(str_start + _str_cond +
+                                    _str_fraction_range),
+        # find two ints separated by '/', such as blood pressure values
+        fraction = re.compile(str_start + _str_cond +
+                              r'(?P<frac>' + _str_fraction + r')'),
+        # two numbers with a range separator inbetween
+        units_range = re.compile(str_start + _str_cond + _str_units_range),
+        bf_range = re.compile(str_start + _str_cond + _str_bf_range),
+        range = re.compile(str_start + _str_cond + _str_range),
+        # <query> <operator> <value>
+        op_val = re.compile(str_start + _str_cond + _str_val),
+        # <query> <words> <value>
+        wds_val = re.compile(str_start + _str_val)
+    )
+
+
+###############################################################################
+@lru_cache(maxsize=_PATTERN_CACHE_SIZE)
+def _get_enum_query_regex(query_term):
+    """
+    Compile the enumlist regex for a query term.
+    """
+
+    str_word_query = re.escape(query_term)
+    str_enum_query = str_word_query                                          +\
+        r'(?P<words>'                                                        +\
+        r'\s*(' + _str_enumlist_value + r'\s*){0,8}'                         +\
+        r')'
+
+    return re.compile(str_enum_query)
+
+
 ###############################################################################
 def _extract_enumlist_values(query_terms, sentence, filter_words):
     """
@@ -534,13 +617,7 @@ def _extract_enumlist_values(query_terms, sentence, filter_words):
     results = []
     for query_term in query_terms:
         if _TRACE: print('\tsearching for query term "{0}"'.format(query_term))
-        str_word_query = re.escape(query_term)
-        str_enum_query = str_word_query                                      +\
-            r'(?P<words>'                                                    +\
-            r'\s*(' + _str_enumlist_value + r'\s*){0,8}'                     +\
-            r')'
-
-        iterator = re.finditer(str_enum_query, sentence)
+        iterator = _get_enum_query_regex(query_term).finditer(sentence)
         for match in iterator:
             if _TRACE:
                 print("\t\tmatch '{0}' start: {1}".
@@ -592,32 +669,13 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
             print('\tno digits found in sentence: {0}'.format(sentence))
         return []
 
-    str_start = _get_query_start(query_term)
-    
-    # find two ints separated by '/', such as blood pressure values
-    str_fraction_query = str_start + _str_cond                               +\
-        r'(?P<frac>' + _str_fraction + r')'
-    
-    # two fractions with a range separator inbetween
-    str_fraction_range_query = str_start + _str_cond + _str_fraction_range
-    str_bf_fraction_range_query = str_start + _str_cond + _str_bf_fraction_range
-    
-    # <query> <operator> <value>
-    str_op_val_query = str_start + _str_cond + _str_val
-    
-    # two numbers with a range separator inbetween
-    str_range_query = str_start + _str_cond + _str_range
-    str_bf_range_query = str_start + _str_cond + _str_bf_range
-    str_units_range_query = str_start + _str_cond + _str_units_range
-
-    # <query> <words> <value>
-    str_wds_val_query = str_start + _str_val
+    patterns = _get_query_patterns(query_term)
 
     spans   = []  # [start, end) character offsets of each match
     results = []  # ValueMeasurement namedtuple results
 
     # check for bf fraction ranges first
-    iterator = re.finditer(str_bf_fraction_range_query, sentence)
+    iterator = patterns.bf_fraction_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched bf_fraction_range_query: {0}'.format(match.group()))
@@ -643,7 +701,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
             spans.append( (start, end))
 
     # check for other fraction ranges
-    iterator = re.finditer(str_fraction_range_query, sentence)
+    iterator = patterns.fraction_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched fraction_range_query: {0}'.format(match.group()))
@@ -664,7 +722,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
 
     # check for fractions
-    iterator = re.finditer(str_fraction_query, sentence)
+    iterator = patterns.fraction.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched fraction_query: {0}'.format(match.group()))
@@ -684,7 +742,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
 
     # check for units range query
-    iterator = re.finditer(str_units_range_query, sentence)
+    iterator = patterns.units_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched units_range_query: {0}'.format(match.group()))
@@ -722,7 +780,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                       cond, query_term)
 
     # check for bf numeric ranges
-    iterator = re.finditer(str_bf_range_query, sentence)
+    iterator = patterns.bf_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched bf_range_query: {0}'.format(match.group()))
@@ -736,7 +794,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
             
     # check for numeric ranges
-    iterator = re.finditer(str_range_query, sentence)
+    iterator = patterns.range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched range query: {0}'.format(match.group()))
@@ -750,7 +808,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
 
     # check for op-value matches
-    iterator = re.finditer(str_op_val_query, sentence)
+    iterator = patterns.op_val.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched op_val_query: {0}'.format(match.group()))
@@ -765,7 +823,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
         if val >= minval and val <= maxval:
             words = match.group('words')
             cond_words = match.group('cond').strip()
-            if re.search(_str_bf, words) or re.search(_str_bf, cond_words):
+            if _regex_bf.search(words) or _regex_bf.search(cond_words):
                 # found only a single digit of a range
                 if _TRACE:
                     print('\t\tdiscarding, missing second value')
@@ -775,7 +833,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
             
     # check for wds-value matches
-    iterator = re.finditer(str_wds_val_query, sentence)
+    iterator = patterns.wds_val.finditer(sentence)
     for match in iterator:
         if _TRACE:
             print('\tmatched wds_val_query: {0}'.format(match.group()))
@@ -789,7 +847,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
 
         val = _get_suffixed_num(match, 'val', 'suffix')
         if val >= minval and val <= maxval:
-            if re.search(_str_bf, words):
+            if _regex_bf.search(words):
                 # found only a single digit of a range
                 if _TRACE:
                     print('\t\tdiscarding, missing second value')
@@ -1264,11 +1322,7 @@ def _clean_sentence(sentence, is_case_sensitive):
     sentence = string_list[0]
     
     # find date expressions in the sentence
-    json_string = run_date_finder(sentence)
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of DateMeasurement namedtuples
-    dates = [DateValue(**record) for record in json_data]
+    dates = find_dates(sentence)
 
     # erase each date expression from the sentence
     for date in dates:
@@ -1286,11 +1340,7 @@ def _clean_sentence(sentence, is_case_sensitive):
             sentence = _erase(sentence, start, end)
 
     # find size measurements in the sentence
-    json_string = run_size_measurement(sentence)
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of SizeMeasurement namedtuples
-    measurements = [SizeMeasurement(**m) for m in json_data]
+    measurements = find_size_measurements(sentence)
 
     # erase each size measurement from the sentence except for those in
     # units of cc's and inches
@@ -1312,11 +1362,7 @@ def _clean_sentence(sentence, is_case_sensitive):
         sentence = _erase(sentence, start, end)
 
     # find time expressions in the sentence
-    json_string = run_time_finder(sentence)
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of TimeValue namedtuples
-    times = [TimeValue(**record) for record in json_data]
+    times = find_times(sentence)
 
     # erase each time expression from the sentence
     for t in times:
@@ -1356,40 +1402,19 @@ def _clean_sentence(sentence, is_case_sensitive):
 
 
 ###############################################################################
-def run(term_string,             # comma-separated string of query terms
-        sentence,
-        str_minval=None,
-        str_maxval=None,
-        str_enumlist=None,       # comma-separated string of terms
-        is_case_sensitive=False,
-        is_denom_only=False):    # return denominators of fractions
-
-    if _TRACE:
-        print('\ncalled value_extractor run...')
-        print('\tARGUMENTS: ')
-        print('\t      term_string: {0}'.format(term_string))
-        print('\t         sentence: {0}'.format(sentence))
-        print('\t       str_minval: {0}'.format(str_minval))
-        print('\t       str_maxval: {0}'.format(str_maxval))
-        print('\t     str_enumlist: {0}'.format(str_enumlist))
-        print('\tis_case_sensitive: {0}'.format(is_case_sensitive))
-        print('\t    is_denom_only: {0}'.format(is_denom_only))
-
-    assert term_string is not None
+def prepare_terms(term_string,             # comma-separated string of query terms
+                  str_enumlist=None,       # comma-separated string of terms
+                  is_case_sensitive=False):
+    """
+    Split, sort and clean the query terms and enumlist terms. The result can
+    be passed to extract_values or run in place of the term string, so that
+    terms used for many sentences are only prepared once.
+    """
 
     # treat empty enumlist as None
     if str_enumlist is not None and isinstance(str_enumlist, list) and \
        0 == len(str_enumlist):
         str_enumlist = None
-    
-    # use default minval and maxval if not provided
-    if str_enumlist is None and str_minval is None:
-        str_minval = '-' + str(sys.float_info.max)
-    if str_enumlist is None and str_maxval is None:
-        str_maxval = str(sys.float_info.max)
-    
-    # save a copy of the original sentence (needed for results)
-    original_sentence = sentence
 
     terms = term_string.split(',') # produces a list
     terms = [term.strip() for term in terms]
@@ -1420,27 +1445,80 @@ def run(term_string,             # comma-separated string of query terms
         if str_enumlist is not None:
             filter_terms = [ft.lower() for ft in filter_terms]
 
-    if _TRACE:
-        print('\n\tterms: {0}'.format(terms))
-        if str_enumlist is not None:
-            print('\tfilter_terms: {0}'.format(filter_terms))
-                
     # map the new terms to the original, so can restore in output
+    term_dict = {}
     for i in range(len(terms)):
         new_term = terms[i]
         original_term = original_terms[i]
-        _term_dict[new_term] = original_term
+        term_dict[new_term] = original_term
         if _TRACE:
             print('\tterm_dict[{0}] => {1}'.format(new_term, original_term))
+    filter_term_dict = {}
     if str_enumlist is not None:
         for i in range(len(filter_terms)):
             new_term = filter_terms[i]
             original_term = original_filter_terms[i]
-            _filter_term_dict[new_term] = original_term
+            filter_term_dict[new_term] = original_term
             if _TRACE:
                 print('\tfilter_term_dict[{0}] => {1}'.format(new_term, original_term))
 
-    if str_enumlist is None:
+    return PreparedTerms(terms, original_terms, filter_terms,
+                         original_filter_terms, str_enumlist is not None,
+                         is_case_sensitive, term_dict, filter_term_dict)
+
+
+###############################################################################
+def extract_values(term_string,             # comma-separated string of query terms
+                   sentence,
+                   str_minval=None,
+                   str_maxval=None,
+                   str_enumlist=None,       # comma-separated string of terms
+                   is_case_sensitive=False,
+                   is_denom_only=False):    # return denominators of fractions
+    """
+    Returns a ValueResult for the values found in the sentence, or None if
+    there are none. The term_string can also be the PreparedTerms returned
+    by prepare_terms, which then supply the enumlist and case sensitivity.
+    """
+
+    if _TRACE:
+        print('\ncalled value_extractor extract_values...')
+        print('\tARGUMENTS: ')
+        print('\t      term_string: {0}'.format(term_string))
+        print('\t         sentence: {0}'.format(sentence))
+        print('\t       str_minval: {0}'.format(str_minval))
+        print('\t       str_maxval: {0}'.format(str_maxval))
+        print('\t     str_enumlist: {0}'.format(str_enumlist))
+        print('\tis_case_sensitive: {0}'.format(is_case_sensitive))
+        print('\t    is_denom_only: {0}'.format(is_denom_only))
+
+    assert term_string is not None
+
+    if isinstance(term_string, PreparedTerms):
+        prepared = term_string
+    else:
+        prepared = prepare_terms(term_string, str_enumlist, is_case_sensitive)
+
+    terms = prepared.terms
+    filter_terms = prepared.filter_terms
+    is_enumlist = prepared.is_enumlist
+    is_case_sensitive = prepared.is_case_sensitive
+    
+    # use default minval and maxval if not provided
+    if not is_enumlist and str_minval is None:
+        str_minval = '-' + str(sys.float_info.max)
+    if not is_enumlist and str_maxval is None:
+        str_maxval = str(sys.float_info.max)
+    
+    # save a copy of the original sentence (needed for results)
+    original_sentence = sentence
+
+    if _TRACE:
+        print('\n\tterms: {0}'.format(terms))
+        if is_enumlist:
+            print('\tfilter_terms: {0}'.format(filter_terms))
+                
+    if not is_enumlist:
         # do range check on numerator values for fractions
         if isinstance(str_minval, str):
             if -1 != str_minval.find('/'):
@@ -1458,7 +1536,7 @@ def run(term_string,             # comma-separated string of query terms
     sentence = _clean_sentence(sentence, is_case_sensitive)
 
     results = []
-    if str_enumlist is not None:
+    if is_enumlist:
         results = _extract_enumlist_values(terms, sentence, filter_terms)
     else:
         for term in terms:
@@ -1470,7 +1548,7 @@ def run(term_string,             # comma-separated string of query terms
     if 0 == len(results):
         if _TRACE:
             print('\t*** no results found ***')
-        return EMPTY_RESULT
+        return None
             
     # order results by their starting character offset
     results = sorted(results, key=lambda x: x.start)
@@ -1478,7 +1556,24 @@ def run(term_string,             # comma-separated string of query terms
     # prune if appropriate for overlapping results
     results = _resolve_overlap(terms, filter_terms, sentence, results)
 
-    return _to_json(original_terms, original_sentence, results, filter_terms)
+    return _to_value_result(prepared, original_sentence, results)
+
+
+###############################################################################
+def run(term_string,             # comma-separated string of query terms
+        sentence,
+        str_minval=None,
+        str_maxval=None,
+        str_enumlist=None,       # comma-separated string of terms
+        is_case_sensitive=False,
+        is_denom_only=False):    # return denominators of fractions
+
+    value_result = extract_values(term_string, sentence, str_minval, str_maxval, str_enumlist, is_case_sensitive,
+                                  is_denom_only)
+    if value_result is None:
+        return EMPTY_RESULT
+
+    return _to_json(value_result)
 
 
 ###############################################################################
@@ -1,7 +1,6 @@
 from algorithms.segmentation import *
 from data_access import Measurement
-from algorithms import run_subject_finder, subject_finder_init
-import json
+from algorithms import find_subjects, subject_finder_init
 
 print('Initializing models for measurement finder...')
 segmentor = Segmentation()
@@ -9,51 +8,54 @@ subject_finder_init()
 print('Done initializing models for measurement finder..')
 
 
-def run_measurement_finder_full(text, term_list, is_case_sensitive_text=False):
+def run_measurement_finder_full(text, term_list, is_case_sensitive_text=False, sentences=None):
     if not is_case_sensitive_text:
         term_list = [term.lower() for term in term_list]
         text = text.lower()
+        if sentences is not None:
+            sentences = [s.lower() for s in sentences]
 
     term_count = len(term_list)
     terms = ",".join(term_list)
     results = []
 
-    sentence_list = segmentor.parse_sentences(text)
+    if sentences is None:
+        sentence_list = segmentor.parse_sentences(text)
+    else:
+        sentence_list = sentences
     for s in sentence_list:
-        json_str = run_subject_finder(terms, s)
-        json_obj = json.loads(json_str)
-        if 0 == json_obj['measurementCount']:
+        result = find_subjects(terms, s)
+        if 0 == result.measurementCount:
             continue
-        if term_count > 0 and not json_obj['querySuccess']:
+        if term_count > 0 and not result.querySuccess:
             # ignore if query term(s) not found
             continue
-        if json_obj and 'measurementList' in json_obj:
-            for x in json_obj['measurementList']:
-                try:
-                    m = Measurement(sentence=s,
-                                    text=x['text'],
-                                    start=x['start'],
-                                    end=x['end'],
-                                    temporality=x['temporality'],
-                                    units=x['units'],
-                                    condition=x['condition'],
-                                    matching_terms=', '.join(x['matchingTerm']),
-                                    subject=', '.join(x['subject']),
-                                    location=x['location'],
-                                    X=x['x'],
-                                    Y=x['y'],
-                                    Z=x['z'],
-                                    x_view=x['xView'],
-                                    y_view=x['yView'],
-                                    z_view=x['zView'],
-                                    value1=x['values'],
-                                    min_value = x['minValue'],
-                                    max_value = x['maxValue']
-                    )
-                    results.append(m)
-                    
-                except Exception as ex:
-                    print('measurement_finder_wrapper exception: {0}'.format(ex))
+        for x in result.measurementList:
+            try:
+                m = Measurement(sentence=s,
+                                text=x.text,
+                                start=x.start,
+                                end=x.end,
+                                temporality=x.temporality,
+                                units=x.units,
+                                condition=x.condition,
+                                matching_terms=', '.join(x.matchingTerm),
+                                subject=', '.join(x.subject),
+                                location=x.location,
+                                X=x.x,
+                                Y=x.y,
+                                Z=x.z,
+                                x_view=x.xView,
+                                y_view=x.yView,
+                                z_view=x.zView,
+                                value1=x.values,
+                                min_value = x.minValue,
+                                max_value = x.maxValue
+                )
+                results.append(m)
+
+            except Exception as ex:
+                print('measurement_finder_wrapper exception: {0}'.format(ex))
 
     return results
 
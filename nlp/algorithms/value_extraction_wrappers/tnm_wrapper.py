@@ -18,12 +18,13 @@ def run_tnm_from_sentence(sentence, term: str = ''):
     return results
 
 
-def run_tnm_stager_full(text, term_list=None):
+def run_tnm_stager_full(text, term_list=None, sentences=None):
     if term_list is None:
         term_list = list()
     res = list()
 
-    sentences = segmentor.parse_sentences(text)
+    if sentences is None:
+        sentences = segmentor.parse_sentences(text)
     if len(term_list) > 0:
         matchers = [re.compile(r"\b%s\b" % t, re.IGNORECASE) for t in term_list]
         vals = product(sentences, matchers)
@@ -1,46 +1,63 @@
 from itertools import product
 
 import regex as re
-import json
 from data_access import Measurement
 from algorithms.segmentation import *
-from algorithms.value_extraction import run_value_extractor
+from algorithms.value_extraction import extract_values, prepare_terms
 
 print('Initializing models for value extractor...')
 segmentor = Segmentation()
 print('Done initializing models for value extractor...')
 
 
-def run_value_extractor_full(term_list, text, minimum_value, maximum_value, enumlist=None, is_case_sensitive_text=False, denom_only=False):
-    if enumlist is None:
-        enumlist = list()
-    sentence_list = segmentor.parse_sentences(text)
+class ValueExtractorTerms(object):
+    """
+    The term matchers and prepared value extractor terms for a term list, made once and shared by every document
+    a task processes.
+    """
+
+    def __init__(self, term_list, enumlist=None, is_case_sensitive_text=False):
+        if enumlist is None:
+            enumlist = list()
+        self.enumlist = enumlist
+        self.is_case_sensitive_text = is_case_sensitive_text
+        self.matchers = [re.compile(r"\b%s\b" % t, re.IGNORECASE) for t in term_list]
+        self.prepared = dict()
+
+    def prepare(self, term):
+        # the matched text of a term can differ from sentence to sentence (e.g. in case)
+        if term not in self.prepared:
+            self.prepared[term] = prepare_terms(term, self.enumlist, self.is_case_sensitive_text)
+        return self.prepared[term]
+
+
+def run_value_extractor_full(term_list, text, minimum_value, maximum_value, enumlist=None, is_case_sensitive_text=False, denom_only=False,
+                             sentences=None, terms: ValueExtractorTerms=None):
+    if terms is None:
+        terms = ValueExtractorTerms(term_list, enumlist, is_case_sensitive_text)
+    if sentences is None:
+        sentence_list = segmentor.parse_sentences(text)
+    else:
+        sentence_list = sentences
     process_results = []
-    matchers = [re.compile(r"\b%s\b" % t, re.IGNORECASE) for t in term_list]
-    vals = product(sentence_list, matchers)
+    vals = product(sentence_list, terms.matchers)
     for v in vals:
         sentence = v[0]
         matcher = v[1]
         match = matcher.search(sentence)
         if match:
-            term = match.group(0)
-            value_str = run_value_extractor(
-                term,
+            value_result = extract_values(
+                terms.prepare(match.group(0)),
                 sentence,
                 str_minval=minimum_value,
                 str_maxval=maximum_value,
-                str_enumlist=enumlist,
-                is_case_sensitive=is_case_sensitive_text,
                 is_denom_only=denom_only)
 
-            if len(value_str) > 0:
-                value_results = json.loads(value_str)
-                if 'measurementList' in value_results:
-                    measurement_results = value_results['measurementList']
-                    for x in measurement_results:
-                        process_results.append(
-                            Measurement(sentence=sentence, text=x['matchingTerm'], start=x['start'], end=x['end'],
-                                        condition=x['condition'], X=x['x'], Y=x['y']))
+            if value_result is not None:
+                for x in value_result.measurementList:
+                    process_results.append(
+                        Measurement(sentence=sentence, text=x.matchingTerm, start=x.start, end=x.end,
+                                    condition=x.condition, X=x.x, Y=x.y))
 
     return process_results
 
@@ -124,6 +124,7 @@ try:
     from .vocabulary import get_synonyms as ohdsi_get_synonyms
     from .vocabulary import get_ancestors as ohdsi_get_ancestors
     from .vocabulary import get_descendants as ohdsi_get_descendants
+    from ..models import model_registry
 except Exception as e:
     print(e)
     from pluralize import plural
@@ -132,6 +133,8 @@ except Exception as e:
     from vocabulary import get_synonyms as ohdsi_get_synonyms
     from vocabulary import get_ancestors as ohdsi_get_ancestors
     from vocabulary import get_descendants as ohdsi_get_descendants
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models'))
+    import model_registry
 
 # Need to import 'util.py', which lives in the nlp directory two levels up.
 # This is a hack, and we really need a better solution...
@@ -151,8 +154,9 @@ MODULE_NAME = 'termset_expander.py'
 global DEBUG
 DEBUG = False
 
-# load Spacy's English model
-nlp = spacy.load('en_core_web_sm')
+# Spacy's English model, shared with the rest of the process; only
+# part-of-speech tags are needed here
+nlp = model_registry.get_pipeline('termset_expander', exclude=['parser', 'ner'])
 
 # initialize the CMU phoneme dictionary
 cmu_dict = cmudict.dict()
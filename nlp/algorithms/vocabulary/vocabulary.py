@@ -9,13 +9,16 @@ Vocabulary Expansion
 import re
 import psycopg2
 import psycopg2.extras
-import requests
 import json
 
+import util
+
 
 # Function to get synonyms for given concept
 def get_synonyms(conn_string, concept, vocabulary):
-    conn = psycopg2.connect(conn_string)
+    # imported here, data_access imports the algorithms package while it is initializing
+    from data_access import connection_pool
+    conn = connection_pool.get_connection(conn_string)
     cursor = conn.cursor()
 
     if vocabulary is None:
@@ -38,14 +41,15 @@ def get_synonyms(conn_string, concept, vocabulary):
         print(str(ex))
 
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return list()
 
 
 # Function to get ancestors for given concept
 def get_ancestors(conn_string, concept, vocabulary):
-    conn = psycopg2.connect(conn_string)
+    from data_access import connection_pool
+    conn = connection_pool.get_connection(conn_string)
     cursor = conn.cursor()
 
     if vocabulary is None:
@@ -66,14 +70,15 @@ def get_ancestors(conn_string, concept, vocabulary):
         print(str(ex))
 
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return list()
 
 
 # Function to get descendants for given concept
 def get_descendants(conn_string, concept, vocabulary):
-    conn = psycopg2.connect(conn_string)
+    from data_access import connection_pool
+    conn = connection_pool.get_connection(conn_string)
     cursor = conn.cursor()
 
     if vocabulary is None:
@@ -95,7 +100,7 @@ def get_descendants(conn_string, concept, vocabulary):
         print(str(ex))
 
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return list()
 
@@ -133,7 +138,7 @@ def get_related_terms(conn_string, concept, vocabulary, get_synonyms_bool=True,
 
 def get_related_terms_ohdsi(ohdsi_url, concept_id, vocabulary, get_synonyms_bool=True, get_descendants_bool=False, get_ancestors_bool=False, escape=True):
     url = ohdsi_url + '/vocabulary/OHDSI-CDMV5/concept/%s/related' %(concept_id)
-    data = requests.get(url).json()
+    data = util.http_session().get(url).json()
 
     related_terms = []
     escaped = []
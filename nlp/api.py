@@ -18,6 +18,9 @@ def create_app(config_filename=None):
     clarity_app.register_blueprint(algorithm_app)
     clarity_app.register_blueprint(utility_app)
 
+    from data_access import ensure_indexes_async
+    ensure_indexes_async()
+
     return clarity_app
 
 
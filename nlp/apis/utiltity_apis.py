@@ -89,6 +89,15 @@ def pipeline_types():
         return "Failed to get pipeline types" + str(ex)
 
 
+@utility_app.route('/model_stats', methods=['GET'])
+def model_stats():
+    """GET load time and memory of the spaCy models loaded by this process"""
+    try:
+        return json.dumps(get_model_stats(), indent=4)
+    except Exception as ex:
+        return "Failed to get model stats" + str(ex)
+
+
 @utility_app.route('/status/<int:job_id>', methods=['GET'])
 def get_job_status(job_id: int):
     """GET current job status"""
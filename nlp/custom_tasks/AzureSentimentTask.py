@@ -1,6 +1,6 @@
 from tasks.task_utilities import BaseTask
 from pymongo import MongoClient
-import requests
+import util
 
 
 class AzureSentimentTask(BaseTask):
@@ -26,7 +26,7 @@ class AzureSentimentTask(BaseTask):
                     if any(word.lower() in sentence.lower() for word in self.pipeline_config.terms):
                         payload = {"documents": [{"language": "en", "id": "1", "text": sentence}]}
                         self.write_log_data("RUNNING", "Processing Azure with Termset")
-                        response = requests.post('https://eastus.api.cognitive.microsoft.com/text/analytics/v2.0/sentiment', headers=headers, json=payload)
+                        response = util.http_session().post('https://eastus.api.cognitive.microsoft.com/text/analytics/v2.0/sentiment', headers=headers, json=payload)
                         if response.status_code == 200:
                             json_response = response.json()
                             val = json_response['documents'][0]
@@ -45,7 +45,7 @@ class AzureSentimentTask(BaseTask):
                 for sentence in sentence_list:
                     payload = {"documents": [{"language": "en", "id": "1", "text": sentence}]}
                     self.write_log_data("RUNNING", "Processing Azure without Termset")
-                    response = requests.post('https://eastus.api.cognitive.microsoft.com/text/analytics/v2.0/sentiment', headers=headers, json=payload)
+                    response = util.http_session().post('https://eastus.api.cognitive.microsoft.com/text/analytics/v2.0/sentiment', headers=headers, json=payload)
                     if response.status_code == 200:
                         json_response = response.json()
                         val = json_response['documents'][0]
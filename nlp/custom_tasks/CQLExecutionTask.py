@@ -540,7 +540,7 @@ class CQLExecutionTask(BaseTask):
             
             has_error = False
             try:
-                r = requests.post(#'https://gt-apps.hdap.gatech.edu/cql/evaluate', #cql_eval_url,
+                r = util.http_session().post(#'https://gt-apps.hdap.gatech.edu/cql/evaluate', #cql_eval_url,
                                   #'https://apps.hdap.gatech.edu/cql/evaluate',
                                   'http://cql-execution:8080/cql/evaluate',
                                   headers=headers, json=payload)
@@ -413,6 +413,22 @@ def _to_mongo_object(result):
     return mongo_obj
 
 
+###############################################################################
+def _ecog_results(text):
+    """
+    Find the ECOG scores in the text of a document and return them as
+    MongoDB result objects.
+    """
+
+    # clean the document text
+    text = _cleanup_document(text)
+
+    # search for ECOG scores
+    result_list = _find_ecog_scores(text)
+
+    return [_to_mongo_object(result) for result in result_list]
+
+
 ###############################################################################
 class EcogCriteriaTask(BaseTask):
     """
@@ -423,25 +439,20 @@ class EcogCriteriaTask(BaseTask):
     
     # use this name in NLPQL
     task_name = "EcogCriteriaTask"
+    algorithm_version = '{0}.{1}'.format(_VERSION_MAJOR, _VERSION_MINOR)
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
-        # for each document in the NLPQL-specified doc set
-        for doc in self.docs:
-
-            # get the document text and clean it
-            text = self.get_document_text(doc)
-            text = _cleanup_document(text)
-
-            # search for ECOG scores
-            result_list = _find_ecog_scores(text)
+        # for each document in the NLPQL-specified doc set, reusing results
+        # for texts this task has seen before
+        results = self.memoized_results(
+            lambda d, a: _ecog_results(a.clean_text))
+        for doc, analysis, mongo_objs in results:
 
             # write results to MongoDB
-            if len(result_list) > 0:
-                for result in result_list:
-                    mongo_obj = _to_mongo_object(result)
-                    self.write_result_data(temp_file,
-                                           mongo_client, doc, mongo_obj)
+            for mongo_obj in mongo_objs:
+                self.write_result_data(temp_file,
+                                       mongo_client, doc, mongo_obj)
 
                     
 ###############################################################################
@@ -133,6 +133,27 @@ def _find_gleason_score(sentence_list):
     return result_list
 
 
+###############################################################################
+def _gleason_score_results(sentence_list):
+
+    # all Gleason score results in this document
+    result_list = _find_gleason_score(sentence_list)
+
+    objs = []
+    for result in result_list:
+        obj = {
+            'sentence':sentence_list[result.sentence_index],
+            'start':result.start,
+            'end':result.end,
+            'value':result.score,
+            'value_first':result.first_num,
+            'value_second':result.second_num
+        }
+        objs.append(obj)
+
+    return objs
+
+
 ###############################################################################
 class GleasonScoreTask(BaseTask):
     """
@@ -142,28 +163,11 @@ class GleasonScoreTask(BaseTask):
     
     # use this name in NLPQL
     task_name = "GleasonScoreTask"
+    algorithm_version = '{0}.{1}'.format(_VERSION_MAJOR, _VERSION_MINOR)
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
-        # for each document in the NLPQL-specified doc set
-        for doc in self.docs:
-
-            # all sentences in this document
-            sentence_list = self.get_document_sentences(doc)
-
-            # all Gleason score results in this document
-            result_list = _find_gleason_score(sentence_list)
-                
-            if len(result_list) > 0:
-                for result in result_list:
-                    obj = {
-                        'sentence':sentence_list[result.sentence_index],
-                        'start':result.start,
-                        'end':result.end,
-                        'value':result.score,
-                        'value_first':result.first_num,
-                        'value_second':result.second_num
-                    }
-            
-                    self.write_result_data(temp_file, mongo_client, doc, obj)
-
+        # for each document in the NLPQL-specified doc set, reusing results for texts this task has seen before
+        for doc, analysis, objs in self.memoized_results(lambda d, a: _gleason_score_results(a.sentences)):
+            for obj in objs:
+                self.write_result_data(temp_file, mongo_client, doc, obj)
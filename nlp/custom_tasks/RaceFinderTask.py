@@ -22,12 +22,12 @@ Sample NLPQL, results written to the intermediate_results file:
 
 import util
 import re
-import json
 from pymongo import MongoClient
 from collections import namedtuple
-from tasks.task_utilities import BaseTask, pipeline_cache, document_sentences, document_text,\
-    get_document_by_id
-from cachetools import cached
+from tasks.task_utilities import BaseTask
+
+_VERSION_MAJOR = 0
+_VERSION_MINOR = 1
 
 race_terms = ["white","caucasian","black","african american","asian","pacific islander","alaska native",
               "native american", "native hawaiian"]
@@ -121,46 +121,17 @@ def find_race(sentence_list):
 ###############################################################################
 
 
-def get_race_for_doc(document_id):
-    doc = get_document_by_id(document_id)
-    # all sentences in this document
-    sentence_list = document_sentences(doc)
-
-    # all race results in this document
-    result_list = find_race(sentence_list)
-
-    if len(result_list) == 0:
-        sentence_list = list()
-
-    return {
-        'sentences': sentence_list,
-        'results': result_list
-    }
-
-
-@cached(pipeline_cache)
-def _get_race_data(document_id):
-    util.add_cache_compute_count()
-    return get_race_for_doc(document_id)
-
-
-def get_race_data(document_id):
-    if util.use_redis_caching == "true":
-        util.add_cache_query_count()
-        key = "raceFinder:" + str(document_id)
-        res = util.get_from_redis_cache(key)
-        if res:
-            return json.loads(res)
-        else:
-            util.add_cache_compute_count()
-            res2 = get_race_for_doc(document_id)
-            util.write_to_redis_cache(key, json.dumps(res2))
-            return res2
-    elif util.use_memory_caching == "true":
-        util.add_cache_query_count()
-        return _get_race_data(document_id)
-    else:
-        return get_race_for_doc(document_id)
+def get_race_results(sentence_list):
+    objs = list()
+    for result in find_race(sentence_list):
+        objs.append({
+            'sentence': sentence_list[result.sentence_index],
+            'start': result.start,
+            'end': result.end,
+            'value': result.race,
+            'value_normalized': result.normalized_race,
+        })
+    return objs
 
 
 class RaceFinderTask(BaseTask):
@@ -170,33 +141,11 @@ class RaceFinderTask(BaseTask):
 
     # use this name in NLPQL
     task_name = "RaceFinderTask"
+    algorithm_version = '{0}.{1}'.format(_VERSION_MAJOR, _VERSION_MINOR)
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
-        # for each document in the NLPQL-specified doc set
-        for doc in self.docs:
-            obj = get_race_data(doc[util.solr_report_id_field])
-
-            result_list = obj['results']
-            sentence_list = obj['sentences']
-            if len(result_list) > 0:
-                for result in result_list:
-                    if isinstance(result, list):
-                        obj = {
-                            'sentence': sentence_list[result[0]],
-                            'start': result[1],
-                            'end': result[2],
-                            'value': result[3],
-                            'value_normalized': result[4],
-                        }
-                    else:
-                        obj = {
-                            'sentence': sentence_list[result.sentence_index],
-                            'start': result.start,
-                            'end': result.end,
-                            'value': result.race,
-                            'value_normalized': result.normalized_race,
-                        }
-
-                    self.write_result_data(temp_file, mongo_client, doc, obj)
-
+        # for each document in the NLPQL-specified doc set, reusing results for texts this task has seen before
+        for doc, analysis, objs in self.memoized_results(lambda d, a: get_race_results(a.sentences)):
+            for obj in objs:
+                self.write_result_data(temp_file, mongo_client, doc, obj)
@@ -1,6 +1,6 @@
 from tasks.task_utilities import BaseTask
 from pymongo import MongoClient
-import requests
+import util
 
 
 class SampleAPITask(BaseTask):
@@ -19,7 +19,7 @@ class SampleAPITask(BaseTask):
             # get a joke for each document
             # ¯\_(ツ)_/¯
 
-            response = requests.post('http://api.icndb.com/jokes/random')
+            response = util.http_session().post('http://api.icndb.com/jokes/random')
             if response.status_code == 200:
                 json_response = response.json()
                 if json_response['type'] == 'success':
@@ -1,16 +1,19 @@
 from pymongo import MongoClient
 
 from algorithms import run_tnm_stager_full
+from algorithms.value_extraction import tnm_stage_extractor
 from tasks.task_utilities import BaseTask
 
 
 class TNMStagerTask(BaseTask):
 
     task_name = "TNMStager"
+    algorithm_version = '{0}.{1}'.format(tnm_stage_extractor.VERSION_MAJOR, tnm_stage_extractor.VERSION_MINOR)
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
-            for doc in self.docs:
-                results = run_tnm_stager_full(self.get_document_text(doc), term_list=self.pipeline_config.terms)
-                for obj in results:
+            results = self.memoized_results(lambda doc, analysis: run_tnm_stager_full(
+                analysis.clean_text, term_list=self.pipeline_config.terms, sentences=analysis.clean_sentences))
+            for doc, analysis, objs in results:
+                for obj in objs:
                     self.write_result_data(temp_file, mongo_client, doc, obj)
 
@@ -2,6 +2,7 @@ from tasks.task_utilities import BaseTask, BaseCollector, pipeline_mongo_writer,
 from pymongo import MongoClient
 import textacy
 from textacy.text_stats import TextStats
+from algorithms.models import load_model
 
 
 class TextStatsCollector(BaseCollector):
@@ -70,7 +71,7 @@ class TextStatsTask(BaseTask):
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         for doc in self.docs:
             txt = self.get_document_text(doc)
-            textacy_doc = textacy.make_spacy_doc(txt, lang='en')
+            textacy_doc = textacy.make_spacy_doc(txt, lang=load_model())
             ts = TextStats(textacy_doc)
 
             obj = {
@@ -1,6 +1,6 @@
 from tasks.task_utilities import BaseTask
 from pymongo import MongoClient
-import requests
+import util
 
 
 class WatsonSentimentTask(BaseTask):
@@ -24,7 +24,7 @@ class WatsonSentimentTask(BaseTask):
                     self.write_log_data("INFO", self.pipeline_config.custom_arguments['api_key'])
 
                     payload = {"text": sentence}
-                    response = requests.post('https://gateway.watsonplatform.net/tone-analyzer/api/v3/tone?version=2017-09-21', headers=headers, json=payload)
+                    response = util.http_session().post('https://gateway.watsonplatform.net/tone-analyzer/api/v3/tone?version=2017-09-21', headers=headers, json=payload)
                     if response.status_code == 200:
                         json_response = response.json()
                         tones = json_response['document_tone']['tones']
@@ -11,20 +11,19 @@ def get_fev1fvc(sentence):
     # Running a loop on the range in which fev1/fvc value could be found.
     # Includes ratios both exprecessed as percent and decimal, > 100% is for predicted values
     for x,y in [(0,2),(10,180)]:
-        fev1_fvc = ve.run("fev1/fvc", sentence, x, y)
-        fev1_fvc_json = json.loads(fev1_fvc)
-        if fev1_fvc_json['querySuccess']:
-            for i in range(fev1_fvc_json['measurementCount']):
+        fev1_fvc = ve.extract_values("fev1/fvc", sentence, x, y)
+        if fev1_fvc is not None and fev1_fvc.querySuccess:
+            for m in fev1_fvc.measurementList:
                 fev1fvc_dict = dict()
                 fev1fvc_dict['type'] = "fev1_fvc_ratio"
-                fev1fvc_dict['text'] = fev1_fvc_json['measurementList'][i]['text']
-                fev1fvc_dict['condition'] = fev1_fvc_json['measurementList'][i]['condition']
-                fev1fvc_dict['start'] = fev1_fvc_json['measurementList'][i]['start']
-                fev1fvc_dict['end'] = fev1_fvc_json['measurementList'][i]['end']
-                fev1fvc_dict['x'] = fev1_fvc_json['measurementList'][i]['x']
-                fev1fvc_dict['y'] = fev1_fvc_json['measurementList'][i]['y']
-
-                clean_text = fev1_fvc_json['measurementList'][i]['text'].replace(')','').replace('(','')
+                fev1fvc_dict['text'] = m.text
+                fev1fvc_dict['condition'] = m.condition
+                fev1fvc_dict['start'] = m.start
+                fev1fvc_dict['end'] = m.end
+                fev1fvc_dict['x'] = m.x
+                fev1fvc_dict['y'] = m.y
+
+                clean_text = m.text.replace(')','').replace('(','')
                 sentence = sentence.replace(')','').replace('(','')
 
                 fev1_fvc_units = re.findall(clean_text+r'\s?(%)?',sentence)[0]
@@ -43,20 +42,19 @@ def get_fvc(sentence):
     fvc_list = []
     # Includes values in ml,l and % predicted
     for x,y in [(300,6000),(15,170),(0.3,6)]:
-        fvc = ve.run("fvc", sentence, x, y)
-        fvc_json = json.loads(fvc)
-        if fvc_json['querySuccess']:
-            for i in range(fvc_json['measurementCount']):
+        fvc = ve.extract_values("fvc", sentence, x, y)
+        if fvc is not None and fvc.querySuccess:
+            for m in fvc.measurementList:
                 fvc_dict = dict()
                 fvc_dict['type'] = "fvc"
-                fvc_dict['text'] = fvc_json['measurementList'][i]['text']
-                fvc_dict['condition'] = fvc_json['measurementList'][i]['condition']
-                fvc_dict['x'] = fvc_json['measurementList'][i]['x']
-                fvc_dict['y'] = fvc_json['measurementList'][i]['y']
-                fvc_dict['start'] = fvc_json['measurementList'][i]['start']
-                fvc_dict['end'] = fvc_json['measurementList'][i]['end']
-
-                clean_text = fvc_json['measurementList'][i]['text'].replace(')','').replace('(','')
+                fvc_dict['text'] = m.text
+                fvc_dict['condition'] = m.condition
+                fvc_dict['x'] = m.x
+                fvc_dict['y'] = m.y
+                fvc_dict['start'] = m.start
+                fvc_dict['end'] = m.end
+
+                clean_text = m.text.replace(')','').replace('(','')
                 sentence = sentence.replace(')','').replace('(','')
 
                 fvc_units = re.findall( clean_text +r'\s?(ml|cc|l|L|ML|CC|%)?',sentence)[0]
@@ -73,20 +71,19 @@ def get_fev1(sentence):
     fev1_list = []
     # Includes values in ml, l and % predicted
     for x,y in [(0,6),(20,190),(300,6000)]:
-        fev1 = ve.run("fev1", sentence, x, y)
-        fev1_json = json.loads(fev1)
-        if fev1_json['querySuccess']:
-            for i in range(fev1_json['measurementCount']):
+        fev1 = ve.extract_values("fev1", sentence, x, y)
+        if fev1 is not None and fev1.querySuccess:
+            for m in fev1.measurementList:
                 fev1_dict = dict()
                 fev1_dict['type'] = "fev1"
-                fev1_dict['text'] = fev1_json['measurementList'][i]['text']
-                fev1_dict['condition'] = fev1_json['measurementList'][i]['condition']
-                fev1_dict['x'] = fev1_json['measurementList'][i]['x']
-                fev1_dict['y'] = fev1_json['measurementList'][i]['y']
-                fev1_dict['start'] = fev1_json['measurementList'][i]['start']
-                fev1_dict['end'] = fev1_json['measurementList'][i]['end']
-
-                clean_text = fev1_json['measurementList'][i]['text'].replace(')','').replace('(','')
+                fev1_dict['text'] = m.text
+                fev1_dict['condition'] = m.condition
+                fev1_dict['x'] = m.x
+                fev1_dict['y'] = m.y
+                fev1_dict['start'] = m.start
+                fev1_dict['end'] = m.end
+
+                clean_text = m.text.replace(')','').replace('(','')
                 sentence = sentence.replace(')','').replace('(','')
 
                 fev1_units = re.findall( clean_text +r'\s?(ml|cc|l|L|ML|CC|%)?',sentence)[0]
@@ -1,4 +1,6 @@
-from .solr_data import query, query_doc_size, get_report_type_mappings, query_doc_by_id
+from .connection_pool import get_connection, release_connection, get_connection_counts, counts_since
+from .solr_data import query, query_stream, query_pages, query_doc_size, get_report_type_mappings, query_doc_by_id, \
+    query_docs_by_ids, make_atomic_update, update_docs
 from .jobs import *
 from .pipeline_config import get_pipeline_config, PipelineConfig, insert_pipeline_config, update_pipeline_config
 from .base_model import *
@@ -9,3 +11,7 @@ from .phenotype import *
 from .measurement_model import *
 from .library import *
 from .cql_result_parser import decode_top_level_obj
+from .cache import Cache, get_cache_stats
+from .segmentation_store import find_spans, encode_sentences, encode_sections, decode_sentences, decode_sections, \
+    pack_pieces, unpack_pieces, TextSlices, SENTENCE_OFFSETS_FIELD, SECTION_OFFSETS_FIELD
+from .mongo_indexes import ensure_indexes, ensure_indexes_async, log_query_plan
@@ -0,0 +1,184 @@
+import sys
+import threading
+import traceback
+import zlib
+
+import msgpack
+from cachetools import LRUCache
+
+import util
+
+# first byte of every cached value, so compressed and uncompressed values can be told apart
+RAW = b'r'
+COMPRESSED = b'z'
+
+
+def _int_setting(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+LOCAL_MAX_BYTES = _int_setting(util.local_cache_bytes, 67108864)
+COMPRESS_MIN_BYTES = _int_setting(util.cache_compress_min_bytes, 1024)
+
+_local_lock = threading.Lock()
+# entries are serialized values, so the size bound is in bytes and every hit returns a fresh copy
+_local = LRUCache(maxsize=LOCAL_MAX_BYTES, getsizeof=len)
+_stats_lock = threading.Lock()
+_stats = dict()
+
+
+def serialize(value):
+    packed = msgpack.packb(value, use_bin_type=True)
+    if len(packed) >= COMPRESS_MIN_BYTES:
+        return COMPRESSED + zlib.compress(packed, 1)
+    return RAW + packed
+
+
+def deserialize(data: bytes):
+    if data[:1] == COMPRESSED:
+        return msgpack.unpackb(zlib.decompress(data[1:]), raw=False)
+    return msgpack.unpackb(data[1:], raw=False)
+
+
+def _count(namespace, hits, misses):
+    with _stats_lock:
+        stats = _stats.get(namespace)
+        if stats is None:
+            stats = {'hits': 0, 'misses': 0}
+            _stats[namespace] = stats
+        stats['hits'] += hits
+        stats['misses'] += misses
+    util.add_cache_query_count(hits + misses)
+    util.add_cache_compute_count(misses)
+
+
+def get_cache_stats():
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def use_local():
+    return util.use_memory_caching == "true"
+
+
+def use_redis():
+    return util.use_redis_caching == "true" and util.redis_bytes_conn is not None
+
+
+class Cache(object):
+    """
+    A namespace in the two tier cache: a per-process LRU bounded by the size of its serialized values in front of
+    Redis, both written through on set. Values are stored as msgpack, compressed when they are large. Keys are
+    prefixed with the namespace and its version, so bumping the version drops everything cached by older code.
+    Reads and writes fail soft, a cache error is printed and treated as a miss.
+    """
+
+    def __init__(self, namespace: str, version: int=1, expire_seconds: int=util.EXPIRE_TIME_SECONDS):
+        self.namespace = namespace
+        self.version = version
+        self.expire_seconds = expire_seconds
+
+    def key(self, key):
+        return '%s:v%d:%s' % (self.namespace, self.version, str(key))
+
+    def enabled(self):
+        return use_local() or use_redis()
+
+    def get(self, key, compute=None):
+        """
+        The cached value for key, or compute() (cached before it's returned) if there is none and compute is set.
+        """
+        found = self.get_many([key])
+        if key in found:
+            return found[key]
+        if compute is None:
+            return None
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def get_many(self, keys: list):
+        """
+        The cached values for keys, as a dict without the keys that aren't cached. Redis is read with one MGET.
+        """
+        keys = list(dict.fromkeys(keys))
+        values = dict()
+        data = dict()
+        if not self.enabled():
+            return values
+        if use_local():
+            with _local_lock:
+                for k in keys:
+                    d = _local.get(self.key(k))
+                    if d is not None:
+                        data[k] = d
+
+        missing = [k for k in keys if k not in data]
+        if len(missing) > 0 and use_redis():
+            try:
+                found = util.redis_bytes_conn.mget([self.key(k) for k in missing])
+                for k, d in zip(missing, found):
+                    if d is not None:
+                        data[k] = d
+                        self._set_local(k, d)
+            except Exception as ex:
+                print(ex)
+
+        for k, d in data.items():
+            try:
+                values[k] = deserialize(d)
+            except Exception as ex:
+                print(ex)
+
+        _count(self.namespace, len(values), len(keys) - len(values))
+        return values
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, values: dict):
+        # one pipelined round trip of SETEX for all of the values
+        data = dict()
+        if not self.enabled():
+            return
+        for k, v in values.items():
+            try:
+                data[k] = serialize(v)
+            except Exception as ex:
+                traceback.print_exc(file=sys.stderr)
+                print(ex)
+        if len(data) == 0:
+            return
+
+        for k, d in data.items():
+            self._set_local(k, d)
+        if use_redis():
+            try:
+                pipe = util.redis_bytes_conn.pipeline(transaction=False)
+                for k, d in data.items():
+                    pipe.setex(self.key(k), self.expire_seconds, d)
+                pipe.execute()
+            except Exception as ex:
+                print(ex)
+
+    def delete(self, key):
+        with _local_lock:
+            _local.pop(self.key(key), None)
+        if use_redis():
+            try:
+                util.redis_bytes_conn.delete(self.key(key))
+            except Exception as ex:
+                print(ex)
+
+    def _set_local(self, key, data: bytes):
+        if not use_local():
+            return
+        with _local_lock:
+            try:
+                _local[self.key(key)] = data
+            except ValueError:
+                # larger than the whole cache
+                pass
@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+
+import util
+
+# Process-wide pool of idle Postgres connections, keyed by connection string. Luigi runs tasks in forked worker
+# processes, so the pool remembers the pid that created it; a child process starts with an empty pool rather than
+# sharing sockets with its parent.
+
+_lock = threading.Lock()
+_pid = os.getpid()
+_idle = dict()
+# connections inherited across a fork are parked here so they are never closed (or garbage collected) in the child,
+# which would terminate the parent's session
+_inherited = list()
+# counted per process (a forked worker starts from zero), see counts_since for what a task used
+_counts = {
+    'opened': 0,
+    'reused': 0,
+    'discarded': 0
+}
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    pool_key = None
+
+
+def _pool_size():
+    try:
+        return max(int(util.pg_pool_size), 0)
+    except (TypeError, ValueError):
+        return 5
+
+
+def _check_pid():
+    global _pid, _idle
+    pid = os.getpid()
+    if pid != _pid:
+        _inherited.append(_idle)
+        _idle = dict()
+        for k in _counts.keys():
+            _counts[k] = 0
+        _pid = pid
+
+
+def get_connection(connection_string: str = None):
+    if not connection_string:
+        connection_string = util.conn_string
+
+    with _lock:
+        _check_pid()
+        idle = _idle.get(connection_string)
+        while idle:
+            conn = idle.pop()
+            if not conn.closed:
+                _counts['reused'] += 1
+                return conn
+            _counts['discarded'] += 1
+        _counts['opened'] += 1
+
+    conn = psycopg2.connect(connection_string, connection_factory=PooledConnection)
+    conn.pool_key = connection_string
+    return conn
+
+
+def release_connection(conn):
+    if conn is None:
+        return
+    connection_string = getattr(conn, 'pool_key', None)
+
+    try:
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # leave nothing open (or aborted) for the next borrower
+            conn.rollback()
+        healthy = not conn.closed and \
+            conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    except psycopg2.Error:
+        healthy = False
+
+    with _lock:
+        _check_pid()
+        if healthy and connection_string:
+            idle = _idle.setdefault(connection_string, deque())
+            if len(idle) < _pool_size():
+                idle.append(conn)
+                return
+        _counts['discarded'] += 1
+
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+
+def close_all():
+    with _lock:
+        _check_pid()
+        pools = list(_idle.values())
+        _idle.clear()
+
+    for idle in pools:
+        while idle:
+            conn = idle.pop()
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+
+def get_connection_counts():
+    with _lock:
+        _check_pid()
+        return dict(_counts)
+
+
+def counts_since(start_counts: dict):
+    # the connections opened, reused and discarded in this process since get_connection_counts returned start_counts
+    counts = get_connection_counts()
+    return {k: counts[k] - start_counts.get(k, 0) for k in counts.keys()}
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+This module evaluates NLPQL logic expressions with in-memory bitmaps, as an
+alternative to the MongoDB aggregation pipeline in expr_eval.py. It is used
+when the evaluator is set to 'bitmap' in the [local] section of the config
+file.
+
+The aggregation pipeline groups every result document by the value of the
+context variable, pushes an ntuple for each document into the group and
+collects the set of NLPQL features in each group. For patient-context
+expressions over millions of results all of that is held in memory by MongoDB.
+
+This module instead streams a (context value, nlpql_feature, _id) triple for
+each result document having one of the expression's NLPQL features. Each
+distinct context value (a patient or document) is assigned a dense index, and
+each NLPQL feature gets a bitmap over those indices, stored as a Python int.
+The postfix tokens from expr_eval._infix_to_postfix are then evaluated as set
+algebra on the bitmaps:
+
+    A AND B     A & B
+    A OR B      A | B
+    A NOT B     A & (~B), restricted to the context values that were found
+
+The bits left set in the result are the patients or documents that satisfy
+the expression. Only the _id values of their documents are kept, grouped by
+context value, in the same EvalResult form that expr_eval._eval_logic_expr
+returns. Result documents are then generated with expr_eval.flatten_logical_result
+and expr_result.to_logic_result_docs, exactly as for the mongo evaluator.
+
+Math expressions are still evaluated by the aggregation pipeline in
+expr_eval.py, since they operate on individual documents.
+
+Usage is the same as for expr_eval.evaluate_expression:
+
+    result = evaluate_expression(expr_obj,
+                                 job_id,
+                                 context_field,
+                                 mongo_collection_obj)
+
+For import only.
+"""
+
+import copy
+import itertools
+from array import array
+
+try:
+    from data_access import expr_eval
+    from data_access.expr_eval import EvalResult, EXPR_TYPE_LOGIC
+except ImportError:
+    import expr_eval
+    from expr_eval import EvalResult, EXPR_TYPE_LOGIC
+
+
+###############################################################################
+
+_VERSION_MAJOR = 0
+_VERSION_MINOR = 1
+_MODULE_NAME   = 'expr_bitmap.py'
+
+# set to True to enable debug output
+_TRACE = False
+
+# number of documents returned by each batch of the cursor
+_CURSOR_BATCH_SIZE = 10000
+
+
+###############################################################################
+def enable_debug():
+    """
+    Enable debug output.
+    """
+
+    global _TRACE
+    _TRACE = True
+
+
+###############################################################################
+def _to_bitmap(indices, count):
+    """
+    Convert an iterable of indices in the range [0, count) to a bitmap,
+    returned as a Python int with those bits set.
+    """
+
+    bits = bytearray((count + 7) // 8)
+    for i in indices:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+###############################################################################
+def _eval_postfix(postfix_tokens, feature_bitmaps, all_bits):
+    """
+    Evaluate the postfix tokens of a logic expression as set algebra on the
+    bitmaps in feature_bitmaps (dict: nlpql_feature => bitmap). The all_bits
+    bitmap has a bit set for every context value, the complement of a bitmap
+    is taken relative to it. Returns the bitmap of the context values that
+    satisfy the expression.
+    """
+
+    stack = []
+    for token in postfix_tokens:
+        match = expr_eval._regex_logic_operator.match(token)
+        if not match:
+            # an nlpql_feature, empty if no documents have it
+            stack.append(feature_bitmaps.get(token, 0))
+        elif 'not' == token:
+            # the parser converts "A NOT B" to "A AND NOT B"
+            operand = stack.pop()
+            stack.append(all_bits & ~operand)
+        else:
+            operator, n = expr_eval._decode_operator(token)
+            operands = [stack.pop() for i in range(n)]
+            result = operands[0]
+            for operand in operands[1:]:
+                if 'or' == operator:
+                    result |= operand
+                else:
+                    result &= operand
+            stack.append(result)
+
+    # should only have a single element left on the stack, the result
+    assert 1 == len(stack)
+    return stack[0]
+
+
+###############################################################################
+def _eval_logic_expr(job_id,
+                     context_field,
+                     expr_obj,
+                     mongo_collection_obj,
+                     feature_docs=None):
+    """
+    Evaluate a logical expression with bitmaps and return an EvalResult
+    namedtuple in the same form as expr_eval._eval_logic_expr.
+
+    The job_id param is an integer, a ClarityNLP job ID.
+    The context_field param is a string, either 'subject' or 'report_id'.
+    The optional feature_docs param is a dict of nlpql_feature => list of
+    all of the job's documents with that feature, for features whose
+    documents are already in memory. The other features are queried.
+    """
+
+    if _TRACE:
+        print('Called expr_bitmap._eval_logic_expr')
+        print('\tExpression: "{0}"'.format(expr_obj.expr_text))
+
+    assert 'subject' == context_field or 'report_id' == context_field
+
+    infix_expr = expr_eval._remove_unnecessary_parens(expr_obj.expr_text)
+    postfix_tokens = expr_eval._infix_to_postfix(infix_expr.split())
+    postfix_tokens = expr_eval._make_nary(postfix_tokens)
+    if _TRACE: print('\tpostfix: {0}'.format(postfix_tokens))
+
+    nlpql_features = [t for t in postfix_tokens
+                      if not expr_eval._regex_logic_operator.match(t)]
+    feature_index = {f: i for i, f in enumerate(sorted(set(nlpql_features)))}
+
+    # Only the documents of features that remain after negated
+    # subexpressions are removed appear in the output, see
+    # expr_eval.flatten_logical_result. The _id values of the others are
+    # not kept.
+    output_tokens = expr_eval._remove_negated_subexpressions(postfix_tokens)
+    output_features = {feature_index[t] for t in output_tokens
+                       if t in feature_index}
+
+    if feature_docs is None:
+        feature_docs = {}
+    known = [f for f in feature_index if f in feature_docs]
+    query_features = [f for f in feature_index if f not in feature_docs]
+
+    cursor = []
+    if len(query_features) > 0:
+        query = {
+            "job_id": job_id,
+            "nlpql_feature": {"$in": query_features}
+        }
+        projection = {"_id": 1, "nlpql_feature": 1, context_field: 1}
+        expr_eval.log_query_plan(mongo_collection_obj,
+                                 'bitmap logic expression', query=query)
+        cursor = mongo_collection_obj.find(query, projection)
+        cursor.batch_size(_CURSOR_BATCH_SIZE)
+
+    docs = itertools.chain(itertools.chain.from_iterable(
+        feature_docs[f] for f in known), cursor)
+
+    # dense index for each context value, in order of first occurrence
+    context_index = {}
+
+    # context index and _id of each document kept for the output
+    doc_contexts = array('l')
+    doc_oids = []
+
+    # context indices found for each feature
+    feature_contexts = [set() for f in feature_index]
+
+    for doc in docs:
+        feature = feature_index[doc['nlpql_feature']]
+        context_value = doc.get(context_field)
+        ci = context_index.get(context_value)
+        if ci is None:
+            ci = len(context_index)
+            context_index[context_value] = ci
+        feature_contexts[feature].add(ci)
+        if feature in output_features:
+            doc_contexts.append(ci)
+            doc_oids.append(doc['_id'])
+
+    context_count = len(context_index)
+    feature_bitmaps = {f: _to_bitmap(feature_contexts[i], context_count)
+                       for f, i in feature_index.items()}
+    del feature_contexts
+
+    all_bits = (1 << context_count) - 1
+    result_bits = _eval_postfix(postfix_tokens, feature_bitmaps, all_bits)
+    result_bytes = result_bits.to_bytes((context_count + 7) // 8, 'little')
+
+    # group the _id values of the surviving documents by context value
+    groups = {}
+    for ci, oid in zip(doc_contexts, doc_oids):
+        if result_bytes[ci >> 3] >> (ci & 7) & 1:
+            if ci not in groups:
+                groups[ci] = [oid]
+            else:
+                groups[ci].append(oid)
+
+    group_list = list(groups.values())
+    doc_ids = [oid for group in group_list for oid in group]
+
+    if _TRACE:
+        print('\t{0} context values, {1} satisfy the expression, {2} docs'.
+              format(context_count, len(group_list), len(doc_ids)))
+
+    result = EvalResult(
+        expr_type      = EXPR_TYPE_LOGIC,
+        nlpql_feature  = expr_obj.nlpql_feature,
+        expr_text      = infix_expr,
+        expr_index     = expr_obj.expr_index,
+        postfix_tokens = copy.deepcopy(postfix_tokens),
+        doc_ids        = doc_ids,
+        group_list     = group_list
+    )
+
+    return result
+
+
+###############################################################################
+def evaluate_expression(expr_obj,
+                        job_id,
+                        context_field,
+                        mongo_collection_obj,
+                        feature_docs=None):
+    """
+    Evaluate a single ExpressionObject namedtuple. Logic expressions are
+    evaluated with bitmaps, math expressions by expr_eval. See
+    _eval_logic_expr for the feature_docs param.
+    """
+
+    if _TRACE: print('Called expr_bitmap.evaluate_expression')
+
+    if EXPR_TYPE_LOGIC == expr_obj.expr_type:
+        return _eval_logic_expr(job_id,
+                                context_field,
+                                expr_obj,
+                                mongo_collection_obj,
+                                feature_docs)
+
+    return expr_eval.evaluate_expression(expr_obj,
+                                         job_id,
+                                         context_field,
+                                         mongo_collection_obj)
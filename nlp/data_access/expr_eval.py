@@ -155,6 +155,7 @@ import sys
 import copy
 import string
 import optparse
+import threading
 from pymongo import MongoClient
 from collections import namedtuple
 from bson.objectid import ObjectId
@@ -172,6 +173,13 @@ except ImportError:
     from expr_parser import NLPQL_EXPR_OPSTRINGS_LC # lowercase
     from expr_parser import NLPQL_EXPR_LOGIC_OPERATORS
 
+try:
+    from data_access.mongo_indexes import log_query_plan
+except ImportError:
+    # run standalone, without the app's config
+    def log_query_plan(collection, label, query=None, pipeline=None):
+        pass
+
 # expression types
 EXPR_TYPE_MATH    = 'math'
 EXPR_TYPE_LOGIC   = 'logic'
@@ -235,7 +243,7 @@ regex_temp_nlpql_feature = re.compile(r'\A(math|logic)_\d+_\d+\Z')
 ###############################################################################
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 6
+_VERSION_MINOR = 7
 _MODULE_NAME   = 'expr_eval.py'
 
 # set to True to enable debug output
@@ -350,6 +358,10 @@ _TMP_FEATURE_MATH  = 0
 _TMP_FEATURE_LOGIC = 1
 
 _EXPR_INDEX = 0
+_EXPR_INDEX_LOCK = threading.Lock()
+
+# maximum number of _id values in a single $in query
+_FIND_BATCH_SIZE = 50000
 
 
 ###############################################################################
@@ -1298,6 +1310,7 @@ def _run_math_pipeline(pipeline, mongo_collection_obj):
     """
 
     # run the aggregation pipeline
+    log_query_plan(mongo_collection_obj, 'math expression', pipeline=pipeline)
     cursor = mongo_collection_obj.aggregate(pipeline, allowDiskUse=True)
 
     # keep all doc ids for which the aggregation result is True
@@ -1310,6 +1323,7 @@ def _run_math_pipeline(pipeline, mongo_collection_obj):
 def _run_logic_pipeline(pipeline, mongo_collection_obj):
 
     # run the aggregation pipeline
+    log_query_plan(mongo_collection_obj, 'logic expression', pipeline=pipeline)
     cursor = mongo_collection_obj.aggregate(pipeline, allowDiskUse=True)
 
     # get ntuple array from each cursor result, which contains the groups for
@@ -1993,11 +2007,28 @@ def _generate_logical_result(
 
 
 ###############################################################################
-def flatten_logical_result(eval_result, mongo_collection_obj):
+def find_docs(mongo_collection_obj, doc_ids):
+    """
+    Generator for the documents with the given _id values. The _id values
+    are queried in batches, since a single $in query with millions of
+    _id values would exceed the maximum size of a MongoDB document.
+    """
+
+    for i in range(0, len(doc_ids), _FIND_BATCH_SIZE):
+        batch = doc_ids[i:i + _FIND_BATCH_SIZE]
+        for doc in mongo_collection_obj.find({'_id': {'$in': batch}}):
+            yield doc
+
+
+###############################################################################
+def flatten_logical_result(eval_result, mongo_collection_obj, known_docs=None):
     """
     Generate the groups of MongoDB _id values representing the result set.
     Most of the work is done by _generate_logical_result(), which has more
     explanation in its docstring and in its code.
+
+    The optional known_docs param is a dict of _id => document for documents
+    the caller already has in memory; only the others are queried.
     """
 
     if _TRACE: print('Called flatten_logical_result')
@@ -2014,12 +2045,19 @@ def flatten_logical_result(eval_result, mongo_collection_obj):
         print('\tDocument count: {0}'.format(len(doc_ids)))
         print('\tGroup count:    {0}'.format(len(group_list)))
 
-    # query for these documents
-    cursor = mongo_collection_obj.find({'_id': {'$in': doc_ids}})
-
     # load all docs into a map for quick access to data
     features = set()
     doc_map = {}
+    if known_docs:
+        for oid in doc_ids:
+            if oid in known_docs:
+                doc_map[oid] = known_docs[oid]
+        query_ids = [oid for oid in doc_ids if oid not in doc_map]
+    else:
+        query_ids = doc_ids
+
+    # query for the other documents
+    cursor = find_docs(mongo_collection_obj, query_ids)
     for doc in cursor:
         # ObjectId is the key
         oid = doc['_id']
@@ -2271,10 +2309,17 @@ def generate_expressions(final_nlpql_feature, parse_result):
     """
 
     global _EXPR_INDEX
+
+    # Reserve an index for this expression. The temporary features of mixed
+    # expressions include it, so it must be unique when the operations of a
+    # phenotype are evaluated concurrently.
+    with _EXPR_INDEX_LOCK:
+        expr_index = _EXPR_INDEX
+        _EXPR_INDEX += 1
     
     if _TRACE:
         print('Called generate_expressions')
-        print('\tExpression index: {0}'.format(_EXPR_INDEX))    
+        print('\tExpression index: {0}'.format(expr_index))    
 
     # determine the expression type, need math, logic, or mixed
     expr_type = _expr_type(parse_result)
@@ -2292,7 +2337,7 @@ def generate_expressions(final_nlpql_feature, parse_result):
             expr_type     = EXPR_TYPE_MATH,
             nlpql_feature = final_nlpql_feature,
             expr_text     = parse_result,
-            expr_index    = _EXPR_INDEX
+            expr_index    = expr_index
         )
         expression_object_list.append(expr_obj)
 
@@ -2301,14 +2346,14 @@ def generate_expressions(final_nlpql_feature, parse_result):
             expr_type     = EXPR_TYPE_LOGIC,
             nlpql_feature = final_nlpql_feature,
             expr_text     = parse_result,
-            expr_index    = _EXPR_INDEX
+            expr_index    = expr_index
         )
         expression_object_list.append(expr_obj)
     
     elif EXPR_TYPE_MIXED == expr_type:
 
         # resolve mixed expressions into pure subexpressions
-        subexpressions, final_infix_expr = _resolve_mixed(parse_result, _EXPR_INDEX)
+        subexpressions, final_infix_expr = _resolve_mixed(parse_result, expr_index)
 
         # the new infix expression includes the subexpression temporaries
         final_infix_expr = _remove_unnecessary_parens(final_infix_expr)        
@@ -2325,7 +2370,7 @@ def generate_expressions(final_nlpql_feature, parse_result):
                     expr_type     = subexpr_type,
                     nlpql_feature = sub_feature,
                     expr_text     = sub_expr,
-                    expr_index    = _EXPR_INDEX
+                    expr_index    = expr_index
                 )
                 expression_object_list.append(expr_obj)
             else:
@@ -2339,7 +2384,7 @@ def generate_expressions(final_nlpql_feature, parse_result):
             expr_type     = EXPR_TYPE_LOGIC,
             nlpql_feature = final_nlpql_feature,
             expr_text     = final_infix_expr,
-            expr_index    = _EXPR_INDEX
+            expr_index    = expr_index
         )
         expression_object_list.append(expr_obj)
         
@@ -2352,10 +2397,87 @@ def generate_expressions(final_nlpql_feature, parse_result):
                              expr_obj.expr_index,
                              expr_obj.expr_text))
 
-    _EXPR_INDEX += 1
     return expression_object_list
 
 
+###############################################################################
+def normalize_expression(infix_expression):
+    """
+    Return a canonical string for an infix expression, such that expressions
+    with the same normal form have the same result. The normal form is the
+    postfix form written as nested prefix terms, with the operands of AND and
+    OR flattened and sorted, since neither their grouping nor their order
+    changes the result. For instance, both 'hasCough AND hasFever' and
+    '( hasFever AND hasCough )' have the normal form
+
+        (and hasCough hasFever)
+    """
+
+    infix_expression = _remove_unnecessary_parens(infix_expression)
+    postfix_tokens = _infix_to_postfix(infix_expression.split())
+
+    stack = []
+    for token in postfix_tokens:
+        if not _is_operator(token):
+            stack.append(token)
+            continue
+
+        token = token.lower()
+        n = 1 if token in _UNARY_OPS else 2
+        operands = stack[-n:]
+        del stack[-n:]
+
+        if 'and' == token or 'or' == token:
+            # merge nested terms of the same operator, then sort
+            flat = []
+            for op in operands:
+                if isinstance(op, tuple) and token == op[0]:
+                    flat.extend(op[1:])
+                else:
+                    flat.append(op)
+            operands = sorted(flat, key=_term_string)
+
+        stack.append(tuple([token] + operands))
+
+    assert 1 == len(stack)
+    return _term_string(stack[0])
+
+
+###############################################################################
+def _term_string(term):
+    """
+    Return the string form of a term built by normalize_expression.
+    """
+
+    if isinstance(term, tuple):
+        return '(' + ' '.join(_term_string(t) if isinstance(t, tuple) else t
+                              for t in term) + ')'
+    return term
+
+
+###############################################################################
+def equivalent_result(eval_result, expr_obj):
+    """
+    Given the EvalResult of an expression with the same normal form as the
+    expression in expr_obj (see normalize_expression), return the EvalResult
+    for expr_obj, without evaluating it again. The doc_ids and group_list
+    of equivalent expressions are the same.
+    """
+
+    infix_expr = _remove_unnecessary_parens(expr_obj.expr_text)
+    postfix_tokens = eval_result.postfix_tokens
+    if EXPR_TYPE_LOGIC == expr_obj.expr_type:
+        # the output is generated from the expression's own postfix form
+        postfix_tokens = _make_nary(_infix_to_postfix(infix_expr.split()))
+
+    return eval_result._replace(
+        nlpql_feature  = expr_obj.nlpql_feature,
+        expr_text      = infix_expr,
+        expr_index     = expr_obj.expr_index,
+        postfix_tokens = postfix_tokens
+    )
+
+
 ###############################################################################
 def evaluate_expression(expr_obj,
                         job_id,
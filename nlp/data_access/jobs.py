@@ -1,20 +1,26 @@
 import psycopg2
 import psycopg2.extras
+import atexit
 import configparser
 import json
+import os
+import threading
 import util
 import sys
 import traceback
+from collections import OrderedDict
 from pymongo import MongoClient
 from datetime import datetime, timezone
 
 try:
     from .base_model import BaseModel
     from .results import phenotype_stats
+    from . import connection_pool
 except Exception as e:
     print(e)
     from base_model import BaseModel
     from results import phenotype_stats
+    import connection_pool
 
 
 STARTED = "STARTED"
@@ -25,6 +31,8 @@ WARNING = "WARNING"
 KILLED = "KILLED"
 STATS = "STATS"
 PROPERTIES = "PROPERTIES"
+# suffix of the STATS rows with the Postgres connections each batch used, see sum_job_stats
+PG_CONNECTIONS_STATS = "_PG_CONNECTIONS"
 
 
 class NlpJob(BaseModel):
@@ -46,7 +54,7 @@ class NlpJob(BaseModel):
 
 
 def create_new_job(job: NlpJob, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -70,13 +78,14 @@ def create_new_job(job: NlpJob, connection_string: str):
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return -1
 
 
 def get_job_status(job_id: int, connection_string: str, get_updates=False):
-    conn = psycopg2.connect(connection_string)
+    status_reporter.flush()
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     status_dict = {
         "status": "UNKNOWN"
@@ -109,16 +118,57 @@ def get_job_status(job_id: int, connection_string: str, get_updates=False):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return status_dict
 
 
+def sum_job_stats(job_id: str, connection_string: str, suffix: str):
+    """
+    Adds up the JSON counters in the job's STATS rows whose status ends with suffix. Worker processes each report
+    their own counts (e.g. PG_CONNECTIONS_STATS for every batch), this gives the totals for the job.
+    """
+    status_reporter.flush()
+    conn = connection_pool.get_connection(connection_string)
+    cursor = conn.cursor()
+    totals = dict()
+
+    try:
+        # _ matches any character in LIKE
+        pattern = STATS + '%' + suffix.replace('_', '\\_')
+        cursor.execute("""SELECT description from nlp.nlp_job_status where nlp_job_id = %s and status like %s""",
+                       [int(job_id), pattern])
+        for row in cursor.fetchall():
+            try:
+                counts = json.loads(row[0])
+            except (TypeError, ValueError):
+                continue
+            for k, v in counts.items():
+                if isinstance(v, (int, float)):
+                    totals[k] = totals.get(k, 0) + v
+    except Exception as ex:
+        traceback.print_exc(file=sys.stdout)
+    finally:
+        connection_pool.release_connection(conn)
+
+    return totals
+
+
 def update_job_status(job_id: str, connection_string: str, updated_status: str, description: str):
-    conn = psycopg2.connect(connection_string)
+    if util.use_async_job_status == "true" and _is_async_status(updated_status):
+        return status_reporter.enqueue(job_id, connection_string, updated_status, description)
+
+    # terminal and warning states are written synchronously, after anything already queued for the job
+    status_reporter.flush()
+    return write_job_status(job_id, connection_string, updated_status, description)
+
+
+def write_job_status(job_id: str, connection_string: str, updated_status: str, description: str, dt=None):
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     flag = -1 # To determine whether the update was successful or not
-    dt = datetime.now()
+    if not dt:
+        dt = datetime.now()
 
     try:
         if not updated_status.startswith(PROPERTIES) and not updated_status.startswith(STATS):
@@ -139,13 +189,130 @@ def update_job_status(job_id: str, connection_string: str, updated_status: str,
         flag = -1
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return flag
 
 
+def _is_async_status(status: str):
+    return status == IN_PROGRESS or status.startswith(STATS) or status.startswith(PROPERTIES)
+
+
+class JobStatusReporter(object):
+    """
+    Background writer for in-progress, STATS and PROPERTIES job status rows. Updates are queued with the time they
+    were reported. Pending updates are coalesced per job and status, keeping only the latest description, so a burst
+    of progress messages for a job writes one row per status. Each flush writes all pending rows with a single
+    multi-row INSERT. A flush happens every flush_seconds, when max_pending rows are queued, and whenever a
+    synchronous status (COMPLETED, FAILURE, KILLED, WARNING) is written.
+    """
+
+    def __init__(self, flush_seconds=None, max_pending=500):
+        if flush_seconds is None:
+            flush_seconds = util.job_status_flush_seconds
+        self.flush_seconds = float(flush_seconds)
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.coalesced = 0
+        self.written = 0
+
+    def _check_fork(self):
+        pid = os.getpid()
+        if self.pid != pid:
+            # a forked child inherits the parent's queue (which the parent will write itself) and possibly locks
+            # that were held by the parent's reporter thread
+            self.pending = OrderedDict()
+            self.lock = threading.Lock()
+            self.write_lock = threading.Lock()
+            self.wake = threading.Event()
+            self.thread = None
+            self.pid = pid
+
+    def _ensure_thread(self):
+        if not self.thread or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='JobStatusReporter', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_seconds)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+
+    def enqueue(self, job_id, connection_string: str, updated_status: str, description: str):
+        self._check_fork()
+        with self.lock:
+            self._ensure_thread()
+            # only the latest description of each status is kept, e.g. the last "Running Batch" message
+            key = (connection_string, str(job_id), updated_status)
+            if key in self.pending:
+                del self.pending[key]
+                self.coalesced += 1
+            self.pending[key] = (description, datetime.now())
+            if len(self.pending) >= self.max_pending:
+                self.wake.set()
+        return 1
+
+    def flush(self):
+        # writes are serialized so a queued in-progress row can never land after a later synchronous status
+        self._check_fork()
+        with self.write_lock:
+            with self.lock:
+                if len(self.pending) == 0:
+                    return 0
+                pending = self.pending
+                self.pending = OrderedDict()
+
+            by_connection = OrderedDict()
+            for (connection_string, job_id, updated_status), (description, dt) in pending.items():
+                by_connection.setdefault(connection_string, list()).append((updated_status, description, dt,
+                                                                            job_id))
+            for connection_string, rows in by_connection.items():
+                self._write_rows(connection_string, rows)
+            return len(pending)
+
+    def _write_rows(self, connection_string, rows):
+        # only the most recent in-progress status per job needs to land on nlp_job
+        job_states = OrderedDict()
+        for updated_status, _, _, job_id in rows:
+            if not updated_status.startswith(PROPERTIES) and not updated_status.startswith(STATS):
+                job_states[job_id] = updated_status
+
+        conn = connection_pool.get_connection(connection_string)
+        cursor = conn.cursor()
+        try:
+            for job_id, updated_status in job_states.items():
+                cursor.execute("""UPDATE nlp.nlp_job set status = %s where nlp_job_id = %s""",
+                               (updated_status, job_id))
+            psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO nlp.nlp_job_status (status, description, date_updated, nlp_job_id)
+                    VALUES %s""", rows, page_size=len(rows))
+            conn.commit()
+            self.written += len(rows)
+        except Exception as e:
+            traceback.print_exc(file=sys.stdout)
+        finally:
+            connection_pool.release_connection(conn)
+
+
+status_reporter = JobStatusReporter()
+atexit.register(status_reporter.flush)
+
+
+def flush_job_status():
+    return status_reporter.flush()
+
+
 def delete_job(job_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     client = util.mongo_client()
 
     cursor = conn.cursor()
@@ -166,13 +333,13 @@ def delete_job(job_id: str, connection_string: str):
         flag = -1
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return flag
 
 
 def query_phenotype_jobs(status: str, connection_string: str, limit=100, skip=0):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     jobs = list()
 
@@ -229,13 +396,13 @@ def query_phenotype_jobs(status: str, connection_string: str, limit=100, skip=0)
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return jobs
 
 
 def query_phenotype_job_by_id(job_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     job = {}
 
@@ -258,7 +425,7 @@ def query_phenotype_job_by_id(job_id: str, connection_string: str):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return job
 
@@ -267,7 +434,7 @@ def get_job_performance(job_ids: list, connection_string: str):
     if not job_ids or len(job_ids) == 0:
         return dict()
 
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     metrics = dict()
 
@@ -367,7 +534,7 @@ def get_job_performance(job_ids: list, connection_string: str):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return metrics
 
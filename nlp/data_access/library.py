@@ -9,9 +9,11 @@ from datetime import datetime, timezone
 
 try:
     from .base_model import BaseModel
+    from . import connection_pool
 except Exception as e:
     print(e)
     from base_model import BaseModel
+    import connection_pool
 
 
 class NLPQL(BaseModel):
@@ -23,7 +25,7 @@ class NLPQL(BaseModel):
 
 
 def create_new_nlpql(nlpql: NLPQL, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -39,13 +41,13 @@ def create_new_nlpql(nlpql: NLPQL, connection_string: str):
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return -1
 
 
 def delete_query(query_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -57,13 +59,13 @@ def delete_query(query_id: str, connection_string: str):
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return -1
 
 
 def get_query(query_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     query = {
 
@@ -89,13 +91,13 @@ def get_query(query_id: str, connection_string: str):
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return query
 
 
 def get_library(connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     library = list()
 
@@ -106,6 +108,6 @@ def get_library(connection_string: str):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return library
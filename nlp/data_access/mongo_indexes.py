@@ -0,0 +1,133 @@
+"""
+Indexes for the Mongo result collections, created when the API and the Luigi workers start. Expression evaluation and
+the phenotype result APIs filter phenotype_results on job_id with nlpql_feature, phenotype_final, subject or report_id,
+and without these indexes every one of those queries scans the whole collection.
+
+In debug mode, log_query_plan prints the plan Mongo picked for an evaluator query, so a query that still scans the
+collection shows up in the log.
+"""
+
+import sys
+import threading
+import traceback
+
+from pymongo import ASCENDING
+
+import util
+
+INDEXES = {
+    'phenotype_results': [
+        # expression evaluation and nlpql_results_to_dataframe match job_id and a set of nlpql_features, then group by
+        # subject or report_id; phenotype_feature_results looks up one feature for one subject
+        [('job_id', ASCENDING), ('nlpql_feature', ASCENDING), ('subject', ASCENDING)],
+        [('job_id', ASCENDING), ('nlpql_feature', ASCENDING), ('report_id', ASCENDING)],
+        # paged_phenotype_results pages through job_id and phenotype_final in _id order
+        [('job_id', ASCENDING), ('phenotype_final', ASCENDING), ('_id', ASCENDING)],
+        # phenotype_subjects groups by subject, phenotype_subject_results looks up one subject
+        [('job_id', ASCENDING), ('phenotype_final', ASCENDING), ('subject', ASCENDING)],
+    ],
+    # the same indexes as scripts/mongo/setup.js
+    'pipeline_results': [
+        [('subject', ASCENDING)],
+        [('job_id', ASCENDING)],
+        [('nlpql_name', ASCENDING)],
+        [('pipeline_id', ASCENDING)],
+    ],
+}
+
+_ensured = False
+_ensure_lock = threading.Lock()
+
+
+def ensure_indexes(db=None):
+    """
+    Creates any of the indexes that don't exist yet, once per process. Creating an index that already exists does
+    nothing, so this is safe to run from every API and Luigi process. Returns the names of the indexes.
+    """
+    global _ensured
+    names = list()
+    with _ensure_lock:
+        if _ensured:
+            return names
+        if db is None:
+            try:
+                db = util.mongo_client()[util.mongo_db]
+            except Exception as e:
+                print('unable to connect to mongo to create indexes: %s' % e)
+                return names
+        for collection_name, indexes in INDEXES.items():
+            for keys in indexes:
+                try:
+                    # a background build doesn't block other operations on the collection
+                    names.append(db[collection_name].create_index(keys, background=True))
+                except Exception as e:
+                    print('unable to create index %s on %s: %s' % (keys, collection_name, e))
+                    traceback.print_exc(file=sys.stdout)
+        _ensured = True
+    print('mongo indexes: %s' % ', '.join(names))
+    return names
+
+
+def ensure_indexes_async():
+    # index builds on a large collection take a while, so startup doesn't wait for them
+    if util.read_boolean_property(util.ensure_mongo_indexes, default=True):
+        thread = threading.Thread(target=ensure_indexes, name='ensure_mongo_indexes', daemon=True)
+        thread.start()
+        return thread
+    return None
+
+
+def plan_summary(explain: dict):
+    """
+    The stages of the winning plan in an explain result, outermost first, with the index each index scan uses,
+    e.g. 'FETCH < IXSCAN(job_id_1_nlpql_feature_1_subject_1)'.
+    """
+    plan = _find_key(explain, 'winningPlan')
+    if plan is None:
+        return 'no plan'
+    stages = list()
+    while plan:
+        stage = plan.get('stage', '?')
+        if 'indexName' in plan:
+            stage = '%s(%s)' % (stage, plan['indexName'])
+        stages.append(stage)
+        if 'inputStage' in plan:
+            plan = plan['inputStage']
+        elif 'inputStages' in plan and len(plan['inputStages']) > 0:
+            plan = plan['inputStages'][0]
+        else:
+            plan = None
+    return ' < '.join(stages)
+
+
+def _find_key(obj, key):
+    # aggregate explain nests the query planner output in its first stage (or in shards), depending on the version
+    if isinstance(obj, dict):
+        if key in obj:
+            return obj[key]
+        values = obj.values()
+    elif isinstance(obj, list):
+        values = obj
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def log_query_plan(collection, label: str, query: dict = None, pipeline: list = None):
+    """
+    In debug mode, prints the plan for a find query or an aggregation pipeline on collection.
+    """
+    if util.debug_mode != "true":
+        return
+    try:
+        if pipeline is not None:
+            explain = collection.database.command('aggregate', collection.name, pipeline=pipeline, explain=True)
+        else:
+            explain = collection.find(query).explain()
+        print('query plan for %s on %s: %s' % (label, collection.name, plan_summary(explain)))
+    except Exception as e:
+        print('unable to explain %s: %s' % (label, e))
@@ -8,10 +8,12 @@ import simplejson as json
 try:
     from .base_model import BaseModel
     from .pipeline_config import PipelineConfig
+    from . import connection_pool
 except Exception as e:
     print(e)
     from base_model import BaseModel
     from pipeline_config import PipelineConfig
+    import connection_pool
 
 
 class PhenotypeDefine(dict):
@@ -146,7 +148,7 @@ class PhenotypeModel(BaseModel):
 
 
 def insert_phenotype_mapping(phenotype_id, pipeline_id, connection_string):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -161,13 +163,13 @@ def insert_phenotype_mapping(phenotype_id, pipeline_id, connection_string):
         print('failed to insert phenotype mapping')
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return 'done'
 
 
 def insert_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     p_id = -1
 
@@ -199,13 +201,13 @@ def insert_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
         print('failed to insert phenotype')
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return p_id
 
 
 def update_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -223,13 +225,13 @@ def update_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
         traceback.print_exc(file=sys.stdout)
         success = False
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return success
 
 
 def phenotype_structure(phenotype_id: int, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     hierarchy = dict()
 
@@ -261,13 +263,13 @@ def phenotype_structure(phenotype_id: int, connection_string: str):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return hierarchy
 
 
 def query_pipeline_ids(phenotype_id: int, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     pipeline_ids = list()
 
@@ -283,13 +285,13 @@ def query_pipeline_ids(phenotype_id: int, connection_string: str):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return pipeline_ids
 
 
 def query_phenotype(phenotype_id: int, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     phenotype = None
 
@@ -304,7 +306,7 @@ def query_phenotype(phenotype_id: int, connection_string: str):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return phenotype
 
@@ -7,9 +7,11 @@ import util
 
 try:
     from .base_model import BaseModel
+    from . import connection_pool
 except Exception as ex:
     print(ex)
     from base_model import BaseModel
+    import connection_pool
 
 
 class Pipeline(BaseModel):
@@ -113,7 +115,7 @@ class PipelineConfig(BaseModel):
 
 
 def insert_pipeline_config(pipeline: PipelineConfig, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
     pipeline_id = -1
 
@@ -134,13 +136,13 @@ def insert_pipeline_config(pipeline: PipelineConfig, connection_string: str):
         print('failed to insert pipeline')
         print(ex)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return pipeline_id
 
 
 def update_pipeline_config(pipeline: PipelineConfig, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -157,13 +159,13 @@ def update_pipeline_config(pipeline: PipelineConfig, connection_string: str):
         print(ex)
         success = True
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return success
 
 
 def get_pipeline_config(pipeline_id, connection_string):
-    conn = psycopg2.connect(connection_string)
+    conn = connection_pool.get_connection(connection_string)
     cursor = conn.cursor()
 
     try:
@@ -185,7 +187,7 @@ def get_pipeline_config(pipeline_id, connection_string):
     except Exception as ex:
         print(ex)
     finally:
-        conn.close()
+        connection_pool.release_connection(conn)
 
     return get_default_config()
 
@@ -226,6 +228,14 @@ def insert_pipeline_results(pipeline_config: PipelineConfig, db, obj):
     return inserted
 
 
+def insert_many_pipeline_results(pipeline_config: PipelineConfig, db, objs: list):
+    if pipeline_config.is_phenotype:
+        inserted = db.phenotype_results.insert_many(objs, ordered=False)
+    else:
+        inserted = db.pipeline_results.insert_many(objs, ordered=False)
+    return inserted
+
+
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         q = sys.argv[1]
@@ -8,6 +8,10 @@ from datetime import datetime
 from bson.objectid import ObjectId
 
 import util
+try:
+    from .mongo_indexes import log_query_plan
+except Exception:
+    from mongo_indexes import log_query_plan
 
 pipeline_output_positions = [
     '_id',
@@ -351,6 +355,9 @@ def paged_phenotype_results(job_id: str, phenotype_final: bool, last_id: str = '
             obj['count'] = int(
                 db.phenotype_results.find({"job_id": int(job_id), "phenotype_final": phenotype_final}).count())
         else:
+            log_query_plan(db.phenotype_results, 'paged_phenotype_results',
+                           query={"_id": {"$gt": ObjectId(last_id)}, "job_id": int(job_id),
+                                  "phenotype_final": phenotype_final})
             res = list(db.phenotype_results.find({"_id": {"$gt": ObjectId(last_id)}, "job_id": int(job_id),
                                                   "phenotype_final": phenotype_final}).limit(page_size))
 
@@ -403,6 +410,7 @@ def phenotype_subjects(job_id: str, phenotype_final: bool):
                 }
             }
         ]
+        log_query_plan(db.phenotype_results, 'phenotype_subjects', pipeline=q)
         res = list(db.phenotype_results.aggregate(q))
         res = sorted(res, key=lambda r: r['count'], reverse=True)
     except Exception as e:
@@ -472,6 +480,7 @@ def phenotype_results_by_context(context: str, query_filters: dict):
             project = 'subject'
         else:
             project = 'report_id'
+        log_query_plan(db["phenotype_results"], 'phenotype_results_by_context', query=query_filters)
         res = list(db["phenotype_results"].find(query_filters, {project: 1}))
 
     except Exception as e:
@@ -0,0 +1,150 @@
+"""
+Compact storage of precomputed segmentation. Instead of copies of every sentence and section, a document stores
+integer boundaries into its own text: [start, end, start, end, ...] for sentences and [start, end, concept id, ...]
+for sections. Both fit the *_ids (multivalued long) dynamic field, and the text is sliced back out only when it's
+needed.
+"""
+
+import re
+from collections.abc import Sequence
+
+SENTENCE_OFFSETS_FIELD = 'sentence_offset_ids'
+SECTION_OFFSETS_FIELD = 'section_offset_ids'
+UNKNOWN_CONCEPT_ID = -1
+UNKNOWN_CONCEPT = 'UNKNOWN'
+
+
+def normalize_whitespace(text: str):
+    # the segmenter and section tagger collapse runs of whitespace, so slices are normalized the same way
+    return ' '.join(text.split())
+
+
+def find_spans(text: str, pieces: list):
+    """
+    The (start, end) of each piece in text, searching forward from the end of the previous one. A piece that isn't
+    found verbatim is matched ignoring whitespace. Pieces that can't be placed get (-1, -1).
+    """
+    spans = list()
+    cursor = 0
+    for piece in pieces:
+        start = text.find(piece, cursor) if len(piece) > 0 else -1
+        end = start + len(piece)
+        if start < 0:
+            end = -1
+            words = piece.split()
+            if len(words) > 0:
+                match = re.compile(r'\s*'.join(re.escape(w) for w in words)).search(text, cursor)
+                if match:
+                    start, end = match.start(), match.end()
+        spans.append((start, end))
+        if start >= 0:
+            cursor = end
+    return spans
+
+
+class TextSlices(Sequence):
+    """
+    A read-only list of the pieces of text between (start, end) spans, sliced when they are read.
+    """
+
+    def __init__(self, text: str, spans: list):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, end = self.spans[i]
+        return normalize_whitespace(self.text[start:end])
+
+
+def report_unplaced(kind: str, spans: list, doc_id=None):
+    unplaced = sum(1 for start, _ in spans if start < 0)
+    if unplaced > 0:
+        print('%d of %d %s of %s could not be placed in the text and were not stored' %
+              (unplaced, len(spans), kind, doc_id if doc_id is not None else 'a document'))
+    return unplaced
+
+
+def encode_sentences(text: str, sentences: list, doc_id=None):
+    offsets = list()
+    spans = find_spans(text, sentences)
+    for start, end in spans:
+        # a sentence that can't be placed is left out, it couldn't be sliced back out of the text
+        if start >= 0:
+            offsets.extend([start, end])
+    report_unplaced('sentences', spans, doc_id)
+    return offsets
+
+
+def encode_sections(text: str, section_names: list, section_texts: list, concept_ids: dict, doc_id=None):
+    offsets = list()
+    spans = find_spans(text, section_texts)
+    for name, (start, end) in zip(section_names, spans):
+        if start >= 0:
+            offsets.extend([start, end, concept_ids.get(name, UNKNOWN_CONCEPT_ID)])
+    report_unplaced('sections', spans, doc_id)
+    return offsets
+
+
+def decode_sentences(text: str, offsets: list):
+    return TextSlices(text, [(offsets[i], offsets[i + 1]) for i in range(0, len(offsets) - 1, 2)])
+
+
+def decode_sections(text: str, offsets: list, concept_names: dict):
+    """
+    The section names and (lazily sliced) section texts for [start, end, concept id, ...] offsets.
+    """
+    names = list()
+    spans = list()
+    for i in range(0, len(offsets) - 2, 3):
+        spans.append((offsets[i], offsets[i + 1]))
+        names.append(concept_names.get(offsets[i + 2], UNKNOWN_CONCEPT))
+    return names, TextSlices(text, spans)
+
+
+PIECE_SLICE = 's'
+PIECE_NORMALIZED = 'n'
+PIECE_TEXT = 't'
+
+
+def pack_pieces(text: str, pieces: list, spans: list):
+    """
+    Pieces of text (sentences, sections) as [start, end, ...] spans and one character per piece that says how it's
+    read back: an exact slice, a slice with normalized whitespace, or the piece itself, which is kept in 'texts' when
+    it can't be sliced out of text.
+    """
+    offsets = list()
+    kinds = list()
+    texts = list()
+    for piece, (start, end) in zip(pieces, spans):
+        offsets.extend([start, end])
+        if start >= 0 and text[start:end] == piece:
+            kinds.append(PIECE_SLICE)
+        elif start >= 0 and normalize_whitespace(text[start:end]) == piece:
+            kinds.append(PIECE_NORMALIZED)
+        else:
+            kinds.append(PIECE_TEXT)
+            texts.append(piece)
+    return {'offsets': offsets, 'kinds': ''.join(kinds), 'texts': texts}
+
+
+def unpack_pieces(text: str, packed: dict):
+    # the pieces and spans of pack_pieces
+    offsets = packed['offsets']
+    texts = iter(packed['texts'])
+    pieces = list()
+    spans = list()
+    for i, kind in enumerate(packed['kinds']):
+        start, end = offsets[2 * i], offsets[2 * i + 1]
+        if kind == PIECE_SLICE:
+            pieces.append(text[start:end])
+        elif kind == PIECE_NORMALIZED:
+            pieces.append(normalize_whitespace(text[start:end]))
+        else:
+            pieces.append(next(texts))
+        spans.append((start, end))
+    return pieces, spans
@@ -1,5 +1,4 @@
 import sys
-from urllib import request
 from urllib.parse import quote
 import simplejson
 import requests
@@ -30,8 +29,7 @@ def get_report_type_mappings(url, inst, key):
     try:
         if len(url) > 0:
             url = "%s/institutes/%s/reportTypes?apiToken=%s" % (url, inst, key)
-            connection = request.urlopen(url)
-            response = simplejson.load(connection)
+            response = util.http_session().get(url).json()
 
             for rep in response:
                 if len(rep['tags']) > 0:
@@ -143,13 +141,15 @@ def get_headers():
     return HEADERS
 
 
-def make_post_body(qry, fq, sort, start, rows):
+def make_post_body(qry, fq, sort, start, rows, fields: list=None):
     data = dict()
     data['query'] = qry
     if fq and len(fq) > 0:
         data['filter'] = fq
     if sort and len(sort) > 0:
         data['sort'] = sort
+    if fields and len(fields) > 0:
+        data['fields'] = list(fields)
     data['offset'] = start
     data['limit'] = rows
     data['params'] = {
@@ -161,7 +161,7 @@ def make_post_body(qry, fq, sort, start, rows):
 def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
           sort='', start=0, rows=10, cohort_ids: list=None, types: list=None,
           filter_query='', job_results_filters: dict=None, sources=None,
-          report_type_query='', solr_url='http://nlp-solr:8983/solr/sample'):
+          report_type_query='', solr_url='http://nlp-solr:8983/solr/sample', fields: list=None):
 
     if tags is None:
         tags = list()
@@ -177,7 +177,7 @@ def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
     url = solr_url + '/select'
     fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
                  job_results_filters, sources)
-    data = make_post_body(qry,  fq, sort, start, rows)
+    data = make_post_body(qry,  fq, sort, start, rows, fields)
     post_data = json.dumps(data, indent=4)
 
     if util.debug_mode == "true":
@@ -185,7 +185,7 @@ def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
         print(post_data)
 
     # Getting ID for new cohort
-    response = requests.post(url, headers=get_headers(), data=post_data)
+    response = util.http_session().post(url, headers=get_headers(), data=post_data)
 
     # print(response['response']['numFound'], "documents found.")
 
@@ -200,6 +200,132 @@ def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
     return doc_results
 
 
+def make_partition_fq(partition: int, partitions: int):
+    # Solr's hash query parser keeps the documents whose key hashes to this worker, so each partition is a disjoint
+    # slice of the results that can be read without skipping over the others. The key field is not a local param,
+    # it's read from the partitionKeys request parameter, see make_partition_params.
+    return '{!hash workers=%d worker=%d}' % (partitions, partition)
+
+
+def make_partition_params(key_field: str=None):
+    if not key_field:
+        key_field = util.solr_report_id_field
+    return {'partitionKeys': key_field}
+
+
+def query_pages(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
+                cohort_ids: list=None, types: list=None, filter_query='', job_results_filters: dict=None,
+                sources: list=None, report_type_query='', solr_url='http://nlp-solr:8983/solr/sample',
+                fields: list=None, rows=100, limit=0, partition=0, partitions=1, sort_field: str=None,
+                cursor_mark='*'):
+    """
+    Yields (docs, next_cursor_mark) for each page of documents matching the query, paging with a Solr cursor
+    (cursorMark) sorted on the unique id field, so reading page n costs the same as reading the first page. Passing a
+    next_cursor_mark back as cursor_mark resumes after that page. Only the listed fields are returned if fields is
+    set. With partitions > 1, only the documents in the given partition (0 to partitions - 1) are read. At most limit
+    documents are returned if limit > 0.
+    """
+
+    if tags is None:
+        tags = list()
+    if cohort_ids is None:
+        cohort_ids = list()
+    if types is None:
+        types = list()
+    if job_results_filters is None:
+        job_results_filters = dict()
+    if sources is None:
+        sources = list()
+    if not sort_field:
+        sort_field = util.solr_id_field if util.solr_id_field else 'id'
+
+    url = solr_url + '/select'
+    fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
+                 job_results_filters, sources)
+    filters = list()
+    params = dict()
+    if fq and len(fq) > 0:
+        filters.append(fq)
+    if partitions > 1:
+        filters.append(make_partition_fq(partition, partitions))
+        params.update(make_partition_params())
+
+    sort = '%s asc' % sort_field
+    count = 0
+    while True:
+        page_rows = rows
+        if limit > 0:
+            page_rows = min(rows, limit - count)
+        data = make_post_body(qry, filters, sort, 0, page_rows, fields)
+        data['params'].update(params)
+        data['params']['cursorMark'] = cursor_mark
+        post_data = json.dumps(data)
+
+        if util.debug_mode == "true":
+            print("Querying with cursor " + url)
+            print(post_data)
+
+        response = util.http_session().post(url, headers=get_headers(), data=post_data)
+        if response.status_code != 200:
+            # fail rather than silently return a partial result set
+            raise requests.HTTPError('Solr cursor query failed (%d): %s' % (response.status_code, response.text),
+                                     response=response)
+
+        res = response.json()
+        docs = res['response']['docs']
+        next_cursor_mark = res.get('nextCursorMark')
+        count += len(docs)
+        if len(docs) > 0:
+            yield docs, next_cursor_mark
+
+        if len(docs) == 0 or not next_cursor_mark or next_cursor_mark == cursor_mark or 0 < limit <= count:
+            break
+        cursor_mark = next_cursor_mark
+
+
+def query_stream(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
+                 cohort_ids: list=None, types: list=None, filter_query='', job_results_filters: dict=None,
+                 sources: list=None, report_type_query='', solr_url='http://nlp-solr:8983/solr/sample',
+                 fields: list=None, rows=100, limit=0, partition=0, partitions=1, sort_field: str=None):
+    """
+    Yields every document matching the query, one cursor page at a time (see query_pages).
+    """
+    for docs, _ in query_pages(qry, mapper_url=mapper_url, mapper_inst=mapper_inst, mapper_key=mapper_key, tags=tags,
+                               cohort_ids=cohort_ids, types=types, filter_query=filter_query,
+                               job_results_filters=job_results_filters, sources=sources,
+                               report_type_query=report_type_query, solr_url=solr_url, fields=fields, rows=rows,
+                               limit=limit, partition=partition, partitions=partitions, sort_field=sort_field):
+        for doc in docs:
+            yield doc
+
+
+def make_atomic_update(doc_id, fields: dict, id_field: str=None):
+    # only the given fields are replaced, the rest of the stored document is kept by Solr
+    if not id_field:
+        id_field = util.solr_id_field if util.solr_id_field else 'id'
+    update = {id_field: doc_id}
+    for k, v in fields.items():
+        update[k] = {'set': v}
+    return update
+
+
+def update_docs(updates: list, solr_url='http://nlp-solr:8983/solr/sample', commit_within=0, commit=False):
+    """
+    Posts a list of updates (such as ones from make_atomic_update) to Solr, returns the response.
+    """
+    url = solr_url + '/update'
+    params = dict()
+    if commit:
+        params['commit'] = 'true'
+    elif commit_within > 0:
+        params['commitWithin'] = str(commit_within)
+
+    if util.debug_mode == "true":
+        print("Updating %d documents %s" % (len(updates), url))
+
+    return util.http_session().post(url, headers=get_headers(), params=params, data=json.dumps(updates))
+
+
 def query_doc_size(qry, mapper_url, mapper_inst, mapper_key, tags: list=None,
                    sort='', start=0, rows=10, cohort_ids: list=None, types: list=None,
                    filter_query='', job_results_filters: dict=None, sources: list=None,
@@ -227,7 +353,7 @@ def query_doc_size(qry, mapper_url, mapper_inst, mapper_key, tags: list=None,
         print(post_data)
 
     # Getting ID for new cohort
-    response = requests.post(url, headers=get_headers(), data=post_data)
+    response = util.http_session().post(url, headers=get_headers(), data=post_data)
     if response.status_code != 200:
         return 0
 
@@ -244,13 +370,59 @@ def query_doc_by_id(report_id, solr_url='http://nlp-solr:8983/solr/sample'):
         print("Querying to get document " + url)
         print(post_data)
 
-    response = requests.post(url, headers=get_headers(), data=post_data)
+    response = util.http_session().post(url, headers=get_headers(), data=post_data)
     if response.status_code != 200:
         return {}
 
     return response.json()['response']['docs'][0]
 
 
+# separators for the terms query parser, the first one that isn't in any of the ids is used
+_TERMS_SEPARATORS = [',', '|', ';', '\t', '\u001f']
+
+
+def query_docs_by_ids(report_ids, solr_url='http://nlp-solr:8983/solr/sample', fields: list=None, chunk_size=500):
+    # many documents in one request per chunk with the terms query parser, returned as a dict keyed by report id
+    docs = dict()
+    report_ids = [str(r) for r in report_ids if r is not None and len(str(r)) > 0]
+    if len(report_ids) == 0:
+        return docs
+
+    url = solr_url + '/select'
+    id_field = util.solr_report_id_field if util.solr_report_id_field else 'report_id'
+    for i in range(0, len(report_ids), chunk_size):
+        chunk = list(set(report_ids[i:i + chunk_size]))
+        separator = next((s for s in _TERMS_SEPARATORS if not any(s in r for r in chunk)), None)
+        if separator is None:
+            # every separator occurs in some id, so query them one at a time
+            for report_id in chunk:
+                doc = query_doc_by_id(report_id, solr_url=solr_url)
+                if doc:
+                    docs[report_id] = doc
+            continue
+
+        # the value after the local params is taken literally, only the separator splits it
+        qry = "{!terms f=%s separator='%s'}%s" % (id_field, separator, separator.join(chunk))
+        data = make_post_body(qry, '', '', 0, len(chunk), fields)
+        post_data = json.dumps(data)
+
+        if util.debug_mode == "true":
+            print("Querying to get %d documents %s" % (len(chunk), url))
+
+        response = util.http_session().post(url, headers=get_headers(), data=post_data)
+        if response.status_code != 200:
+            print('unable to get %d documents by id from %s (%d): %s' % (len(chunk), url, response.status_code,
+                                                                       response.text))
+            continue
+
+        for doc in response.json()['response']['docs']:
+            report_id = doc.get(id_field)
+            if report_id is not None and str(report_id) not in docs:
+                docs[str(report_id)] = doc
+
+    return docs
+
+
 if __name__ == '__main__':
     solr = util.solr_url
     if len(sys.argv) > 1:
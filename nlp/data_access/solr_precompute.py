@@ -1,33 +1,47 @@
-import util
+"""
+Precomputes sentences and sections for the documents in a Solr core and stores their offsets in the
+sentence_offset_ids and section_offset_ids fields (see segmentation_store), which are used instead of segmenting at
+run time when use_precomputed_segmentation is true. The sentence_attrs, section_name_attrs and section_text_attrs
+fields written by older versions, which held copies of the text, are removed.
+
+Documents are read with a cursor over the query (by default, the documents without sentence_offset_ids), segmented
+and section tagged in a pool of worker processes, and written back with atomic updates that only carry these fields.
+After every batch that is written, the cursor is saved to the checkpoint file, so an interrupted run picks up where it
+stopped when it is run again with the same query and partition. Each partition has its own checkpoint file by default.
+
+    python3 solr_precompute.py --workers 8
+    python3 solr_precompute.py --query '*:*' --checkpoint all.json --partition 0 --partitions 4
+"""
+
+import argparse
+import collections
 import json
-import requests
-from algorithms import segmentation, segmentation_init
+import multiprocessing
+import os
+import sys
+import time
+
+import util
+from algorithms import segmentation
 from algorithms.sec_tag import *
 try:
-    from .solr_data import query, query_doc_size
+    from .solr_data import query_pages, query_doc_size, make_atomic_update, update_docs
+    from .segmentation_store import encode_sentences, encode_sections, SENTENCE_OFFSETS_FIELD, SECTION_OFFSETS_FIELD
 except Exception:
-    from solr_data import query, query_doc_size
+    from solr_data import query_pages, query_doc_size, make_atomic_update, update_docs
+    from segmentation_store import encode_sentences, encode_sections, SENTENCE_OFFSETS_FIELD, SECTION_OFFSETS_FIELD
 
-segment = segmentation.Segmentation()
-batch_size = 10
-solr_url = "http://18.220.133.76:8983/solr/sample"
 sentences_key = "sentence_attrs"
 section_names_key = "section_name_attrs"
 section_text_key = "section_text_attrs"
-url = solr_url + '/update?commit=true'
-headers = {
-    'Content-type': 'application/json',
-}
-doc_size = 0
-spacy = segmentation_init(tries=2)
+DEFAULT_QUERY = "-%s:*" % SENTENCE_OFFSETS_FIELD
+DEFAULT_CHECKPOINT = 'solr_precompute_checkpoint.json'
 
-
-def document_sentences(txt):
-    sentence_list = segment.parse_sentences(txt, spacy=spacy)
-    return sentence_list
+# created in each worker process, the spaCy model isn't shared across a fork
+_segment = None
 
 
-def document_text(doc, clean=True):
+def document_text(doc, clean=False):
     if doc and util.solr_text_field in doc:
         txt = doc[util.solr_text_field]
         if type(txt) == str:
@@ -45,90 +59,234 @@ def document_text(doc, clean=True):
         return ''
 
 
-def retry(docs):
-    updated_docs = list()
+def document_sentences(txt):
+    global _segment
+    if _segment is None:
+        _segment = segmentation.Segmentation()
+    return _segment.parse_sentences(txt)
 
-    for d in docs:
-        d[section_names_key] = []
-        d[section_text_key] = []
-        updated_docs.append(d)
-    data = json.dumps(updated_docs)
-    response2 = requests.post(url, headers=headers, data=data)
 
-    if response2.status_code == 200:
-        print('successful retry!!!')
-    else:
-        print('failed retry: ', response2.reason)
-        print(response2.content)
+def document_sections(txt):
+    if len(concept_to_cid_map) == 0:
+        section_tagger_init()
+    section_headers, section_texts = [UNKNOWN], [txt]
+    try:
+        section_headers, section_texts = sec_tag_process(txt)
+    except Exception as e:
+        print(e)
+    return [x.concept for x in section_headers], section_texts
 
 
-def pre_compute(n):
-    try:
-        docs = query("-sentence_attrs:*", solr_url=solr_url, mapper_inst=util.report_mapper_inst,
-                     mapper_key=util.report_mapper_key, sort="source DESC",
-                     mapper_url=util.report_mapper_url, start=n, rows=batch_size)
-        updated_docs = list()
-        ids = list()
-        for doc in docs:
-            txt = document_text(doc, clean=True)
-            updates = False
-            if sentences_key not in doc:
-                sentences = document_sentences(txt)
-                doc[sentences_key] = sentences
-                updates = True
-
-            if section_names_key not in doc:
-                section_headers, section_texts = [UNKNOWN], [txt]
-                try:
-                    section_headers, section_texts = sec_tag_process(txt)
-                except Exception as e:
-                    print(e)
-                names = [x.concept for x in section_headers]
-                doc[section_names_key] = names
-                doc[section_text_key] = section_texts
-                updates = True
-
-            if updates:
-                ids.append(doc[util.solr_report_id_field])
-                updated_docs.append(doc)
-
-        print('updating the following docs: ', ids)
-        if n % 10 == 0:
-            print("******************************")
-            done_doc_size = query_doc_size("sentence_attrs:*", solr_url=solr_url, mapper_inst=util.report_mapper_inst,
-                                      mapper_key=util.report_mapper_key, mapper_url=util.report_mapper_url)
-
-            pct = (float(done_doc_size) / float(doc_size)) * 100.0
-            print("updated overall: %d/%d (%f pct)" % (done_doc_size, doc_size, pct))
-            print("******************************")
-        data = json.dumps(updated_docs)
-        response2 = requests.post(url, headers=headers, data=data)
-
-        if response2.status_code == 200:
-            print('success!!!')
+def precompute_fields(item):
+    # runs in a worker, item is (doc id, text), the offsets are into the text as the pipeline reads it
+    doc_id, txt = item
+    names, section_texts = document_sections(txt)
+    return doc_id, {
+        SENTENCE_OFFSETS_FIELD: encode_sentences(txt, document_sentences(txt), doc_id=doc_id),
+        SECTION_OFFSETS_FIELD: encode_sections(txt, names, section_texts, concept_to_cid_map, doc_id=doc_id),
+        # setting a field to null removes it
+        sentences_key: None,
+        section_names_key: None,
+        section_text_key: None
+    }
+
+
+def precompute_batch(items):
+    return [precompute_fields(item) for item in items]
+
+
+def default_checkpoint(partition=0, partitions=1):
+    # runs over different partitions would overwrite each other's cursor in a shared file
+    if partitions > 1:
+        return 'solr_precompute_checkpoint_%d_of_%d.json' % (partition, partitions)
+    return DEFAULT_CHECKPOINT
+
+
+def read_checkpoint(path, qry, partition=0, partitions=1):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('query') != qry:
+        print('checkpoint %s is for query "%s", starting over' % (path, checkpoint.get('query')))
+        return None
+    if checkpoint.get('partition', 0) != partition or checkpoint.get('partitions', 1) != partitions:
+        print('checkpoint %s is for partition %s of %s, starting over' % (path, checkpoint.get('partition', 0),
+                                                                          checkpoint.get('partitions', 1)))
+        return None
+    return checkpoint
+
+
+def write_checkpoint(path, qry, cursor_mark, processed, failed, partition=0, partitions=1):
+    if not path:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'query': qry, 'partition': partition, 'partitions': partitions, 'cursor_mark': cursor_mark,
+                   'processed': processed, 'failed': failed}, f)
+    # the rename is atomic, so the checkpoint is never half written
+    os.replace(tmp_path, path)
+
+
+def post_updates(results, solr_url, commit_within):
+    """
+    Writes a batch of precomputed fields as atomic updates. If the batch is rejected, the documents are sent one at a
+    time so one bad document doesn't hold up the rest. Returns the ids that couldn't be updated.
+    """
+    updates = [make_atomic_update(doc_id, fields) for doc_id, fields in results]
+    response = update_docs(updates, solr_url=solr_url, commit_within=commit_within)
+    if response.status_code == 200:
+        return list()
+
+    print('batch update failed (%d), retrying one at a time: %s' % (response.status_code, response.text))
+    failed = list()
+    for (doc_id, _), update in zip(results, updates):
+        response = update_docs([update], solr_url=solr_url, commit_within=commit_within)
+        if response.status_code != 200:
+            print('failed to update %s: %s' % (doc_id, response.text))
+            failed.append(doc_id)
+    return failed
+
+
+class ProgressReporter(object):
+
+    def __init__(self, total, processed=0, interval=10.0):
+        self.total = total
+        self.start_processed = processed
+        self.processed = processed
+        self.interval = interval
+        self.start_time = time.time()
+        self.last_time = self.start_time
+        self.last_processed = processed
+
+    def add(self, count, force=False):
+        self.processed += count
+        now = time.time()
+        if not force and now - self.last_time < self.interval:
+            return
+        elapsed = max(now - self.start_time, 1e-9)
+        overall = (self.processed - self.start_processed) / elapsed
+        recent = (self.processed - self.last_processed) / max(now - self.last_time, 1e-9)
+        if self.total > 0:
+            remaining = max(self.total - (self.processed - self.start_processed), 0)
+            eta = remaining / overall if overall > 0 else 0.0
+            print('%d docs, %.1f docs/sec (%.1f recent), about %d of this run remaining, eta %.0f sec' %
+                  (self.processed, overall, recent, remaining, eta))
         else:
-            print('fail: ', response2.reason)
-            print(response2.content)
-            retry(updated_docs)
-    except Exception as ex:
-        print('exception updating docs')
-        return False
-    return True
+            print('%d docs, %.1f docs/sec (%.1f recent)' % (self.processed, overall, recent))
+        self.last_time = now
+        self.last_processed = self.processed
+
+
+def run(qry=DEFAULT_QUERY, solr_url=None, workers=None, batch_size=100, checkpoint_path=DEFAULT_CHECKPOINT,
+        commit_within=60000, limit=0, partition=0, partitions=1, report_seconds=10.0):
+    if not solr_url:
+        solr_url = util.solr_url
+    if not workers:
+        workers = max(multiprocessing.cpu_count() - 1, 1)
+    if checkpoint_path == DEFAULT_CHECKPOINT:
+        checkpoint_path = default_checkpoint(partition, partitions)
+
+    cursor_mark = '*'
+    processed = 0
+    failed = list()
+    checkpoint = read_checkpoint(checkpoint_path, qry, partition, partitions)
+    if checkpoint:
+        cursor_mark = checkpoint['cursor_mark']
+        processed = checkpoint['processed']
+        failed = checkpoint.get('failed', list())
+        print('resuming after %d docs' % processed)
+
+    total = query_doc_size(qry, '', '', '', solr_url=solr_url)
+    if partitions > 1:
+        total = total // partitions
+    if limit > 0:
+        total = min(total, limit)
+    print('precomputing %s on %s with %d workers, %d docs match' % (qry, solr_url, workers, total))
+
+    fields = [util.solr_id_field, util.solr_text_field]
+    progress = ProgressReporter(total, processed, interval=report_seconds)
+    pages = query_pages(qry, solr_url=solr_url, fields=fields, rows=batch_size, limit=limit, partition=partition,
+                        partitions=partitions, cursor_mark=cursor_mark)
+
+    # keeps a couple of batches per worker queued, Solr is read and written in this process while the pool works
+    pending = collections.deque()
+    with multiprocessing.Pool(workers) as pool:
+
+        def finish_oldest():
+            async_result, next_cursor_mark = pending.popleft()
+            results = async_result.get()
+            failed.extend(post_updates(results, solr_url, commit_within))
+            write_checkpoint(checkpoint_path, qry, next_cursor_mark, progress.processed + len(results), failed,
+                             partition, partitions)
+            progress.add(len(results))
+
+        for docs, next_cursor_mark in pages:
+            items = [(doc[util.solr_id_field], document_text(doc)) for doc in docs]
+            # spread each page over the workers
+            chunk_size = max(1, (len(items) + workers - 1) // workers)
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            async_result = pool.map_async(precompute_batch, chunks)
+            pending.append((_FlattenedResult(async_result), next_cursor_mark))
+            while len(pending) > 2:
+                finish_oldest()
+
+        while len(pending) > 0:
+            finish_oldest()
+
+    response = update_docs(list(), solr_url=solr_url, commit=True)
+    if response.status_code != 200:
+        print('final commit failed: %s' % response.text)
+    progress.add(0, force=True)
+    if len(failed) > 0:
+        print('%d docs could not be updated: %s' % (len(failed), failed))
+    return progress.processed, failed
+
+
+class _FlattenedResult(object):
+    # the results of a page's chunks as one list, in document order
+
+    def __init__(self, async_result):
+        self.async_result = async_result
+
+    def get(self):
+        return [r for chunk in self.async_result.get() for r in chunk]
 
 
-def get_documents():
-    global doc_size
-    doc_size = query_doc_size("*:*", solr_url=solr_url, mapper_inst=util.report_mapper_inst,
-                              mapper_key=util.report_mapper_key, mapper_url=util.report_mapper_url)
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='precompute sentences and sections for the documents in a Solr core')
+    parser.add_argument('--solr-url', default=util.solr_url, help='Solr core URL (default: [solr] url)')
+    parser.add_argument('--query', default=DEFAULT_QUERY,
+                        help='documents to process (default: the ones without %s)' % SENTENCE_OFFSETS_FIELD)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='worker processes (default: number of CPUs - 1)')
+    parser.add_argument('--batch-size', type=int, default=100, help='documents read and written per request')
+    parser.add_argument('--checkpoint', default=None,
+                        help='file that records progress, so the run can be resumed (default: %s, or '
+                             'solr_precompute_checkpoint_<partition>_of_<partitions>.json with --partitions)'
+                             % DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the beginning')
+    parser.add_argument('--commit-within', type=int, default=60000,
+                        help='milliseconds Solr may wait before committing updates')
+    parser.add_argument('--limit', type=int, default=0, help='stop after this many documents')
+    parser.add_argument('--partition', type=int, default=0,
+                        help='with --partitions, the hash partition (0 to partitions - 1) this run processes')
+    parser.add_argument('--partitions', type=int, default=1,
+                        help='split the documents into this many partitions, for several runs in parallel')
+    parser.add_argument('--report-seconds', type=float, default=10.0, help='seconds between progress reports')
+    opts = parser.parse_args(args)
 
-    i = 0
-    while i < doc_size:
-        print("on batch %d" % i)
-        pre_compute(i)
+    if not opts.checkpoint:
+        opts.checkpoint = default_checkpoint(opts.partition, opts.partitions)
+    if opts.restart and os.path.exists(opts.checkpoint):
+        os.remove(opts.checkpoint)
 
-        i += batch_size
+    _, failed = run(qry=opts.query, solr_url=opts.solr_url, workers=opts.workers, batch_size=opts.batch_size,
+                    checkpoint_path=opts.checkpoint, commit_within=opts.commit_within, limit=opts.limit,
+                    partition=opts.partition, partitions=opts.partitions, report_seconds=opts.report_seconds)
+    return 1 if len(failed) > 0 else 0
 
 
 if __name__ == "__main__":
-    print('update values')
-    get_documents()
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import copy
 import datetime
+import json
 
 import luigi
 from pymongo.errors import BulkWriteError
@@ -11,6 +12,9 @@ from data_access import update_phenotype_model
 from luigi_tools import phenotype_helper
 from tasks import *
 
+# the Luigi workers import this module, evaluating phenotype operations needs the phenotype_results indexes
+data_access.ensure_indexes_async()
+
 
 # TODO eventually move this to luigi_tools, but need to make sure successfully can be found in sys.path
 # didn't seem like it was with initial efforts
@@ -50,6 +54,7 @@ class PhenotypeTask(luigi.Task):
     def run(self):
         print('dependencies done; run phenotype reconciliation')
         client = util.mongo_client()
+        pg_start = data_access.get_connection_counts()
 
         try:
             data_access.update_job_status(str(self.job), util.conn_string, data_access.IN_PROGRESS,
@@ -79,12 +84,31 @@ class PhenotypeTask(luigi.Task):
                                           str(util.get_cache_compute_count()))
             data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_CACHE_HIT_RATIO",
                                           str(util.get_cache_hit_ratio()))
+            # the batches ran in other worker processes and reported their own counts
+            pg_counts = data_access.sum_job_stats(str(self.job), util.conn_string, data_access.PG_CONNECTIONS_STATS)
+            for k, v in data_access.counts_since(pg_start).items():
+                pg_counts[k] = pg_counts.get(k, 0) + v
+            data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_PG_CONNECTIONS_OPENED",
+                                          str(pg_counts.get('opened', 0)))
+            data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_PG_CONNECTIONS_REUSED",
+                                          str(pg_counts.get('reused', 0)))
+            http_stats = util.get_http_stats()
+            if len(http_stats) > 0:
+                data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_HTTP_ENDPOINTS",
+                                              json.dumps(http_stats))
 
             for k in util.properties.keys():
                 data_access.update_job_status(str(self.job), util.conn_string, data_access.PROPERTIES + "_" + k,
                                               util.properties[k])
             with self.output().open('w') as outfile:
-                phenotype_helper.write_phenotype_results(db, self.job, phenotype, self.phenotype, self.phenotype)
+                cache_stats = phenotype_helper.write_phenotype_results(db, self.job, phenotype, self.phenotype,
+                                                                       self.phenotype)
+                data_access.update_job_status(str(self.job), util.conn_string,
+                                              data_access.STATS + "_SUBEXPRESSION_CACHE_HITS",
+                                              str(cache_stats['hits']))
+                data_access.update_job_status(str(self.job), util.conn_string,
+                                              data_access.STATS + "_SUBEXPRESSION_CACHE_MISSES",
+                                              str(cache_stats['misses']))
                 data_access.update_job_status(str(self.job), util.conn_string, data_access.COMPLETED,
                                               "Job completed successfully")
                 outfile.write("DONE!")
@@ -169,7 +193,13 @@ class PipelineTask(luigi.Task):
                                                                                                .owner)
 
             task = registered_pipelines[str(self.pipelinetype)]
-            if task.parallel_task:
+            if task.parallel_task and util.use_solr_partitions == "true" and doc_limit >= total_docs:
+                # every matching document is read, so batches can be hash partitions rather than deep offsets
+                partition_count = len(ranges)
+                matches = [task(pipeline=self.pipeline, job=self.job, start=n, solr_query=self.solr_query, batch=n,
+                                partition=i, partition_count=partition_count)
+                           for i, n in enumerate(ranges)]
+            elif task.parallel_task:
                 matches = [task(pipeline=self.pipeline, job=self.job, start=n, solr_query=self.solr_query, batch=n)
                            for n in ranges]
             else:
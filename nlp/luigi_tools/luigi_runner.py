@@ -1,7 +1,6 @@
 from subprocess import call
 
 import luigi
-import requests
 import time
 
 from data_access import *
@@ -11,7 +10,7 @@ from luigi_tools.phenotype_helper import *
 def get_active_workers():
     url = util.luigi_scheduler + "/api/task_list?data={%22status%22:%22RUNNING%22}"
     print(url)
-    req = requests.get(url)
+    req = util.http_session().get(url)
     if req.status_code == 200:
         json_res = req.json()
         keys = (json_res['response'].keys())
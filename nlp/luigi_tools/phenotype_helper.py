@@ -1,14 +1,20 @@
 import collections
 import datetime
+import heapq
+import itertools
+import re
 import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from functools import reduce
 
 import pandas as pd
+from bson import BSON
 
 import util
 from data_access import PhenotypeModel, PipelineConfig, PhenotypeEntity, PhenotypeOperations
-from data_access import expr_eval, expr_result
+from data_access import expr_eval, expr_bitmap, expr_result, log_query_plan
 from ohdsi import getCohort
 
 # import json
@@ -16,10 +22,16 @@ from ohdsi import getCohort
 
 DEBUG_LIMIT = 1000
 COL_LIST = ["_id", "report_date", 'report_id', 'subject', 'sentence']
+CATEGORY_COLUMNS = ['nlpql_feature', 'subject']
+# result documents converted to a DataFrame at a time, see results_dataframe
+DATAFRAME_BATCH_SIZE = 10000
 
 pipeline_keys = PipelineConfig('test', 'test').__dict__.keys()
 numeric_comp_operators = ['==', '=', '>', '<', '<=', '>=']
 
+# a name in an expression, not the attribute in Temperature.value
+name_regex = re.compile(r'(?<![\w.$])[a-zA-Z_$][\w$]*')
+
 
 def get_terms(model: PhenotypeModel):
     terms = dict()
@@ -366,11 +378,12 @@ def is_value(test: str):
 
 
 def get_numeric_comparison_df(action, df, ent, attr, value_comp):
+    df = df[df['nlpql_feature'] == ent]
     try:
         value_comp = float(value_comp)
-        new_df = df.query("(nlpql_feature == '%s') & (%s %s %f)" % (ent, attr, action, value_comp))
+        new_df = df.query("%s %s %f" % (attr, action, value_comp))
     except Exception as e:
-        new_df = df.query("(nlpql_feature == '%s') & (%s %s %s)" % (ent, attr, action, str(value_comp)))
+        new_df = df.query("%s %s %s" % (attr, action, str(value_comp)))
 
     return new_df
 
@@ -410,10 +423,112 @@ def convert_days_to_months(days):
     return months
 
 
-def nlpql_results_to_dataframe(db, job, lookup_key, entity_features, final):
+def find_results(db, job, lookup_key, entity_features, results=None, label='find_results', projection=None):
+    """
+    The result documents of a job that have one of entity_features as the value of lookup_key. The results of
+    operations that are held in results (see OperationResults) are read from memory, the others from Mongo, as an
+    iterator over the documents. If projection is a list of fields, Mongo only returns those fields.
+    """
+    docs = list()
+    if results is not None and lookup_key == 'nlpql_feature':
+        found = results.get(entity_features)
+        for feature_docs in found.values():
+            docs.extend(feature_docs)
+        entity_features = [e for e in entity_features if e not in found]
+    if len(entity_features) == 0:
+        return iter(docs)
+
     query = {"job_id": int(job), lookup_key: {"$in": entity_features}}
-    cursor = db.phenotype_results.find(query)
-    df = pd.DataFrame(list(cursor))
+    log_query_plan(db.phenotype_results, label, query=query)
+    if projection is not None:
+        cursor = db.phenotype_results.find(query, {f: 1 for f in projection})
+    else:
+        cursor = db.phenotype_results.find(query)
+    cursor.batch_size(DATAFRAME_BATCH_SIZE)
+    return itertools.chain(docs, cursor)
+
+
+def find_results_by_id(db, job, ids: list, entity_features, results=None):
+    """
+    Copies of the complete result documents with the given _ids, in the order of ids. Documents of operations that
+    are held in results are read from memory, the others from Mongo, DATAFRAME_BATCH_SIZE ids at a time.
+    """
+    wanted = set(ids)
+    by_id = dict()
+    if results is not None:
+        for feature_docs in results.get(entity_features).values():
+            for doc in feature_docs:
+                if doc['_id'] in wanted:
+                    by_id[doc['_id']] = doc
+    remaining = [i for i in ids if i not in by_id]
+    for start in range(0, len(remaining), DATAFRAME_BATCH_SIZE):
+        query = {"job_id": int(job), "_id": {"$in": remaining[start:start + DATAFRAME_BATCH_SIZE]}}
+        for doc in db.phenotype_results.find(query):
+            by_id[doc['_id']] = doc
+    return [dict(by_id[i]) for i in ids if i in by_id]
+
+
+def operation_result_docs(docs: list, job, phenotype_id, phenotype_owner, on, c: PhenotypeOperations):
+    # the result documents of an operation that keeps whole result documents, like OR and the comparisons
+    job_date = datetime.datetime.now()
+    for doc in docs:
+        doc['job_id'] = job
+        doc['phenotype_id'] = phenotype_id
+        doc['owner'] = phenotype_owner
+        doc['job_date'] = job_date
+        doc['context_type'] = on
+        doc['raw_definition_text'] = c['raw_text']
+        doc['nlpql_feature'] = c['name']
+        doc['phenotype_final'] = c['final']
+        doc['orig_id'] = doc.pop('_id')
+    return docs
+
+
+def results_dataframe(docs, columns: list, categories=None):
+    """
+    A DataFrame of the given columns of the result documents, built DATAFRAME_BATCH_SIZE documents at a time, so only
+    one batch is held as dicts. The categories columns (default CATEGORY_COLUMNS) are categoricals, since the results
+    of a job repeat a few features and subjects many times.
+    """
+    if categories is None:
+        categories = CATEGORY_COLUMNS
+    categories = [c for c in categories if c in columns]
+
+    def to_frame(batch):
+        frame = pd.DataFrame(batch, columns=columns)
+        # the categories share one string per value, instead of one per document
+        for c in categories:
+            frame[c] = frame[c].astype('category')
+        return frame
+
+    frames = list()
+    batch = list()
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == DATAFRAME_BATCH_SIZE:
+            frames.append(to_frame(batch))
+            batch = list()
+    if len(batch) > 0 or len(frames) == 0:
+        frames.append(to_frame(batch))
+    del batch
+
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    del frames
+    # the batches have different categories, so they are concatenated as objects
+    for c in categories:
+        df[c] = df[c].astype('category')
+    return df
+
+
+def nlpql_results_to_dataframe(db, job, lookup_key, entity_features, final, results=None, attributes=None):
+    columns = COL_LIST + [lookup_key]
+    if attributes:
+        columns += [a for a in attributes if a not in columns]
+    docs = find_results(db, job, lookup_key, entity_features, results, 'nlpql_results_to_dataframe',
+                        projection=columns)
+    df = results_dataframe(docs, columns, categories=[lookup_key])
     if not df.empty:
         df['subject'] = df['subject'].astype(int)
     return df
@@ -433,13 +548,13 @@ def process_date_diff(pe: PhenotypeEntity, db, job, phenotype: PhenotypeModel, p
     df2 = get_ohdsi_cohort(ent2, attr2, phenotype)
     empty = False
     if df1.empty:
-        df1 = nlpql_results_to_dataframe(db, job, 'nlpql_feature', [ent1], final)
+        df1 = nlpql_results_to_dataframe(db, job, 'nlpql_feature', [ent1], final, attributes=[attr1])
         if not df1.empty:
             df1[attr1] = df1[attr1].apply(string_to_datetime)
         else:
             empty = True
     if df2.empty:
-        df2 = nlpql_results_to_dataframe(db, job, 'nlpql_feature', [ent2], final)
+        df2 = nlpql_results_to_dataframe(db, job, 'nlpql_feature', [ent2], final, attributes=[attr2])
         if not df2.empty:
             df2[attr2] = df2[attr2].apply(string_to_datetime)
         else:
@@ -500,7 +615,7 @@ def get_all_names(phenotype: PhenotypeModel):
 
 
 def process_operations(db, job, phenotype: PhenotypeModel, phenotype_id, phenotype_owner, c: PhenotypeOperations,
-                       final=False):
+                       final=False, results=None, cache=None):
     try:
         evaluator = util.expression_evaluator
     except:
@@ -513,8 +628,8 @@ def process_operations(db, job, phenotype: PhenotypeModel, phenotype_id, phenoty
     nlpql_feature = c['name']
 
     mongo_failed = False
-    if 'mongo' == evaluator:
-        print('Using mongo evaluator for expression "{0}"'.format(expression))
+    if 'mongo' == evaluator or 'bitmap' == evaluator:
+        print('Using {0} evaluator for expression "{1}"'.format(evaluator, expression))
 
         # The validate_phenotype function parses the expression and checks it
         # for various errors. A normalized version of the expression is then
@@ -547,15 +662,16 @@ def process_operations(db, job, phenotype: PhenotypeModel, phenotype_id, phenoty
                 mongo_failed = True
             else:
                 mongo_process_operations(expr_list, db, job, phenotype,
-                                         phenotype_id, phenotype_owner, c, final)
+                                         phenotype_id, phenotype_owner, c, final,
+                                         evaluator=evaluator, results=results, cache=cache)
 
     if 'pandas' == evaluator or mongo_failed:
         print('Using pandas evaluator for expression "{0}"'.format(expression))
-        pandas_process_operations(db, job, phenotype, phenotype_id, phenotype_owner, c, final)
+        pandas_process_operations(db, job, phenotype, phenotype_id, phenotype_owner, c, final, results=results)
 
 
 def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id, phenotype_owner, c: PhenotypeOperations,
-                              final=False):
+                              final=False, results=None):
     operation_name = c['name']
 
     if phenotype.context == 'Document':
@@ -566,13 +682,14 @@ def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id,
     lookup_key = "nlpql_feature"
     name = c["name"]
 
-    col_list = COL_LIST
-    col_list.append(lookup_key)
+    # a new list, operations may run concurrently
+    col_list = COL_LIST + [lookup_key]
 
     if 'data_entities' in c:
         action = c['action']
         data_entities = c['data_entities']
         entity_features = list()
+        attributes = list()
 
         i = 0
         nested = False
@@ -586,11 +703,14 @@ def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id,
                     process_nested_data_entity(de, new_name, db, job, phenotype, phenotype_id, phenotype_owner)
                     new_data_entity = new_name + '.value'
                     flat_data_entities.append(new_data_entity)
+                    attributes.append('value')
                 nested = True
             elif not is_value(de):
                 e, a = get_data_entity_split(de)
                 entity_features.append(e)
                 flat_data_entities.append(e)
+                if a:
+                    attributes.append(a)
             else:
                 flat_data_entities.append(de)
             i += 1
@@ -598,9 +718,11 @@ def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id,
         if nested:
             data_entities = flat_data_entities
 
-        query = {"job_id": int(job), lookup_key: {"$in": entity_features}}
-        cursor = db.phenotype_results.find(query)
-        df = pd.DataFrame(list(cursor))
+        # only the fields the operation reads, not the sentences' result_display and the rest of each document
+        columns = col_list + [a for a in attributes if a not in col_list]
+        docs = find_results(db, job, lookup_key, entity_features, results, 'pandas_process_operations',
+                            projection=columns)
+        df = results_dataframe(docs, columns)
 
         if len(df) == 0:
             print('Empty dataframe!')
@@ -613,12 +735,13 @@ def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id,
 
             for de in data_entities:
                 ent, attr = get_data_entity_split(de)
-                new_df = df[df[lookup_key] == ent]
-                new_df = new_df[col_list]
-                dfs.append(new_df.copy())
-                del new_df
+                dfs.append(df.loc[df[lookup_key] == ent, col_list])
 
             if len(dfs) > 0:
+                # the merge pairs every row of a key with every other row of it, so only the rows of the keys that
+                # all of the entities have are merged
+                keys = reduce(lambda x, y: x & y, [set(d[on].unique()) for d in dfs])
+                dfs = [d[d[on].isin(list(keys))] for d in dfs]
                 ret = reduce(lambda x, y: pd.merge(x, y, on=on, how=how), dfs)
                 ret['job_id'] = job
                 ret['phenotype_id'] = phenotype_id
@@ -639,35 +762,22 @@ def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id,
                 output = ret.to_dict('records')
                 del ret
         elif action == 'OR':
-            q = '| '.join([("(%s == '%s')" % (lookup_key, x)) for x in data_entities])
-            ret = df.query(q)
-            ret['job_id'] = job
-            ret['phenotype_id'] = phenotype_id
-            ret['owner'] = phenotype_owner
-            ret['job_date'] = datetime.datetime.now()
-            ret['context_type'] = on
-            ret['raw_definition_text'] = c['raw_text']
-            ret['nlpql_feature'] = operation_name
-            ret['phenotype_final'] = c['final']
-            if '_id' in ret.columns:
-                ret['orig_id'] = ret['_id']
-                ret = ret.drop(columns=['_id'])
-
-            output = ret.to_dict('records')
+            # the frame only picks the documents, they are written with all of their fields
+            ret = df[df[lookup_key].isin(data_entities)]
+            docs = find_results_by_id(db, job, list(ret['_id']), entity_features, results)
             del ret
+            output = operation_result_docs(docs, job, phenotype_id, phenotype_owner, on, c)
         elif action == 'NOT':
-            how = 'left'
-
             for de in data_entities:
                 ent, attr = get_data_entity_split(de)
-                new_df = df[df[lookup_key] == ent]
-                new_df = new_df[col_list]
-                dfs.append(new_df.copy())
-                del new_df
+                dfs.append(df.loc[df[lookup_key] == ent, col_list])
 
             if len(dfs) > 0:
-                ret = reduce(lambda x, y: pd.merge(x, y, on=on, how=how), dfs)
-                ret = ret.query(on + "_x not in " + on + "_y")
+                # the rows of the first entity whose key none of the others have
+                excluded = set()
+                for d in dfs[1:]:
+                    excluded.update(d[on].unique())
+                ret = dfs[0][~dfs[0][on].isin(list(excluded))]
                 ret['job_id'] = job
                 ret['phenotype_id'] = phenotype_id
                 ret['owner'] = phenotype_owner
@@ -702,23 +812,14 @@ def pandas_process_operations(db, job, phenotype: PhenotypeModel, phenotype_id,
                     attr = a
 
             ret = get_numeric_comparison_df(action, df, ent, attr, value_comp)
-            ret['job_id'] = job
-            ret['phenotype_id'] = phenotype_id
-            ret['owner'] = phenotype_owner
-            ret['job_date'] = datetime.datetime.now()
-            ret['context_type'] = on
-            ret['raw_definition_text'] = c['raw_text']
-            ret['nlpql_feature'] = operation_name
-            ret['phenotype_final'] = c['final']
-            if '_id' in ret.columns:
-                ret['orig_id'] = ret['_id']
-                ret = ret.drop(columns=['_id'])
-
-            output = ret.to_dict('records')
+            docs = find_results_by_id(db, job, list(ret['_id']), [ent], results)
             del ret
+            output = operation_result_docs(docs, job, phenotype_id, phenotype_owner, on, c)
 
         if output and len(output) > 0:
             db.phenotype_results.insert_many(output)
+            if results is not None:
+                results.add(operation_name, output)
             del output
 
 
@@ -729,9 +830,14 @@ def mongo_process_operations(expr_obj_list,
                              phenotype_id,
                              phenotype_owner,
                              c: PhenotypeOperations,
-                             final=False):
+                             final=False,
+                             evaluator='mongo',
+                             results=None,
+                             cache=None):
     """
-    Use MongoDB aggregation to evaluate NLPQL expressions.
+    Use MongoDB aggregation to evaluate NLPQL expressions. With the 'bitmap'
+    evaluator, logic expressions are evaluated in memory by expr_bitmap.
+    Expressions found in the SubexpressionCache are not evaluated again.
     """
 
     print('mongo_process_operations expr_object_list: ')
@@ -753,67 +859,129 @@ def mongo_process_operations(expr_obj_list,
 
     is_final_save = c['final']
 
-    for expr_obj in expr_obj_list:
+    # temporary features of this expression => equivalent temporary features
+    # that were evaluated earlier in the job
+    aliases = dict()
+
+    for i, expr_obj in enumerate(expr_obj_list):
 
         # the 'is_final' flag only applies to the last subexpression
-        if expr_obj != expr_obj_list[-1]:
+        is_temp = i < len(expr_obj_list) - 1
+        if is_temp:
             is_final = False
         else:
             is_final = is_final_save
 
-        # evaluate the (sub)expression in expr_obj
-        eval_result = expr_eval.evaluate_expression(expr_obj,
-                                                    job_id,
-                                                    context_field,
-                                                    mongo_collection_obj)
+        if len(aliases) > 0:
+            tokens = [aliases.get(t, t) for t in expr_obj.expr_text.split()]
+            expr_obj = expr_obj._replace(expr_text=' '.join(tokens))
 
-        # query MongoDB to get result docs
-        cursor = mongo_collection_obj.find({'_id': {'$in': eval_result.doc_ids}})
-
-        # initialize for MongoDB result document generation
-        phenotype_info = expr_result.PhenotypeInfo(
-            job_id=job_id,
-            phenotype_id=phenotype_id,
-            owner=phenotype_owner,
-            context_field=context_field,
-            is_final=is_final
-        )
-
-        # generate result documents
-        if expr_eval.EXPR_TYPE_MATH == eval_result.expr_type:
-
-            output_docs = expr_result.to_math_result_docs(eval_result,
-                                                          phenotype_info,
-                                                          cursor)
-        else:
-            assert expr_eval.EXPR_TYPE_LOGIC == eval_result.expr_type
+        cached, entry = None, None
+        if cache is not None:
+            entry, owner = cache.reserve(context_field, expr_obj)
+            if not owner:
+                cached = cache.wait(entry)
+                entry = None
+
+        if cached is not None and is_temp and cached.is_temp:
+            # the result docs of the equivalent temporary feature are in Mongo
+            aliases[expr_obj.nlpql_feature] = cached.eval_result.nlpql_feature
+            continue
+
+        try:
+            eval_result = _evaluate_and_save(expr_obj, cached, job_id, phenotype_id, phenotype_owner,
+                                             context_field, is_final, evaluator, mongo_collection_obj,
+                                             results)
+        except Exception:
+            if entry is not None:
+                cache.finish(entry, None)
+            raise
 
-            # flatten the result set into a set of Mongo documents
-            doc_map, oid_list_of_lists = expr_eval.flatten_logical_result(eval_result,
-                                                                          mongo_collection_obj)
+        if entry is not None:
+            cache.finish(entry, CachedExpression(eval_result, is_temp))
 
-            output_docs = expr_result.to_logic_result_docs(eval_result,
-                                                           phenotype_info,
-                                                           doc_map,
-                                                           oid_list_of_lists)
 
-        if len(output_docs) > 0:
-            mongo_collection_obj.insert_many(output_docs)
+def _evaluate_and_save(expr_obj, cached, job_id, phenotype_id, phenotype_owner, context_field, is_final, evaluator,
+                       mongo_collection_obj, results):
+    # evaluates expr_obj, unless the result of an equivalent expression is cached, and writes its result documents
+
+    # results of other operations in this expression that are in memory
+    if results is not None:
+        feature_docs = results.get(expr_obj.expr_text.split())
+    else:
+        feature_docs = dict()
+
+    if cached is not None:
+        eval_result = expr_eval.equivalent_result(cached.eval_result, expr_obj)
+    else:
+        # evaluate the (sub)expression in expr_obj
+        if 'bitmap' == evaluator:
+            eval_result = expr_bitmap.evaluate_expression(expr_obj,
+                                                          job_id,
+                                                          context_field,
+                                                          mongo_collection_obj,
+                                                          feature_docs)
         else:
-            print('mongo_process_operations ({0}): ' \
-                  'no phenotype matches on "{1}".'.format(eval_result.expr_type,
-                                                          eval_result.expr_text))
+            eval_result = expr_eval.evaluate_expression(expr_obj,
+                                                        job_id,
+                                                        context_field,
+                                                        mongo_collection_obj)
+
+    # initialize for MongoDB result document generation
+    phenotype_info = expr_result.PhenotypeInfo(
+        job_id=job_id,
+        phenotype_id=phenotype_id,
+        owner=phenotype_owner,
+        context_field=context_field,
+        is_final=is_final
+    )
+
+    # generate result documents
+    if expr_eval.EXPR_TYPE_MATH == eval_result.expr_type:
+
+        # query MongoDB to get result docs
+        cursor = expr_eval.find_docs(mongo_collection_obj, eval_result.doc_ids)
+
+        output_docs = expr_result.to_math_result_docs(eval_result,
+                                                      phenotype_info,
+                                                      cursor)
+    else:
+        assert expr_eval.EXPR_TYPE_LOGIC == eval_result.expr_type
+
+        # flatten the result set into a set of Mongo documents
+        known_docs = {doc['_id']: doc for docs in feature_docs.values() for doc in docs}
+        doc_map, oid_list_of_lists = expr_eval.flatten_logical_result(eval_result,
+                                                                      mongo_collection_obj,
+                                                                      known_docs)
+
+        output_docs = expr_result.to_logic_result_docs(eval_result,
+                                                       phenotype_info,
+                                                       doc_map,
+                                                       oid_list_of_lists)
+
+    if len(output_docs) > 0:
+        mongo_collection_obj.insert_many(output_docs)
+        if results is not None:
+            results.add(eval_result.nlpql_feature, output_docs)
+    else:
+        print('mongo_process_operations ({0}): ' \
+              'no phenotype matches on "{1}".'.format(eval_result.expr_type,
+                                                      eval_result.expr_text))
+
+    return eval_result
 
 
 def get_dependencies(po, deps: list):
-    for de in po['data_entities']:
+    for de in po.get('data_entities', list()):
         if type(de) == dict:
-            get_dependencies(de, deps)
-        if "arguments" in de:
-            for arg in de["arguments"]:
-                e, a = get_data_entity_split(arg)
-                deps.append(e)
-        if is_value(de):
+            # a function such as dateDiff, its arguments name the data entities
+            if 'data_entities' in de:
+                get_dependencies(de, deps)
+            for arg in de.get('arguments', list()):
+                if type(arg) == str and not is_value(arg):
+                    e, a = get_data_entity_split(arg)
+                    deps.append(e)
+        elif is_value(de):
             continue
         else:
             e, a = get_data_entity_split(de)
@@ -836,14 +1004,239 @@ def compare_phenotype(x: PhenotypeOperations, y: PhenotypeOperations):
         return 0
 
 
+def get_operation_dependencies(operations: list):
+    """
+    For each operation, the set of indexes of the other operations it reads the results of. These are found from its
+    data entities (see get_dependencies) and from the names in its expression, since the data entities of some
+    expressions (NOT, for one) are incomplete.
+    """
+    indexes = collections.defaultdict(list)
+    for i, op in enumerate(operations):
+        indexes[op['name']].append(i)
+
+    dependencies = list()
+    for i, op in enumerate(operations):
+        names = list()
+        get_dependencies(op, names)
+        for key in ['normalized_expr', 'raw_text']:
+            names.extend(name_regex.findall(op.get(key) or ''))
+        dependencies.append({j for n in set(names) for j in indexes.get(n, list()) if j != i})
+    return dependencies
+
+
+def run_in_dependency_order(dependencies: list, run, workers=1):
+    """
+    Calls run(i) for each operation index i after run has returned for all of the operations it depends on.
+    Operations whose dependencies are done run concurrently on up to workers threads, lower indexes first. If an
+    operation raises, no more operations are started and the exception is raised once the running ones finish.
+    Dependency cycles are broken in declaration order.
+    """
+    count = len(dependencies)
+    remaining = [set(d) for d in dependencies]
+    dependents = [list() for _ in range(count)]
+    for i, deps in enumerate(remaining):
+        for j in deps:
+            dependents[j].append(i)
+
+    ready = [i for i in range(count) if len(remaining[i]) == 0]
+    heapq.heapify(ready)
+    started = set()
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as executor:
+        running = dict()
+        while True:
+            while len(ready) > 0 and error is None:
+                i = heapq.heappop(ready)
+                started.add(i)
+                running[executor.submit(run, i)] = i
+
+            if len(running) == 0:
+                if error is not None or len(started) == count:
+                    break
+                # every operation left waits on another one, a cycle
+                i = min(set(range(count)) - started)
+                print('operations have a dependency cycle, running %d of them in declaration order' %
+                      (count - len(started)))
+                remaining[i] = set()
+                heapq.heappush(ready, i)
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                    continue
+                for k in dependents[i]:
+                    remaining[k].discard(i)
+                    if len(remaining[k]) == 0 and k not in started:
+                        heapq.heappush(ready, k)
+
+    if error is not None:
+        raise error
+
+
+class OperationResults(object):
+    """
+    The result documents of the operations in a phenotype, kept in memory for the operations that read them, so they
+    don't have to be queried back from Mongo. Documents are stored BSON encoded, as Mongo would return them, and the
+    results of an operation are dropped once every operation that depends on it has finished. Results that don't fit
+    in max_bytes are not kept, and are read from Mongo.
+    """
+
+    def __init__(self, operations: list, dependencies: list, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = util.phenotype_results_memory_bytes
+        self.max_bytes = int(max_bytes)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.encoded = dict()
+        self.dropped = set()
+        self.complete = set()
+        # operations producing each name and the names each operation reads
+        self.producers = collections.Counter(op['name'] for op in operations)
+        self.reads = [{operations[j]['name'] for j in deps} for deps in dependencies]
+        self.consumers = collections.Counter(name for names in self.reads for name in names)
+
+    def add(self, name, docs: list):
+        with self.lock:
+            if self.consumers[name] == 0 or name in self.dropped:
+                return
+            try:
+                encoded = [BSON.encode(doc) for doc in docs]
+            except Exception as e:
+                print('results of %s are not kept in memory: %s' % (name, e))
+                encoded = None
+            size = sum(len(e) for e in encoded) if encoded is not None else 0
+            if encoded is None or self.size + size > self.max_bytes:
+                # keep all of a name's results or none of them
+                self.dropped.add(name)
+                self.size -= sum(len(e) for e in self.encoded.pop(name, list()))
+                return
+            self.encoded.setdefault(name, list()).extend(encoded)
+            self.size += size
+
+    def finish(self, i, name):
+        # operation i, which produces name, has finished; name's results are complete when all of its producers are
+        with self.lock:
+            self.producers[name] -= 1
+            if self.producers[name] == 0 and name not in self.dropped and self.consumers[name] > 0:
+                self.complete.add(name)
+            for read in self.reads[i]:
+                self.consumers[read] -= 1
+                if self.consumers[read] == 0:
+                    self.complete.discard(read)
+                    self.size -= sum(len(e) for e in self.encoded.pop(read, list()))
+
+    def get(self, names):
+        # name => decoded documents, for the names whose results are all in memory
+        with self.lock:
+            encoded = {n: self.encoded.get(n, list()) for n in set(names) if n in self.complete}
+        return {n: [BSON(e).decode() for e in docs] for n, docs in encoded.items()}
+
+
+# the EvalResult of an expression, and whether it was for a temporary feature
+CachedExpression = collections.namedtuple('CachedExpression', ['eval_result', 'is_temp'])
+
+# at most this many _ids in all of the cached EvalResults of a job
+SUBEXPRESSION_CACHE_MAX_IDS = 5000000
+
+
+class _CacheEntry(object):
+
+    def __init__(self, key):
+        self.key = key
+        self.value = None
+        self.done = threading.Event()
+
+
+class SubexpressionCache(object):
+    """
+    The results of the (sub)expressions evaluated in a job, keyed by the context field, the expression type and the
+    normal form of the expression (see expr_eval.normalize_expression), so an expression shared by several operations
+    is evaluated once. An operation that finds an expression being evaluated by another operation waits for it. An
+    operation finishes each expression it reserves before it reserves another, so these waits can't deadlock.
+    """
+
+    def __init__(self, max_ids=SUBEXPRESSION_CACHE_MAX_IDS):
+        self.max_ids = max_ids
+        self.ids = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = dict()
+        self.lock = threading.Lock()
+
+    def reserve(self, context_field, expr_obj):
+        # (entry, True) if the caller is to evaluate the expression and finish the entry, (entry, False) if it is
+        # cached or another operation is evaluating it
+        key = (context_field, expr_obj.expr_type, expr_eval.normalize_expression(expr_obj.expr_text))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = _CacheEntry(key)
+                self.entries[key] = entry
+                self.misses += 1
+                return entry, True
+        return entry, False
+
+    def wait(self, entry):
+        # the CachedExpression, or None if it couldn't be evaluated or cached
+        entry.done.wait()
+        with self.lock:
+            if entry.value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry.value
+
+    def finish(self, entry, value):
+        with self.lock:
+            if value is not None:
+                count = len(value.eval_result.doc_ids)
+                if self.ids + count > self.max_ids:
+                    value = None
+                else:
+                    self.ids += count
+            if value is None and self.entries.get(entry.key) is entry:
+                # another operation may still evaluate and cache it
+                del self.entries[entry.key]
+            entry.value = value
+        entry.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
 def write_phenotype_results(db, job, phenotype, phenotype_id, phenotype_owner):
+    """
+    Evaluates the phenotype's operations, see run_in_dependency_order. Returns the hit and miss counts of the
+    SubexpressionCache.
+    """
     pd.options.mode.chained_assignment = None
 
     if phenotype.operations:
-        # TODO implement sort
-        # for c in phenotype.operations.sort(key=util.cmp_2_key(lambda a, b: compare_phenotype(a,b))):
-        for c in phenotype.operations:
-            process_operations(db, job, phenotype, phenotype_id, phenotype_owner, c, final=c["final"])
+        operations = phenotype.operations
+        dependencies = get_operation_dependencies(operations)
+        results = OperationResults(operations, dependencies)
+        cache = SubexpressionCache()
+
+        def run(i):
+            c = operations[i]
+            try:
+                process_operations(db, job, phenotype, phenotype_id, phenotype_owner, c, final=c["final"],
+                                   results=results, cache=cache)
+            finally:
+                results.finish(i, c['name'])
+
+        run_in_dependency_order(dependencies, run, workers=util.phenotype_operation_workers)
+        return cache.stats()
+
+    return {'hits': 0, 'misses': 0}
 
 
 def validate_phenotype(p_cfg: PhenotypeModel):
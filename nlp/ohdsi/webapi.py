@@ -1,7 +1,6 @@
 """
 OHDSI Helpers
 """
-import requests
 import json
 import util
 
@@ -20,11 +19,11 @@ def getConceptSet(filepath):
 
     file = open(filepath,'r')
     data = file.read()
-    response = requests.post(url, headers=headers, data=data)
+    response = util.http_session().post(url, headers=headers, data=data)
     data = response.text
 
     url = ENDPOINT + '/vocabulary/OHDSI-CDMV5/lookup/identifiers'
-    response = requests.post(url, headers=headers, data=data)
+    response = util.http_session().post(url, headers=headers, data=data)
 
     return response.text
 
@@ -33,19 +32,19 @@ def getConceptSet(filepath):
 def getConceptSet(conceptset_id):
     # Getting conceptset metainfo
     url = ENDPOINT + '/conceptset/%s' %(conceptset_id)
-    meta = requests.get(url).json()
+    meta = util.http_session().get(url).json()
 
     # Getting conceptset expressions
     url = ENDPOINT + '/conceptset/%s/expression' %(conceptset_id)
-    expression = requests.get(url).json()
+    expression = util.http_session().get(url).json()
 
     # Getting conceptset generationinfo
     url = ENDPOINT + '/conceptset/%s/generationinfo' %(conceptset_id)
-    generationinfo = requests.get(url).json()
+    generationinfo = util.http_session().get(url).json()
 
     # Getting conceptset items
     url = ENDPOINT + '/conceptset/%s/items' %(conceptset_id)
-    items = requests.get(url).json()
+    items = util.http_session().get(url).json()
 
     conceptset = {"Meta":meta, "Expression":json.dumps(expression), "GenerationInfo":generationinfo, "Items":items}
     return json.dumps(conceptset)
@@ -56,7 +55,7 @@ def getConceptSet(conceptset_id):
 def getCohortByName(cohort_name):
     # Getting all cohort definitions
     url = ENDPOINT + '/cohortdefinition'
-    cohort_definitions = requests.get(url).json()
+    cohort_definitions = util.http_session().get(url).json()
 
     # Identifying cohort_id with respect to name
     cohort_id = None
@@ -76,12 +75,12 @@ def getCohortByName(cohort_name):
 def getCohort(cohort_id):
     # Getting the cohort summary
     url = ENDPOINT + '/cohortanalysis/%s/summary' % cohort_id
-    cohort_details = requests.get(url).json()
+    cohort_details = util.http_session().get(url).json()
     cohort_details['cohortDefinition']['expression'] = json.loads(cohort_details['cohortDefinition']['expression']) #fixing ohdsi JSON structure bug
 
     # Getting list of patients in the cohort
     url = ENDPOINT + '/cohort/%s' %(cohort_id)
-    cohort_patients = requests.get(url).json()
+    cohort_patients = util.http_session().get(url).json()
 
     # Creating and returning results
     cohort = {'Details':cohort_details,'Patients':cohort_patients}
@@ -97,14 +96,14 @@ def createCohort(filepath):
     #data = json.loads(file.read())
 
     # Getting ID for new cohort
-    response = requests.post(url, headers=headers, data=data)
+    response = util.http_session().post(url, headers=headers, data=data)
     if response.status_code != 200:
         return "Cohort could not be created. Reason: check JSON file"
     cohort_id = response.json()['id']
 
     # Triggering cohort creation job
     url = ENDPOINT + '/cohortdefinition/%s/generate/OHDSI-CDMV5' % cohort_id
-    response = requests.get(url)
+    response = util.http_session().get(url)
 
     # Checking if cohort creation job has been triggered
     if response.status_code == 200:
@@ -116,5 +115,5 @@ def createCohort(filepath):
 def getCohortStatus(cohort_id):
     # Getting cohort details
     url = ENDPOINT + '/cohortdefinition/%s/info' %(cohort_id)
-    status = requests.get(url)
+    status = util.http_session().get(url)
     return status.text
@@ -2,3 +2,9 @@ db.pipeline_results.createIndex( {  "subject":1 })
 db.pipeline_results.createIndex( {  "job_id":1 })
 db.pipeline_results.createIndex( {  "nlpql_name":1 })
 db.pipeline_results.createIndex( {  "pipeline_id":1  })
+
+
+db.phenotype_results.createIndex( {  "job_id":1, "nlpql_feature":1, "subject":1 })
+db.phenotype_results.createIndex( {  "job_id":1, "nlpql_feature":1, "report_id":1 })
+db.phenotype_results.createIndex( {  "job_id":1, "phenotype_final":1, "_id":1 })
+db.phenotype_results.createIndex( {  "job_id":1, "phenotype_final":1, "subject":1 })
@@ -1,13 +1,14 @@
 from pymongo import MongoClient
 
 from algorithms import get_standard_entities
-from .task_utilities import BaseTask
+from .task_utilities import BaseTask, standard_solr_fields
 
 SECTIONS_FILTER = "sections"
 
 
 class NERTask(BaseTask):
     task_name = "NamedEntityRecognition"
+    solr_fields = standard_solr_fields()
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         pipeline_config = self.pipeline_config
@@ -17,8 +18,8 @@ class NERTask(BaseTask):
             filters[SECTIONS_FILTER] = pipeline_config.sections
 
         # TODO incorporate sections and filters
-        for doc in self.docs:
-            res = get_standard_entities(self.get_document_text(doc))
+        for doc, analysis in zip(self.docs, self.get_analyzed_documents()):
+            res = get_standard_entities(analysis.clean_text, sentences=analysis.clean_sentences)
             for val in res:
                 obj = {
                     "term": val.text,
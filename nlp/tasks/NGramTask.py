@@ -1,11 +1,13 @@
 from pymongo import MongoClient
 from textacy import extract, make_spacy_doc, preprocess_text
 
+from algorithms.models import load_model
+
 try:
-    from .task_utilities import BaseTask, BaseCollector, pipeline_mongo_writer, get_config_integer
+    from .task_utilities import BaseTask, standard_solr_fields, BaseCollector, pipeline_mongo_writer, get_config_integer
 except Exception as e:
     print(e)
-    from task_utilities import BaseTask, BaseCollector, pipeline_mongo_writer, get_config_integer
+    from task_utilities import BaseTask, standard_solr_fields, BaseCollector, pipeline_mongo_writer, get_config_integer
 
 # Clarity.ngram({
 #   termset:[Orthopnea],
@@ -70,6 +72,7 @@ class NGramCollector(BaseCollector):
 
 class NGramTask(BaseTask):
     task_name = "ngram"
+    solr_fields = standard_solr_fields()
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         print('run custom task')
@@ -87,7 +90,7 @@ class NGramTask(BaseTask):
         for doc in self.docs:
             ngrams = list()
             cln_txt = self.get_document_text(doc, clean=True)
-            t_doc = make_spacy_doc(preprocess_text(cln_txt, lowercase=True), lang='en')
+            t_doc = make_spacy_doc(preprocess_text(cln_txt, lowercase=True), lang=load_model())
             res = extract.ngrams(t_doc, n_num, filter_stops=filter_stops, filter_punct=filter_punct,
                                  filter_nums=filter_nums)
             for r in res:
@@ -1,7 +1,7 @@
 from pymongo import MongoClient
 
 from algorithms import get_tags
-from .task_utilities import BaseTask
+from .task_utilities import BaseTask, standard_solr_fields
 
 SECTIONS_FILTER = "sections"
 
@@ -10,11 +10,13 @@ class POSTaggerTask(BaseTask):
 
     task_name = "POSTagger"
 
+    solr_fields = standard_solr_fields()
+
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
             # TODO incorporate sections and filters
-            for doc in self.docs:
-                res = get_tags(self.get_document_text(doc))
+            for doc, analysis in zip(self.docs, self.get_analyzed_documents()):
+                res = get_tags(analysis.clean_text, sentences=analysis.clean_sentences)
                 for val in res:
                     obj = {
                         "sentence": val.sentence,
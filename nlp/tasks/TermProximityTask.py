@@ -45,7 +45,7 @@ Sample NLPQL:
 import re
 from pymongo import MongoClient
 from collections import namedtuple
-from tasks.task_utilities import BaseTask
+from tasks.task_utilities import BaseTask, standard_solr_fields
 
 _VERSION_MAJOR = 0
 _VERSION_MINOR = 1
@@ -151,6 +151,7 @@ class TermProximityTask(BaseTask):
     
     # use this name in NLPQL
     task_name = "TermProximityTask"
+    solr_fields = standard_solr_fields()
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
@@ -1,13 +1,54 @@
 from pymongo import MongoClient
 
 from algorithms import *
-from .task_utilities import BaseTask
+from algorithms.value_extraction import value_extractor
+from .task_utilities import BaseTask, standard_solr_fields
 
 SECTIONS_FILTER = "sections"
 
 
+def get_value_results(pipeline_config, analysis, terms=None):
+    objs = list()
+    result = run_value_extractor_full(pipeline_config.terms, analysis.clean_text, pipeline_config.minimum_value,
+                                      pipeline_config.maximum_value, enumlist=pipeline_config.enum_list,
+                                      is_case_sensitive_text=pipeline_config.case_sensitive,
+                                      sentences=analysis.clean_sentences, terms=terms)
+    for meas in result:
+        value = meas['X']
+
+        obj = {
+            "sentence": meas.sentence,
+            "text": meas.text,
+            "start": meas.start,
+            "value": value,
+            "end": meas.end,
+            "term": meas.subject,
+            "dimension_X": meas.X,
+            "dimension_Y": meas.Y,
+            "dimension_Z": meas.Z,
+            "units": meas.units,
+            "location": meas.location,
+            "condition": meas.condition,
+            "value1": meas.value1,
+            "value2": meas.value2,
+            "temporality": meas.temporality,
+            "result_display": {
+                "result_content": "{0} {1} {2}".format(meas.text, value, meas.units),
+                "sentence": meas.sentence,
+                "highlights": [meas.text, value, meas.units],
+                "start": [meas.start],
+                "end": [meas.end]
+            }
+        }
+        objs.append(obj)
+
+    return objs
+
+
 class ValueExtractorTask(BaseTask):
     task_name = "ValueExtractor"
+    solr_fields = standard_solr_fields()
+    algorithm_version = '{0}.{1}'.format(value_extractor._VERSION_MAJOR, value_extractor._VERSION_MINOR)
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         filters = dict()
@@ -15,44 +56,15 @@ class ValueExtractorTask(BaseTask):
             filters[SECTIONS_FILTER] = self.pipeline_config.sections
 
         # TODO incorporate sections and filters
-        for doc in self.docs:
-            result = run_value_extractor_full(self.pipeline_config.terms, self.get_document_text(doc),
-                                              self.pipeline_config.
-                                                    minimum_value,self.pipeline_config.maximum_value,
-                                              enumlist=self.pipeline_config.enum_list,
-                                              is_case_sensitive_text=self.pipeline_config.
-                                              case_sensitive)
-            if result:
-                for meas in result:
-                    value = meas['X']
-
-                    obj = {
-                        "sentence": meas.sentence,
-                        "text": meas.text,
-                        "start": meas.start,
-                        "value": value,
-                        "end": meas.end,
-                        "term": meas.subject,
-                        "dimension_X": meas.X,
-                        "dimension_Y": meas.Y,
-                        "dimension_Z": meas.Z,
-                        "units": meas.units,
-                        "location": meas.location,
-                        "condition": meas.condition,
-                        "value1": meas.value1,
-                        "value2": meas.value2,
-                        "temporality": meas.temporality,
-                        "result_display": {
-                            "date": doc[util.solr_report_date_field],
-                            "result_content": "{0} {1} {2}".format(meas.text, value, meas.units),
-                            "sentence": meas.sentence,
-                            "highlights": [meas.text, value, meas.units],
-                            "start": [meas.start],
-                            "end": [meas.end]
-                        }
-                    }
+        # the terms are compiled and cleaned once for the whole batch
+        terms = ValueExtractorTerms(self.pipeline_config.terms, self.pipeline_config.enum_list,
+                                    self.pipeline_config.case_sensitive)
+        results = self.memoized_results(lambda doc, analysis: get_value_results(self.pipeline_config, analysis,
+                                                                                terms))
+        for doc, analysis, objs in results:
+            if objs:
+                for obj in objs:
+                    obj["result_display"]["date"] = doc[util.solr_report_date_field]
                     self.write_result_data(temp_file, mongo_client, doc, obj)
-
-                del result
             else:
                 temp_file.write("no matches!\n")
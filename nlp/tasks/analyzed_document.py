@@ -0,0 +1,221 @@
+import hashlib
+
+from algorithms import segmentation
+from algorithms.sec_tag import *
+from data_access import Cache, find_spans, decode_sentences, decode_sections, pack_pieces, unpack_pieces, TextSlices
+
+# bump when the analysis changes, so entries cached by an older version are not read back
+ANALYSIS_VERSION = 3
+analysis_cache = Cache('analysis', version=ANALYSIS_VERSION)
+segment = segmentation.Segmentation()
+
+
+def text_hash(text: str):
+    return hashlib.sha1(text.encode('utf-8', errors='ignore')).hexdigest()
+
+
+def clean(text: str):
+    return text.encode("ascii", errors="ignore").decode()
+
+
+def piece_spans(text: str, pieces):
+    # the (start, end) of each piece in text, pieces decoded from precomputed offsets already carry theirs
+    if isinstance(pieces, TextSlices) and pieces.text is text:
+        return list(pieces.spans)
+    return find_spans(text, pieces)
+
+
+def starts(spans: list):
+    return [start for start, _ in spans] if spans is not None else None
+
+
+def tag_sections(text: str):
+    section_headers, section_texts = [UNKNOWN], [text]
+    try:
+        section_headers, section_texts = sec_tag_process(text)
+    except Exception as e:
+        print(e)
+    if len(section_texts) == 0:
+        section_headers, section_texts = [UNKNOWN], [text]
+    return [x.concept for x in section_headers], section_texts
+
+
+def section_concept_names():
+    # concept id => concept, the section tagger's vocabulary is loaded on first use
+    if len(cid_to_concept_map) == 0:
+        section_tagger_init()
+    return cid_to_concept_map
+
+
+def decode_segmentation(text: str, sentence_offsets: list, section_offsets: list):
+    """
+    Precomputed sentences, section names and section texts from their offsets into text (see
+    data_access.segmentation_store). The sentences and section texts are sliced out of text when they are read, so
+    documents whose analysis is already cached never slice them, and they carry their spans, so they aren't searched
+    for in the text again. Each is None when there are no offsets.
+    """
+    sentences, section_names, section_texts = None, None, None
+    if sentence_offsets and len(sentence_offsets) > 0:
+        sentences = decode_sentences(text, sentence_offsets)
+    if section_offsets and len(section_offsets) > 0:
+        section_names, section_texts = decode_sections(text, section_offsets, section_concept_names())
+    return sentences, section_names, section_texts
+
+
+class AnalyzedDocument(object):
+    """
+    The text of one report with its sentences, computed once and shared by every task that reads the report. The
+    sentences are segmented over the whole text, like get_document_sentences always has. Sections, and the sentences
+    of each section segmented on their own (which is how the term finder reads them), are only analyzed for tasks that
+    ask for them, see get_analyzed_documents. They're None until then. Spans are (start, end) positions in text, or
+    (-1, -1) where a section or sentence couldn't be placed. The clean_ views have non-ASCII characters removed, like
+    BaseTask.get_document_text does by default.
+    """
+
+    def __init__(self, report_id, hashed_text: str, text: str, sentences: list, sentence_spans: list,
+                 section_names: list=None, section_texts: list=None, section_spans: list=None,
+                 sentences_by_section: list=None):
+        self.report_id = report_id
+        self.text_hash = hashed_text
+        self.text = text
+        self.sentences = sentences
+        self.sentence_spans = sentence_spans
+        self.section_names = section_names
+        self.section_texts = section_texts
+        self.section_spans = section_spans
+        self.sentences_by_section = sentences_by_section
+        self._clean_sentences = None
+
+    @property
+    def clean_text(self):
+        return clean(self.text)
+
+    @property
+    def clean_sentences(self):
+        if self._clean_sentences is None:
+            self._clean_sentences = [clean(s) for s in self.sentences]
+        return self._clean_sentences
+
+    @property
+    def sentence_offsets(self):
+        return starts(self.sentence_spans)
+
+    @property
+    def section_offsets(self):
+        return starts(self.section_spans)
+
+    def has_sections(self):
+        return self.section_names is not None
+
+    def section_sentences(self):
+        # the sentences of each section, in section order
+        return self.sentences_by_section
+
+    def to_dict(self):
+        # spans into the text rather than copies of it, only pieces that can't be sliced back out are kept as text
+        d = {
+            'report_id': self.report_id,
+            'text_hash': self.text_hash,
+            'sentences': pack_pieces(self.text, self.sentences, self.sentence_spans)
+        }
+        if self.has_sections():
+            flattened = [s for sentences in self.sentences_by_section for s in sentences]
+            d['section_names'] = self.section_names
+            d['sections'] = pack_pieces(self.text, self.section_texts, self.section_spans)
+            d['section_sentences'] = pack_pieces(self.text, flattened, find_spans(self.text, flattened))
+            d['section_sentence_counts'] = [len(sentences) for sentences in self.sentences_by_section]
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict, text: str):
+        # text is the text d was computed from, its hash is part of the cache key
+        sentences, sentence_spans = unpack_pieces(text, d['sentences'])
+        analysis = cls(d['report_id'], d['text_hash'], text, sentences, sentence_spans)
+        if d.get('section_names') is not None:
+            analysis.section_names = d['section_names']
+            analysis.section_texts, analysis.section_spans = unpack_pieces(text, d['sections'])
+            flattened, _ = unpack_pieces(text, d['section_sentences'])
+            analysis.sentences_by_section = list()
+            position = 0
+            for count in d['section_sentence_counts']:
+                analysis.sentences_by_section.append(flattened[position:position + count])
+                position += count
+        return analysis
+
+
+def _analyze_sentences(items: list, hashes: list, batch_size: int, n_process: int):
+    # items are (report_id, text, precomputed sentences, precomputed section names, section texts), every document
+    # without precomputed sentences is segmented in a single call
+    to_segment = [text for _, text, sentences, _, _ in items if not sentences]
+    parsed = iter(segment.parse_sentences_batch(to_segment, batch_size=batch_size, n_process=n_process)
+                  if len(to_segment) > 0 else list())
+
+    analyzed = list()
+    for (report_id, text, sentences, _, _), hashed_text in zip(items, hashes):
+        if not sentences:
+            sentences = next(parsed)
+        analyzed.append(AnalyzedDocument(report_id, hashed_text, text, list(sentences), piece_spans(text, sentences)))
+    return analyzed
+
+
+def _analyze_sections(analyses: list, items: list, batch_size: int, n_process: int):
+    # adds the sections, tagged unless they're precomputed, and the sentences of each section, all segmented in a
+    # single call
+    sections = list()
+    for analysis, (_, text, _, section_names, section_texts) in zip(analyses, items):
+        if not section_names or not section_texts:
+            if len(text.strip()) > 0:
+                section_names, section_texts = tag_sections(text)
+            else:
+                section_names, section_texts = list(), list()
+        sections.append((list(section_names), section_texts))
+
+    to_segment = [t for _, section_texts in sections for t in section_texts]
+    parsed = iter(segment.parse_sentences_batch(to_segment, batch_size=batch_size, n_process=n_process)
+                  if len(to_segment) > 0 else list())
+
+    for analysis, (section_names, section_texts) in zip(analyses, sections):
+        analysis.section_names = section_names
+        analysis.section_texts = list(section_texts)
+        analysis.section_spans = piece_spans(analysis.text, section_texts)
+        analysis.sentences_by_section = [list(next(parsed)) for _ in section_texts]
+
+
+def get_analyzed_documents(items: list, batch_size=segmentation.DEFAULT_BATCH_SIZE, n_process=1, sections=False):
+    """
+    AnalyzedDocuments for a list of (report_id, text, precomputed sentences, precomputed section names, precomputed
+    section texts), any of the precomputed values may be None. With sections=True the sections and the sentences of
+    each section are analyzed too. Documents are looked up in the cache by report id and a hash of their text, and
+    the rest are analyzed together and cached.
+    """
+    hashes = [text_hash(text) for _, text, _, _, _ in items]
+    keys = ['%s:%s' % (str(item[0]), hashed_text) for item, hashed_text in zip(items, hashes)]
+    found = analysis_cache.get_many(keys)
+    results = [AnalyzedDocument.from_dict(found[k], item[1]) if k in found else None for k, item in zip(keys, items)]
+    changed = set()
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if len(missing) > 0:
+        analyzed = _analyze_sentences([items[i] for i in missing], [hashes[i] for i in missing], batch_size,
+                                      n_process)
+        for i, a in zip(missing, analyzed):
+            results[i] = a
+        changed.update(missing)
+
+    if sections:
+        unsectioned = [i for i, r in enumerate(results) if not r.has_sections()]
+        if len(unsectioned) > 0:
+            _analyze_sections([results[i] for i in unsectioned], [items[i] for i in unsectioned], batch_size,
+                              n_process)
+            changed.update(unsectioned)
+
+    if len(changed) > 0:
+        analysis_cache.set_many({keys[i]: results[i].to_dict() for i in changed})
+
+    return results
+
+
+def get_analyzed_document(report_id, text: str, sentences: list=None, section_names: list=None,
+                          section_texts: list=None, sections=False):
+    return get_analyzed_documents([(report_id, text, sentences, section_names, section_texts)],
+                                  sections=sections)[0]
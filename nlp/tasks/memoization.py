@@ -0,0 +1,84 @@
+import copy
+import hashlib
+import json
+
+from data_access import Cache
+
+try:
+    from .analyzed_document import ANALYSIS_VERSION
+except Exception:
+    from analyzed_document import ANALYSIS_VERSION
+
+# the pipeline config fields that can change what an algorithm finds in a document, the rest (names, owners, query
+# and cohort settings) only change which documents are read or how results are labeled
+ALGORITHM_CONFIG_FIELDS = ['terms', 'excluded_terms', 'include_synonyms', 'include_descendants', 'include_ancestors',
+                           'vocabulary', 'sections', 'minimum_value', 'maximum_value', 'enum_list', 'case_sensitive',
+                           'custom_arguments']
+# order doesn't change what these match, so they are compared as sets
+UNORDERED_CONFIG_FIELDS = {'terms', 'excluded_terms', 'sections', 'enum_list'}
+
+memo_cache = Cache('memo')
+
+
+def canonical_value(value):
+    if isinstance(value, dict):
+        return {str(k): canonical_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_value(v) for v in value]
+    if isinstance(value, set):
+        return sorted((canonical_value(v) for v in value), key=repr)
+    return value
+
+
+def canonical_config(pipeline_config, fields: list=None):
+    """
+    The fields of a pipeline config that affect an algorithm's results, in a form where equivalent configs are equal.
+    """
+    if fields is None:
+        fields = ALGORITHM_CONFIG_FIELDS
+    canonical = dict()
+    for field in fields:
+        value = canonical_value(getattr(pipeline_config, field, None))
+        if field in UNORDERED_CONFIG_FIELDS and isinstance(value, list):
+            value = sorted(set(str(v).strip() for v in value))
+        canonical[field] = value
+    return canonical
+
+
+def result_fingerprint(algorithm: str, version, config: dict, text_hash: str):
+    """
+    Identifies the results of one version of an algorithm, run with one config, on one document text. Document
+    analyses are part of the input, so their version is included too.
+    """
+    key = json.dumps([algorithm, str(version), ANALYSIS_VERSION, config, text_hash], sort_keys=True, default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def memoize_results(algorithm: str, version, config: dict, analyses: list, compute):
+    """
+    The results for each AnalyzedDocument, reusing results cached by any job that ran the same algorithm version and
+    config on the same text. compute(i) returns the results for analyses[i], it's only called for the misses.
+    """
+    fingerprints = [result_fingerprint(algorithm, version, config, a.text_hash) for a in analyses]
+    found = memo_cache.get_many(fingerprints)
+
+    results = list()
+    computed = dict()
+    used = set()
+    for i, fingerprint in enumerate(fingerprints):
+        if fingerprint in found:
+            result = found[fingerprint]
+        elif fingerprint in computed:
+            result = computed[fingerprint]
+        else:
+            computed[fingerprint] = compute(i)
+            result = computed[fingerprint]
+        if fingerprint in used:
+            # the same text twice in one batch, callers add document fields to their results in place
+            result = copy.deepcopy(result)
+        used.add(fingerprint)
+        results.append(result)
+
+    if len(computed) > 0:
+        memo_cache.set_many(computed)
+    return results
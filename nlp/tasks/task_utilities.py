@@ -1,80 +1,128 @@
 import datetime
 import json
 import sys
+import time
 import traceback
 
 import luigi
-from cachetools import LRUCache, cached, keys
+from bson import ObjectId
+from cachetools import LRUCache
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from pymongo.results import InsertOneResult
 
 import util
 from algorithms import segmentation
-from algorithms.sec_tag import *
 from data_access import base_model
+from data_access import connection_pool
+from data_access import Cache, SENTENCE_OFFSETS_FIELD, SECTION_OFFSETS_FIELD
 from data_access import jobs
 from data_access import pipeline_config
 from data_access import pipeline_config as config
 from data_access import solr_data
+try:
+    from .analyzed_document import AnalyzedDocument, decode_segmentation, get_analyzed_document, \
+        get_analyzed_documents
+    from .memoization import canonical_config, memoize_results
+except Exception:
+    from analyzed_document import AnalyzedDocument, decode_segmentation, get_analyzed_document, \
+        get_analyzed_documents
+    from memoization import canonical_config, memoize_results
 
 sentences_key = "sentence_attrs"
 section_names_key = "section_name_attrs"
 section_text_key = "section_text_attrs"
 doc_fields = ['report_id', 'subject', 'report_date', 'report_type', 'source', 'solr_id']
-pipeline_cache = LRUCache(maxsize=5000)
-document_cache = LRUCache(maxsize=5000)
 init_cache = LRUCache(maxsize=1000)
-segment = segmentation.Segmentation()
+document_store = Cache('doc')
 
 
-@cached(document_cache)
-def _get_document_by_id(document_id):
-    util.add_cache_compute_count()
-    return solr_data.query_doc_by_id(document_id, solr_url=util.solr_url)
+def standard_solr_fields():
+    # the document fields read by the built-in tasks and the result writers
+    fields = [util.solr_id_field, util.solr_report_id_field, util.solr_subject_field, util.solr_report_date_field,
+              util.solr_report_type_field, util.solr_source_field, util.solr_text_field, SENTENCE_OFFSETS_FIELD,
+              SECTION_OFFSETS_FIELD, sentences_key, section_names_key, section_text_key]
+    return [f for f in fields if f]
 
 
 def get_document_by_id(document_id):
-    doc = None
-
-    if util.use_redis_caching == "true":
-        util.add_cache_query_count()
-        txt = util.get_from_redis_cache("doc:" + document_id)
-        if not txt:
-            util.add_cache_compute_count()
-            doc = solr_data.query_doc_by_id(document_id, solr_url=util.solr_url)
-            util.write_to_redis_cache("doc:" + document_id, json.dumps(doc))
-        else:
-            doc = json.loads(txt)
-    elif util.use_memory_caching == "true":
-        util.add_cache_query_count()
-        doc = _get_document_by_id(document_id)
-
+    doc = document_store.get(document_id)
     if not doc:
-        return solr_data.query_doc_by_id(document_id, solr_url=util.solr_url)
-    else:
-        return doc
+        doc = solr_data.query_doc_by_id(document_id, solr_url=util.solr_url)
+        if doc:
+            document_store.set(document_id, doc)
+    return doc
+
+
+def cache_documents(docs):
+    # puts documents already read from Solr in the document cache, with one Redis round trip
+    document_store.set_many({d[util.solr_report_id_field]: d for d in docs})
+
+
+def get_documents_by_ids(document_ids):
+    """
+    Documents for many report ids, as a dict keyed by report id. The cache is read with one multi-get and the misses
+    are fetched from Solr with one request (per 500 ids) and cached, instead of one request per document.
+    """
+    document_ids = list(dict.fromkeys(str(d) for d in document_ids))
+    if len(document_ids) == 0:
+        return dict()
+
+    docs = {k: v for k, v in document_store.get_many(document_ids).items() if v}
+    misses = [d for d in document_ids if d not in docs]
+    if len(misses) > 0:
+        fetched = solr_data.query_docs_by_ids(misses, solr_url=util.solr_url)
+        cache_documents(list(fetched.values()))
+        docs.update(fetched)
+
+    return docs
+
+
+def prefetch_documents(document_ids):
+    # fills the document cache for a batch in one round trip, so later get_document_by_id calls are cache hits
+    if document_store.enabled():
+        get_documents_by_ids(document_ids)
+
+
+def document_analysis_item(doc):
+    """
+    What get_analyzed_documents needs from a Solr document. When precomputed segmentation is enabled it's read from
+    the offset fields written by solr_precompute, or from the sentence and section text fields of cores that were
+    precomputed before offsets were stored.
+    """
+    txt = document_text(doc)
+    sentences, section_names, section_texts = None, None, None
+    if util.use_precomputed_segmentation == "true":
+        sentences, section_names, section_texts = decode_segmentation(txt, doc.get(SENTENCE_OFFSETS_FIELD),
+                                                                      doc.get(SECTION_OFFSETS_FIELD))
+        if not sentences and sentences_key in doc and len(doc[sentences_key]) > 0:
+            sentences = doc[sentences_key]
+        if not section_names and section_names_key in doc and len(doc[section_names_key]) > 0:
+            section_names, section_texts = doc[section_names_key], doc[section_text_key]
+    return doc.get(util.solr_report_id_field, ''), txt, sentences, section_names, section_texts
+
+
+def document_analysis(doc, sections=False):
+    return get_analyzed_document(*document_analysis_item(doc), sections=sections)
+
+
+def documents_analysis(docs, batch_size=segmentation.DEFAULT_BATCH_SIZE, n_process=1, sections=False):
+    # analyzes every doc in a batch that isn't cached yet with a single segmentation call
+    return get_analyzed_documents([document_analysis_item(doc) for doc in docs], batch_size=batch_size,
+                                  n_process=n_process, sections=sections)
 
 
 def document_sections(doc):
-    if util.use_precomputed_segmentation == "true" and section_names_key in doc and len(doc[section_names_key]) > 0:
-        return doc[section_names_key], doc[section_text_key]
-    else:
-        txt = document_text(doc)
-        section_headers, section_texts = [UNKNOWN], [txt]
-        try:
-            section_headers, section_texts = sec_tag_process(txt)
-        except Exception as e:
-            print(e)
-        names = [x.concept for x in section_headers]
-        return names, section_texts
+    analysis = document_analysis(doc, sections=True)
+    return analysis.section_names, analysis.section_texts
 
 
 def document_sentences(doc):
-    if util.use_precomputed_segmentation == "true" and sentences_key in doc and len(doc[sentences_key]) > 0:
-        return doc[sentences_key]
-    else:
-        txt = document_text(doc)
-        sentence_list = segment.parse_sentences(txt)
-        return sentence_list
+    return document_analysis(doc).sentences
+
+
+def documents_sentences(docs, batch_size=segmentation.DEFAULT_BATCH_SIZE, n_process=1):
+    return [a.sentences for a in documents_analysis(docs, batch_size=batch_size, n_process=n_process)]
 
 
 def document_text(doc, clean=False):
@@ -129,6 +177,18 @@ def pipeline_mongo_writer(client, pipeline_id, pipeline_type, job, batch, p_conf
                           doc, data_fields: dict, prefix: str = '', phenotype_final: bool = False):
     db = client[util.mongo_db]
 
+    data_fields = build_pipeline_result(pipeline_id, pipeline_type, job, batch, p_config, doc, data_fields,
+                                        prefix=prefix, phenotype_final=phenotype_final)
+    if not data_fields:
+        return None
+
+    inserted = config.insert_pipeline_results(p_config, db, data_fields)
+
+    return inserted
+
+
+def build_pipeline_result(pipeline_id, pipeline_type, job, batch, p_config: pipeline_config.PipelineConfig,
+                          doc, data_fields: dict, prefix: str = '', phenotype_final: bool = False):
     if not data_fields:
         print('must have additional data fields')
         return None
@@ -182,9 +242,92 @@ def pipeline_mongo_writer(client, pipeline_id, pipeline_type, job, batch, p_conf
             'end': [e]
         }
 
-    inserted = config.insert_pipeline_results(p_config, db, data_fields)
-
-    return inserted
+    return data_fields
+
+
+class BufferedResultWriter(object):
+    """
+    Accumulates result documents for a single task batch and writes them to Mongo with insert_many, rather than
+    one insert_one round trip per result. The buffer is flushed when it reaches max_size documents, when the
+    oldest buffered document is older than max_age seconds, and when the task calls close().
+    """
+
+    def __init__(self, client, p_config: pipeline_config.PipelineConfig, max_size=None, max_age=None):
+        self.client = client
+        self.db = client[util.mongo_db]
+        self.p_config = p_config
+        if max_size is None:
+            max_size = util.mongo_write_buffer_size
+        if max_age is None:
+            max_age = util.mongo_write_buffer_seconds
+        self.max_size = max(int(max_size), 1)
+        self.max_age = float(max_age)
+        self.buffer = list()
+        self.first_buffered = 0.0
+        self.flush_count = 0
+        self.documents_written = 0
+        self.write_errors = 0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    def add(self, data_fields: dict):
+        # assign the id client-side (as pymongo does) so callers get an id back before the document is written
+        if '_id' not in data_fields:
+            data_fields['_id'] = ObjectId()
+        if len(self.buffer) == 0:
+            self.first_buffered = time.time()
+        self.buffer.append(data_fields)
+
+        if len(self.buffer) >= self.max_size or (time.time() - self.first_buffered) >= self.max_age:
+            self.flush()
+
+        return InsertOneResult(data_fields['_id'], True)
+
+    def flush(self):
+        if len(self.buffer) == 0:
+            return 0
+
+        objs = self.buffer
+        self.buffer = list()
+        start = time.time()
+        written = len(objs)
+        failed = None
+        try:
+            config.insert_many_pipeline_results(self.p_config, self.db, objs)
+        except BulkWriteError as bwe:
+            errors = bwe.details.get('writeErrors', list())
+            written = bwe.details.get('nInserted', written - len(errors))
+            self.write_errors += len(errors)
+            print(bwe.details)
+            failed = bwe
+        elapsed = time.time() - start
+
+        self.flush_count += 1
+        self.documents_written += written
+        self.total_flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+        if failed is not None:
+            # add() already returned ids for the documents that weren't written, the batch has to be run again
+            raise failed
+        return written
+
+    def close(self):
+        self.flush()
+        return self.stats()
+
+    def stats(self):
+        if self.flush_count > 0:
+            avg_flush_ms = (self.total_flush_time / self.flush_count) * 1000.0
+        else:
+            avg_flush_ms = 0.0
+        return {
+            'flushes': self.flush_count,
+            'documents': self.documents_written,
+            'errors': self.write_errors,
+            'total_flush_ms': round(self.total_flush_time * 1000.0, 2),
+            'avg_flush_ms': round(avg_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_time * 1000.0, 2)
+        }
 
 
 class BaseCollector(base_model.BaseModel):
@@ -227,17 +370,28 @@ class BaseTask(luigi.Task):
     start = luigi.IntParameter()
     solr_query = luigi.Parameter()
     batch = luigi.IntParameter()
+    # with partition_count > 1 the task reads one hash partition of the query results instead of a start/rows page
+    partition = luigi.IntParameter(default=0)
+    partition_count = luigi.IntParameter(default=0)
     parallel_task = True
+    # Solr fields the task needs from each document, None to get every stored field. The built-in tasks set this to
+    # standard_solr_fields().
+    solr_fields = None
     task_name = "ClarityNLPLuigiTask"
+    # the version of the task's algorithm, from its module's VERSION_MAJOR and VERSION_MINOR, which are bumped when
+    # it finds different results for the same text and config. Tasks that use memoized_results must set it.
+    algorithm_version = None
     docs = list()
     pipeline_config = config.PipelineConfig('', '')
     segment = segmentation.Segmentation()
+    result_writer = None
 
     def run(self):
         task_family_name = str(self.task_family)
         if self.task_name == "ClarityNLPLuigiTask":
             self.task_name = task_family_name
         client = util.mongo_client()
+        pg_counts = connection_pool.get_connection_counts()
 
         try:
             with self.output().open('w') as temp_file:
@@ -247,26 +401,17 @@ class BaseTask(luigi.Task):
 
                 self.pipeline_config = config.get_pipeline_config(self.pipeline, util.conn_string)
                 jobs.update_job_status(str(self.job), util.conn_string, jobs.IN_PROGRESS, "Running Solr query")
-                self.docs = solr_data.query(self.solr_query, rows=util.row_count, start=self.start,
-                                            solr_url=util.solr_url,
-                                            tags=self.pipeline_config.report_tags, mapper_inst=util.report_mapper_inst,
-                                            mapper_url=util.report_mapper_url, mapper_key=util.report_mapper_key,
-                                            types=self.pipeline_config.report_types,
-                                            sources=self.pipeline_config.sources,
-                                            filter_query=self.pipeline_config.filter_query,
-                                            cohort_ids=self.pipeline_config.cohort,
-                                            job_results_filters=self.pipeline_config.job_results)
-
-                for d in self.docs:
-                    doc_id = d[util.solr_report_id_field]
-                    if util.use_memory_caching == "true":
-                        k = keys.hashkey(doc_id)
-                        document_cache[k] = d
-                    if util.use_redis_caching == "true":
-                        util.write_to_redis_cache("doc:" + doc_id, json.dumps(d))
+                self.docs = self.query_documents()
+
+                if self.solr_fields is None:
+                    # only whole documents go in the shared document cache, other tasks may read any field
+                    cache_documents(self.docs)
                 jobs.update_job_status(str(self.job), util.conn_string, jobs.IN_PROGRESS,
                                        "Running %s main task" % self.task_name)
+                self.result_writer = BufferedResultWriter(client, self.pipeline_config)
                 self.run_custom_task(temp_file, client)
+                # results must be in Mongo before the output target is committed
+                self.close_result_writer()
                 temp_file.write("Done writing custom task!")
 
             self.docs = list()
@@ -274,6 +419,52 @@ class BaseTask(luigi.Task):
             traceback.print_exc(file=sys.stderr)
             jobs.update_job_status(str(self.job), util.conn_string, jobs.WARNING, ''.join(traceback.format_stack()))
             print(ex)
+            try:
+                self.close_result_writer()
+            except Exception as flush_ex:
+                print(flush_ex)
+            if isinstance(ex, BulkWriteError):
+                # results are missing, so the task fails and Luigi runs the batch again
+                raise
+        finally:
+            self.report_connection_counts(pg_counts)
+            # Luigi worker processes exit without running atexit handlers
+            jobs.flush_job_status()
+            util.flush_cache_counts()
+
+    def query_documents(self):
+        query_args = dict(solr_url=util.solr_url, tags=self.pipeline_config.report_tags,
+                          mapper_inst=util.report_mapper_inst, mapper_url=util.report_mapper_url,
+                          mapper_key=util.report_mapper_key, types=self.pipeline_config.report_types,
+                          sources=self.pipeline_config.sources, filter_query=self.pipeline_config.filter_query,
+                          cohort_ids=self.pipeline_config.cohort,
+                          job_results_filters=self.pipeline_config.job_results, fields=self.solr_fields)
+        if self.partition_count > 1:
+            return list(solr_data.query_stream(self.solr_query, rows=int(util.row_count), partition=self.partition,
+                                               partitions=self.partition_count, **query_args))
+        return solr_data.query(self.solr_query, rows=util.row_count, start=self.start, **query_args)
+
+    def close_result_writer(self):
+        if not self.result_writer:
+            return
+        writer = self.result_writer
+        self.result_writer = None
+        try:
+            writer.close()
+        finally:
+            # recorded when the last flush fails too
+            if writer.flush_count > 0:
+                jobs.update_job_status(str(self.job), util.conn_string,
+                                       jobs.STATS + "_" + self.task_name.upper() + "_BATCH_" + str(self.batch) +
+                                       "_MONGO_WRITES", json.dumps(writer.stats()))
+
+    def report_connection_counts(self, start_counts):
+        # the pool counts per process, so each batch reports what it used and the job's totals are summed from these
+        used = connection_pool.counts_since(start_counts)
+        if any(v > 0 for v in used.values()):
+            jobs.update_job_status(str(self.job), util.conn_string,
+                                   jobs.STATS + "_" + self.task_name.upper() + "_BATCH_" + str(self.batch) +
+                                   jobs.PG_CONNECTIONS_STATS, json.dumps(used))
 
     def output(self):
         return luigi.LocalTarget("%s/pipeline_job%s_%s_batch%s.txt" % (util.tmp_dir, str(self.job), self.task_name,
@@ -283,8 +474,7 @@ class BaseTask(luigi.Task):
         self.task_name = name
 
     def write_result_data(self, temp_file, mongo_client, doc, data: dict, prefix: str = ''):
-        inserted = pipeline_mongo_writer(mongo_client, self.pipeline, self.task_name, self.job, self.batch,
-                                         self.pipeline_config, doc, data, prefix=prefix)
+        inserted = self._write_result(mongo_client, doc, data, prefix)
         if temp_file is not None:
             temp_file.write(str(inserted))
             temp_file.write('\n')
@@ -293,8 +483,7 @@ class BaseTask(luigi.Task):
     def write_multiple_result_data(self, temp_file, mongo_client, doc, data: list, prefix: str = ''):
         ids = list()
         for d in data:
-            inserted = pipeline_mongo_writer(mongo_client, self.pipeline, self.task_name, self.job, self.batch,
-                                             self.pipeline_config, doc, d, prefix=prefix)
+            inserted = self._write_result(mongo_client, doc, d, prefix)
             ids.append(inserted)
             if temp_file is not None:
                 temp_file.write(str(inserted))
@@ -302,6 +491,17 @@ class BaseTask(luigi.Task):
 
         return ids
 
+    def _write_result(self, mongo_client, doc, data: dict, prefix: str = ''):
+        if not self.result_writer:
+            return pipeline_mongo_writer(mongo_client, self.pipeline, self.task_name, self.job, self.batch,
+                                         self.pipeline_config, doc, data, prefix=prefix)
+
+        data_fields = build_pipeline_result(self.pipeline, self.task_name, self.job, self.batch,
+                                            self.pipeline_config, doc, data, prefix=prefix)
+        if not data_fields:
+            return None
+        return self.result_writer.add(data_fields)
+
     def write_log_data(self, job_status, status_message):
         jobs.update_job_status(str(self.job), util.conn_string, job_status, status_message)
 
@@ -334,9 +534,43 @@ class BaseTask(luigi.Task):
     def get_string(self, key, default=''):
         return get_config_string(self.pipeline_config, key, default=default)
 
+    def get_analyzed_document(self, doc, sections=False) -> AnalyzedDocument:
+        return document_analysis(doc, sections=sections)
+
+    def get_analyzed_documents(self, docs=None, batch_size=segmentation.DEFAULT_BATCH_SIZE, n_process=1,
+                               sections=False):
+        if docs is None:
+            docs = self.docs
+        return documents_analysis(docs, batch_size=batch_size, n_process=n_process, sections=sections)
+
+    def algorithm_config(self):
+        return canonical_config(self.pipeline_config)
+
+    def memoized_results(self, compute, docs=None, sections=False):
+        """
+        (doc, analysis, results) for each doc, where results is compute(doc, analysis) or what it returned for a doc
+        with the same text in any earlier run of this task with the same algorithm_version and algorithm_config().
+        Results are cached, so they must not depend on anything in the doc besides its text and must be plain data
+        (dicts, lists, strings and numbers). Add report dates and the like after they are returned. With
+        sections=True the analyses include the sections, see get_analyzed_documents.
+        """
+        if self.algorithm_version is None:
+            raise ValueError('%s has no algorithm_version, it is needed to memoize its results' % self.task_name)
+        if docs is None:
+            docs = self.docs
+        analyses = self.get_analyzed_documents(docs, sections=sections)
+        results = memoize_results(self.task_name, self.algorithm_version, self.algorithm_config(), analyses,
+                                  lambda i: compute(docs[i], analyses[i]))
+        return list(zip(docs, analyses, results))
+
     def get_document_sentences(self, doc):
         return document_sentences(doc)
 
+    def get_documents_sentences(self, docs=None, batch_size=segmentation.DEFAULT_BATCH_SIZE, n_process=1):
+        if docs is None:
+            docs = self.docs
+        return documents_sentences(docs, batch_size=batch_size, n_process=n_process)
+
     def get_document_sections(self, doc):
         names, section_texts = document_sections(doc)
         return names, section_texts
@@ -0,0 +1,31 @@
+class FakeCursor(list):
+
+    def batch_size(self, n):
+        return self
+
+
+class FakeCollection(object):
+    """
+    A phenotype_results collection over a list of documents. find supports equality and $in conditions and a
+    projection. The projections of the finds and the inserted documents are recorded.
+    """
+    name = 'phenotype_results'
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.projections = list()
+        self.inserted = list()
+
+    def find(self, query, projection=None):
+        self.projections.append(projection)
+
+        def matches(doc, key, condition):
+            if isinstance(condition, dict):
+                return doc.get(key) in condition['$in']
+            return doc.get(key) == condition
+
+        return FakeCursor({k: v for k, v in d.items() if projection is None or k in projection or k == '_id'}
+                          for d in self.docs if all(matches(d, k, v) for k, v in query.items()))
+
+    def insert_many(self, docs):
+        self.inserted.extend(docs)
@@ -0,0 +1,93 @@
+from tasks import analyzed_document
+
+
+class FakeCache(object):
+
+    def __init__(self):
+        self.values = dict()
+
+    def get_many(self, keys):
+        return {k: self.values[k] for k in keys if k in self.values}
+
+    def set_many(self, values):
+        self.values.update(values)
+
+
+class FakeSegmentation(object):
+
+    def __init__(self):
+        self.calls = list()
+
+    def parse_sentences_batch(self, texts, batch_size=None, n_process=1):
+        self.calls.append(list(texts))
+        return [[s.strip() + '.' for s in t.split('.') if len(s.strip()) > 0] for t in texts]
+
+
+def setup_fakes(monkeypatch):
+    segment = FakeSegmentation()
+    tagged = list()
+
+    def tag_sections(text):
+        tagged.append(text)
+        return ['HISTORY', 'IMPRESSION'], text.split('\n')
+
+    monkeypatch.setattr(analyzed_document, 'analysis_cache', FakeCache())
+    monkeypatch.setattr(analyzed_document, 'segment', segment)
+    monkeypatch.setattr(analyzed_document, 'tag_sections', tag_sections)
+    return segment, tagged
+
+
+def test_sentences_span_the_whole_document(monkeypatch):
+    segment, tagged = setup_fakes(monkeypatch)
+    text = 'Cough for two\nweeks. No fever.'
+
+    analysis = analyzed_document.get_analyzed_document('r1', text)
+    # segmented over the whole text, so a sentence can cross a section boundary
+    assert segment.calls == [[text]]
+    assert analysis.sentences == ['Cough for two\nweeks.', 'No fever.']
+    assert analysis.sentence_offsets == [0, 21]
+    assert not analysis.has_sections() and tagged == []
+
+    # the cached analysis gets its sections when a task asks for them
+    analysis = analyzed_document.get_analyzed_document('r1', text, sections=True)
+    assert segment.calls[1:] == [['Cough for two', 'weeks. No fever.']]
+    assert analysis.section_names == ['HISTORY', 'IMPRESSION']
+    assert analysis.section_offsets == [0, 14]
+    assert analysis.section_sentences() == [['Cough for two.'], ['weeks.', 'No fever.']]
+    assert analysis.sentences == ['Cough for two\nweeks.', 'No fever.']
+
+
+def test_precomputed_sentences_skip_section_tagging(monkeypatch):
+    segment, tagged = setup_fakes(monkeypatch)
+    text = 'Cough. No fever.'
+
+    analysis = analyzed_document.get_analyzed_document('r2', text, sentences=['Cough.', 'No fever.'])
+    assert analysis.sentence_offsets == [0, 7]
+    assert segment.calls == [] and tagged == []
+
+
+def test_cached_analysis_keeps_spans_not_text(monkeypatch):
+    setup_fakes(monkeypatch)
+    text = 'Cough for two\nweeks. No  fever.'
+
+    analysis = analyzed_document.get_analyzed_document('r3', text, sentences=['Cough for two weeks.', 'unplaced'],
+                                                       sections=True)
+    cached = analysis.to_dict()
+    assert 'text' not in cached and cached['sentences']['texts'] == ['unplaced']
+
+    loaded = analyzed_document.AnalyzedDocument.from_dict(cached, text)
+    assert loaded.sentences == ['Cough for two weeks.', 'unplaced']
+    assert loaded.sentence_offsets == [0, -1]
+    assert loaded.section_texts == analysis.section_texts
+    assert loaded.section_sentences() == analysis.section_sentences()
+
+
+def test_decoded_segmentation_is_not_searched_again(monkeypatch):
+    setup_fakes(monkeypatch)
+    monkeypatch.setattr(analyzed_document, 'find_spans', None)
+    text = 'Cough. No fever.'
+
+    sentences, _, _ = analyzed_document.decode_segmentation(text, [0, 6, 7, 16], None)
+    analysis = analyzed_document.get_analyzed_document('r4', text, sentences=sentences)
+    assert analysis.sentences == ['Cough.', 'No fever.']
+    assert analysis.sentence_offsets == [0, 7]
@@ -1,4 +1,5 @@
 from algorithms import Context, Temporality, Experiencer, Negation
+from algorithms.context.context import build_eval_sentence
 
 ctxt = Context()
 
@@ -28,3 +29,26 @@ def test_experiencer():
     c = ctxt.run_context("heart attack", "FAMILY HISTORY: grandmother recently suffered heart attack")
     assert c is not None
     assert c.experiencier == Experiencer.Other
+
+
+def test_batch_matches_single():
+    sentence = "He has had signs of nausea and vomiting for the past 2 weeks, no fever"
+    terms = ["nausea", "fever", "nausea"]
+    history_rules = len(ctxt.terms["historical"])
+    batch = ctxt.run_context_batch(terms, sentence)
+    assert len(batch) == len(terms)
+    for term, c in zip(terms, batch):
+        single = ctxt.run_context(term, sentence)
+        assert (c.temporality, c.experiencier, c.negex) == (single.temporality, single.experiencier, single.negex)
+    # period rules found in a sentence must not leak into the shared trigger list
+    assert len(ctxt.terms["historical"]) == history_rules
+
+
+def test_category_pattern_matches_like_its_rules():
+    sentences = ["No evidence of pneumonia.", "Mother had breast cancer.", "Patient is well.",
+                 "If fever develops, call.", "History of hypertension."]
+    for key, rules in ctxt.rules.items():
+        for sentence in sentences:
+            eval_sentence = build_eval_sentence(sentence, 'x')
+            any_rule = any(r.regex.search(eval_sentence) for r in rules)
+            assert bool(ctxt.patterns[key].search(eval_sentence)) == any_rule, (key, sentence)
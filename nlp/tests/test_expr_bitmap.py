@@ -0,0 +1,32 @@
+from data_access import expr_bitmap, expr_eval
+from tests.fakes import FakeCollection
+
+
+def test_bitmap_logic_expr():
+    docs = [{'_id': i, 'job_id': 1, 'nlpql_feature': f, 'subject': s} for i, (f, s) in enumerate([
+        ('hasFever', 'a'), ('hasCough', 'a'), ('hasRigors', 'a'),
+        ('hasFever', 'b'), ('hasFever', 'b'), ('hasCough', 'b'),
+        ('hasFever', 'c'), ('hasRigors', 'c'),
+        ('hasCough', 'd')])]
+    collection = FakeCollection(docs)
+
+    def groups(expression):
+        expr_obj = expr_eval.ExpressionObject(expr_eval.EXPR_TYPE_LOGIC, 'result', expression, 0)
+        return expr_bitmap.evaluate_expression(expr_obj, 1, 'subject', collection).group_list
+
+    assert groups('( hasFever AND hasCough )') == [[0, 1], [3, 4, 5]]
+    assert groups('( hasFever OR hasRigors )') == [[0, 2], [3, 4], [6, 7]]
+    # documents of negated features are not kept
+    assert groups('( hasFever AND NOT hasRigors )') == [[3, 4]]
+    assert groups('( ( hasFever AND hasCough ) AND NOT hasRigors )') == [[3, 4, 5]]
+
+
+def test_normalize_expression():
+    normal = expr_eval.normalize_expression
+    assert normal('hasCough AND hasFever') == '(and hasCough hasFever)'
+    assert normal('( hasFever AND hasCough )') == normal('hasCough AND hasFever')
+    assert normal('( hasFever OR hasCough ) AND hasRigors') == normal('hasRigors AND ( hasCough OR hasFever )')
+    assert normal('( A AND B ) AND C') == normal('A AND ( C AND B )')
+    # the parser rewrites A NOT B as A AND NOT B
+    assert normal('hasFever AND NOT hasCough') != normal('hasCough AND NOT hasFever')
+    assert normal('hasFever AND hasCough') != normal('hasFever OR hasCough')
@@ -1,4 +1,5 @@
 from algorithms.finder import test_finder as tf
+from algorithms.finder.term_matcher import TermMatcher, compile_term
 
 def test_time_finder():
     assert tf.test_time_finder()
@@ -9,5 +10,23 @@ def test_date_finder():
 def test_size_measurement_finder():
     assert tf.test_size_measurement_finder()
 
+def test_term_matcher():
+    terms = ['heart', 'heart failure', 'CHF', 'chest pain', 'r/o', '(cardio|pulmo)nary']
+    sentence = 'Pt with chest pain, r/o heart failure; CHF and cardionary history. Heart ok.'
+    term_matcher = TermMatcher(terms)
+    expected = [(i, m.span()) for i, m in ((i, compile_term(t).search(sentence)) for i, t in enumerate(terms)) if m]
+    assert [(i, m.span()) for i, m in term_matcher.search(sentence)] == expected
+    assert [terms[i] for i, _ in term_matcher.find_all(sentence)].count('heart') == 2
 
-
+def test_finder_prefilters():
+    # a regex skipped by the prefilters must not have matched the sentence
+    from algorithms.finder import date_finder, time_finder
+    sentences = ['Seen by Omar on 3/4 at 10:30 a.m., f/u Sept 12th 2019.', 'no acute distress', '040837EST 1999-12-31',
+                 '2019-03-04T10:20:30.5 BP 120/80 5PM', '04-Mar-2019 01.02.2019 1.2.19 20190304', 'Mayo clinic - MAR']
+    for finder in [date_finder, time_finder]:
+        for sentence in sentences:
+            sentence = finder._clean_sentence(sentence)
+            passed = finder._passed_prefilters(sentence)
+            for regex, needed in zip(finder._regexes, finder._regex_prefilters):
+                if not needed <= passed:
+                    assert regex.search(sentence) is None
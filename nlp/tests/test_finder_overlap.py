@@ -0,0 +1,60 @@
+import random
+import timeit
+
+from algorithms.finder import finder_overlap as overlap
+
+
+def reference_remove_overlap(candidates):
+    # the original quadratic implementation, kept as the reference for remove_overlap
+    results = []
+    indices = list(range(len(candidates)))
+    while len(indices) > 0:
+        start_i, end_i = candidates[indices[0]].start, candidates[indices[0]].end
+        candidate_index = indices[0]
+        overlaps = [0]
+        for j in range(1, len(indices)):
+            start_j, end_j = candidates[indices[j]].start, candidates[indices[j]].end
+            if not (end_j <= start_i or start_j >= end_i):
+                overlaps.append(j)
+                if end_j - start_j > end_i - start_i:
+                    start_i, end_i = start_j, end_j
+                    candidate_index = indices[j]
+        results.append(candidates[candidate_index])
+        indices = [indices[k] for k in range(len(indices)) if k not in overlaps]
+    return results
+
+
+def random_candidates(rng, count, sentence_length):
+    candidates = list()
+    for i in range(count):
+        start = rng.randrange(sentence_length)
+        # include some empty matches, they only overlap the matches around them
+        end = min(sentence_length, start + rng.choice([0, 1, 2, 3, 5, 8, 13, 21]))
+        candidates.append(overlap.Candidate(start, end, 'c%d' % i))
+    return sorted(candidates, key=lambda x: x.end - x.start, reverse=True)
+
+
+def test_remove_overlap_matches_reference():
+    rng = random.Random(17)
+    for _ in range(2000):
+        candidates = random_candidates(rng, rng.randrange(0, 40), rng.choice([10, 50, 200]))
+        assert overlap.remove_overlap(candidates) == reference_remove_overlap(candidates)
+
+
+def test_remove_overlap_keeps_longest():
+    candidates = [overlap.Candidate(0, 10, 'March 4, 2019'), overlap.Candidate(6, 10, '2019'),
+                  overlap.Candidate(12, 15, '3/4')]
+    assert [c.match_text for c in overlap.remove_overlap(candidates)] == ['March 4, 2019', '3/4']
+
+
+def benchmark(count=500, sentence_length=2000, number=20):
+    rng = random.Random(1)
+    candidates = random_candidates(rng, count, sentence_length)
+    for name, f in [('remove_overlap', overlap.remove_overlap), ('reference', reference_remove_overlap)]:
+        seconds = timeit.timeit(lambda: f(candidates), number=number) / number
+        print('{0:>15}: {1} candidates, {2:.3f} ms'.format(name, count, seconds * 1000))
+
+
+if __name__ == '__main__':
+    for n in [50, 200, 1000]:
+        benchmark(count=n, sentence_length=n * 4)
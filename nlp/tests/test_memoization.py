@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from tasks import memoization
+
+
+class FakeCache(object):
+
+    def __init__(self):
+        self.values = dict()
+
+    def get_many(self, keys):
+        return {k: self.values[k] for k in keys if k in self.values}
+
+    def set_many(self, values):
+        self.values.update(values)
+
+
+def test_duplicate_texts_get_their_own_results(monkeypatch):
+    monkeypatch.setattr(memoization, 'memo_cache', FakeCache())
+    analyses = [SimpleNamespace(text_hash='same'), SimpleNamespace(text_hash='same')]
+
+    def run():
+        results = memoization.memoize_results('Task', '0.1', {}, analyses, lambda i: [{'term': 'cough'}])
+        # callers add document fields in place
+        for i, objs in enumerate(results):
+            objs[0]['report_id'] = i
+        return results
+
+    # computed, then read back from the cache
+    for results in (run(), run()):
+        assert [objs[0]['report_id'] for objs in results] == [0, 1]
@@ -0,0 +1,16 @@
+from data_access import mongo_indexes
+
+
+def test_plan_summary_find():
+    explain = {'queryPlanner': {'winningPlan': {
+        'stage': 'FETCH',
+        'inputStage': {'stage': 'IXSCAN', 'indexName': 'job_id_1_nlpql_feature_1_subject_1'}}}}
+    assert mongo_indexes.plan_summary(explain) == 'FETCH < IXSCAN(job_id_1_nlpql_feature_1_subject_1)'
+
+
+def test_plan_summary_aggregate():
+    # aggregate explain nests the query planner in the $cursor stage
+    explain = {'stages': [{'$cursor': {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}}},
+                          {'$group': {'_id': '$subject'}}]}
+    assert mongo_indexes.plan_summary(explain) == 'COLLSCAN'
+    assert mongo_indexes.plan_summary({}) == 'no plan'
@@ -0,0 +1,60 @@
+import threading
+from types import SimpleNamespace
+
+from data_access import PhenotypeModel
+from luigi_tools import phenotype_helper
+from tests.fakes import FakeCollection
+
+
+def test_operations_run_in_dependency_order():
+    operations = [
+        {'name': 'hasBoth', 'data_entities': ['hasFever', 'hasCough'], 'raw_text': 'hasFever AND hasCough'},
+        {'name': 'hasFever', 'data_entities': ['Temperature.value', '100.4'], 'raw_text': 'Temperature.value > 100.4'},
+        # the data entities of a NOT expression are empty, its dependencies come from the expression
+        {'name': 'hasCough', 'data_entities': [], 'raw_text': 'Cough NOT hasFever'},
+        {'name': 'other', 'data_entities': ['Sepsis'], 'raw_text': 'Sepsis'},
+    ]
+    dependencies = phenotype_helper.get_operation_dependencies(operations)
+    assert dependencies == [{1, 2}, set(), {1}, set()]
+
+    finished = list()
+    lock = threading.Lock()
+
+    def run(i):
+        with lock:
+            assert all(j in finished for j in dependencies[i])
+            finished.append(i)
+
+    phenotype_helper.run_in_dependency_order(dependencies, run, workers=4)
+    assert sorted(finished) == [0, 1, 2, 3]
+
+
+def test_pandas_operations_load_projected_results():
+    docs = [{'_id': i, 'job_id': 1, 'nlpql_feature': f, 'subject': s, 'report_id': 'r%d' % i, 'report_date': '',
+             'sentence': '', 'value': i, 'result_display': {}} for i, (f, s) in enumerate([
+                ('hasFever', '1'), ('hasCough', '1'), ('hasFever', '2'), ('hasFever', '2'), ('hasCough', '3')])]
+    phenotype = PhenotypeModel(context='Patient')
+
+    def run(action, data_entities):
+        db = SimpleNamespace(phenotype_results=FakeCollection(docs))
+        operation = {'name': 'result', 'action': action, 'data_entities': data_entities, 'raw_text': '',
+                     'final': False}
+        phenotype_helper.pandas_process_operations(db, 1, phenotype, 1, 'owner', operation)
+        assert 'result_display' not in db.phenotype_results.projections[0]
+        return db.phenotype_results.inserted
+
+    def subjects(inserted):
+        return sorted(d['subject'] for d in inserted)
+
+    assert subjects(run('AND', ['hasFever', 'hasCough'])) == ['1']
+    assert subjects(run('NOT', ['hasFever', 'hasCough'])) == ['2', '2']
+    # OR and the comparisons pick documents from the projected frame, but write them whole
+    inserted = run('OR', ['hasFever', 'hasCough'])
+    assert sorted(d['orig_id'] for d in inserted) == [0, 1, 2, 3, 4]
+    assert all('result_display' in d and d['nlpql_feature'] == 'result' for d in inserted)
+    inserted = run('>', ['hasFever.value', '1'])
+    assert subjects(inserted) == ['2', '2'] and sorted(d['value'] for d in inserted) == [2, 3]
+    assert all('result_display' in d and '_id' not in d for d in inserted)
+
+    df = phenotype_helper.results_dataframe(iter(docs), phenotype_helper.COL_LIST + ['nlpql_feature'])
+    assert str(df['nlpql_feature'].dtype) == 'category' and len(df) == len(docs)
@@ -0,0 +1,31 @@
+import json
+from types import SimpleNamespace
+
+import util
+from data_access import solr_data
+
+
+class FakeSession(object):
+
+    def __init__(self):
+        self.posted = list()
+
+    def post(self, url, headers=None, data=None):
+        self.posted.append(json.loads(data))
+        return SimpleNamespace(status_code=200, json=lambda: {'response': {'docs': []}, 'nextCursorMark': '*'})
+
+
+def test_partitioned_query_sends_partition_keys(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(util, 'http_session', lambda: session)
+    monkeypatch.setattr(util, 'solr_report_id_field', 'report_id')
+
+    list(solr_data.query_stream('*:*', solr_url='http://solr/core', partition=1, partitions=4))
+    body = session.posted[0]
+    assert '{!hash workers=4 worker=1}' in body['filter']
+    assert body['params']['partitionKeys'] == 'report_id'
+
+    list(solr_data.query_stream('*:*', solr_url='http://solr/core'))
+    body = session.posted[1]
+    assert not any(f.startswith('{!hash') for f in body.get('filter', list()))
+    assert 'partitionKeys' not in body['params']
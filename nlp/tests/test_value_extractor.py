@@ -3,3 +3,29 @@ from algorithms.value_extraction import test_value_extractor as tve
 def test_value_extractor():
     assert tve.test_value_extractor_full()
 
+
+def test_value_extractor_prepared_terms():
+    from algorithms.value_extraction import value_extractor as ve
+    terms = 'BP, HR, Temp'
+    prepared = ve.prepare_terms(terms)
+    for sentence in ['BP 120/80, HR 88, temp 98.6 F', 'HR 88 bpm, Temp: 101.2', 'no vitals']:
+        assert ve.run(prepared, sentence) == ve.run(terms, sentence)
+    enumlist = ['positive', 'negative']
+    sentence = 'Test is positive for MRSA and negative for VRE'
+    assert ve.run(ve.prepare_terms('mrsa, vre', enumlist), sentence) == ve.run('mrsa, vre', sentence,
+                                                                                  str_enumlist=enumlist)
+
+
+def test_value_extractor_threads():
+    # results must not depend on what other threads are extracting at the same time
+    from concurrent.futures import ThreadPoolExecutor
+    from algorithms.value_extraction import value_extractor as ve
+    # the same terms with different case share cleaned terms, but not original terms
+    queries = [('BP, HR', 'BP 120/80, HR 88', None), ('bp, hr', 'BP 120/80, HR 88', None),
+               ('Temp', 'HR 88 bpm, Temp: 101.2', None), ('TEMP', 'HR 88 bpm, Temp: 101.2', None),
+               ('mrsa, vre', 'Test is positive for MRSA and negative for VRE', ['positive', 'negative']),
+               ('mrsa, vre', 'Test is positive for MRSA and negative for VRE', ['Positive', 'Negative'])] * 50
+    expected = [ve.run(terms, sentence, str_enumlist=enumlist) for terms, sentence, enumlist in queries]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda q: ve.run(q[0], q[1], str_enumlist=q[2]), queries))
+    assert results == expected
@@ -1,9 +1,16 @@
 import configparser
+import os
+import threading
+import time
 from os import getenv, environ, path
+from urllib.parse import urlsplit
 
 import pymongo
 import redis
+import requests
 from pymongo import MongoClient
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 SCRIPT_DIR = path.dirname(__file__)
 config = configparser.RawConfigParser()
@@ -58,6 +65,7 @@ conn_string = "host='%s' dbname='%s' user='%s' password='%s' port=%s" % (
     read_property('NLP_PG_USER', ('pg', 'user')),
     read_property('NLP_PG_PASSWORD', ('pg', 'password')),
     str(read_property('NLP_PG_CONTAINER_PORT', ('pg', 'port'))))
+pg_pool_size = read_property('NLP_PG_POOL_SIZE', ('pg', 'pool_size'), default='5')
 mongo_host = read_property('NLP_MONGO_HOSTNAME', ('mongo', 'host'))
 mongo_port = int(read_property('NLP_MONGO_CONTAINER_PORT', ('mongo', 'port')))
 mongo_db = read_property('NLP_MONGO_DATABASE', ('mongo', 'db'))
@@ -108,6 +116,7 @@ use_precomputed_segmentation = read_property('USE_PRECOMPUTED_SEGMENTATION',
                                              ('optimizations',
                                               'use_precomputed_segmentation'),
                                              default='true')
+segmentation_mode = read_property('SEGMENTATION_MODE', ('optimizations', 'segmentation_mode'), default='full')
 use_reordered_nlpql = read_property('USE_REORDERED_NLPQL',
                                     ('optimizations', 'use_reordered_nlpql'),
                                     default='false')
@@ -115,6 +124,43 @@ use_reordered_nlpql = read_property('USE_REORDERED_NLPQL',
 use_redis_caching = read_property('USE_REDIS_CACHING',
                                   ('optimizations', 'use_redis_caching'),
                                   default='true')
+use_async_job_status = read_property('USE_ASYNC_JOB_STATUS',
+                                     ('optimizations', 'use_async_job_status'),
+                                     default='true')
+job_status_flush_seconds = read_property('JOB_STATUS_FLUSH_SECONDS',
+                                         ('optimizations', 'job_status_flush_seconds'),
+                                         default='2')
+mongo_write_buffer_size = read_property('MONGO_WRITE_BUFFER_SIZE',
+                                        ('optimizations', 'mongo_write_buffer_size'),
+                                        default='500')
+mongo_write_buffer_seconds = read_property('MONGO_WRITE_BUFFER_SECONDS',
+                                           ('optimizations', 'mongo_write_buffer_seconds'),
+                                           default='10')
+ensure_mongo_indexes = read_property('ENSURE_MONGO_INDEXES',
+                                     ('optimizations', 'ensure_mongo_indexes'),
+                                     default='true')
+use_solr_partitions = read_property('USE_SOLR_PARTITIONS',
+                                    ('optimizations', 'use_solr_partitions'),
+                                    default='false')
+phenotype_operation_workers = read_property('PHENOTYPE_OPERATION_WORKERS',
+                                            ('optimizations', 'phenotype_operation_workers'),
+                                            default='4')
+phenotype_results_memory_bytes = read_property('PHENOTYPE_RESULTS_MEMORY_BYTES',
+                                               ('optimizations', 'phenotype_results_memory_bytes'),
+                                               default='268435456')
+local_cache_bytes = read_property('LOCAL_CACHE_BYTES', ('optimizations', 'local_cache_bytes'),
+                                  default='67108864')
+cache_compress_min_bytes = read_property('CACHE_COMPRESS_MIN_BYTES', ('optimizations', 'cache_compress_min_bytes'),
+                                         default='1024')
+cache_count_flush_seconds = read_property('CACHE_COUNT_FLUSH_SECONDS',
+                                          ('optimizations', 'cache_count_flush_seconds'),
+                                          default='10')
+
+http_pool_size = read_property('HTTP_POOL_SIZE', ('http', 'pool_size'), default='20')
+http_retries = read_property('HTTP_RETRIES', ('http', 'retries'), default='3')
+http_backoff_factor = read_property('HTTP_BACKOFF_FACTOR', ('http', 'backoff_factor'), default='0.5')
+http_connect_timeout = read_property('HTTP_CONNECT_TIMEOUT', ('http', 'connect_timeout'), default='10')
+http_read_timeout = read_property('HTTP_READ_TIMEOUT', ('http', 'read_timeout'), default='300')
 
 cql_eval_url = read_property('FHIR_CQL_EVAL_URL', ('local', 'cql_eval_url'), key_name='cql_eval_url')
 fhir_data_service_uri = read_property('FHIR_DATA_SERVICE_URI', ('local', 'fhir_data_service_uri'),
@@ -131,25 +177,29 @@ fhir_terminology_user_name = read_property('FHIR_TERMINOLOGY_USER_NAME', ('local
 fhir_terminology_user_password = read_property('FHIR_TERMINOLOGY_USER_PASSWORD', ('local', 'fhir_terminology_password'),
                                                key_name='fhir_terminology_user_password')
 
-# TODO this out a bit more, this is more for experimental evaluation
+# counted in each process and added to the Redis totals every cache_count_flush_seconds, rather than an INCR per lookup
 cache_counts = {
     'compute': 0,
     'query': 0
 }
+_cache_counts_lock = threading.Lock()
+_cache_counts_flushed = time.time()
 
 try:
     redis_conn = redis.Redis(
         host=redis_hostname, port=redis_host_port, decode_responses=True)
     redis_conn.set('clarity_cache_compute', 0)
     redis_conn.set('clarity_cache_query', 0)
+    # values written by data_access.cache are compressed bytes, so they are read without decoding
+    redis_bytes_conn = redis.Redis(host=redis_hostname, port=redis_host_port)
 except Exception as ex:
     redis_conn = None
+    redis_bytes_conn = None
 
 
 def write_to_redis_cache(key, value):
     if redis_conn:
-        redis_conn.set(key, value)
-        redis_conn.expire(key, EXPIRE_TIME_SECONDS)
+        redis_conn.setex(key, EXPIRE_TIME_SECONDS, value)
 
 
 def get_from_redis_cache(key):
@@ -158,18 +208,44 @@ def get_from_redis_cache(key):
     return None
 
 
-def add_cache_compute_count():
-    if redis_conn:
-        redis_conn.incr('clarity_cache_compute', 1)
+def flush_cache_counts():
+    global _cache_counts_flushed
+    with _cache_counts_lock:
+        compute, query = cache_counts['compute'], cache_counts['query']
+        cache_counts['compute'] = 0
+        cache_counts['query'] = 0
+        _cache_counts_flushed = time.time()
+    if redis_conn and (compute > 0 or query > 0):
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.incr('clarity_cache_compute', compute)
+            pipe.incr('clarity_cache_query', query)
+            pipe.execute()
+        except Exception as ex:
+            print(ex)
 
 
-def add_cache_query_count():
-    if redis_conn:
-        redis_conn.incr('clarity_cache_query', 1)
+def _add_cache_count(name, count):
+    if count <= 0:
+        return
+    with _cache_counts_lock:
+        cache_counts[name] += count
+        due = time.time() - _cache_counts_flushed >= _float_property(cache_count_flush_seconds, 10.0)
+    if due:
+        flush_cache_counts()
+
+
+def add_cache_compute_count(count=1):
+    _add_cache_count('compute', count)
+
+
+def add_cache_query_count(count=1):
+    _add_cache_count('query', count)
 
 
 def get_cache_compute_count():
     if redis_conn:
+        flush_cache_counts()
         return redis_conn.get('clarity_cache_compute')
     else:
         return 0
@@ -177,6 +253,7 @@ def get_cache_compute_count():
 
 def get_cache_query_count():
     if redis_conn:
+        flush_cache_counts()
         return redis_conn.get('clarity_cache_query')
     else:
         return 0
@@ -240,3 +317,109 @@ def mongo_client(host=None, port=None, username=None, password=None):
         # print('unauthenticated mongo')
         _mongo_client = MongoClient(host, port)
     return _mongo_client
+
+
+def _float_property(prop, default):
+    try:
+        return float(prop)
+    except (TypeError, ValueError):
+        return default
+
+
+def _int_property(prop, default):
+    try:
+        return int(prop)
+    except (TypeError, ValueError):
+        return default
+
+
+def endpoint_name(url):
+    # scheme, host and path only; query strings may carry api keys
+    parts = urlsplit(url)
+    return '%s://%s%s' % (parts.scheme, parts.netloc, parts.path)
+
+
+_http_lock = threading.Lock()
+_http_session = None
+_http_pid = None
+_http_stats = dict()
+
+
+def _record_http_call(endpoint, seconds, error):
+    with _http_lock:
+        stats = _http_stats.get(endpoint)
+        if stats is None:
+            stats = {'requests': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            _http_stats[endpoint] = stats
+        stats['requests'] += 1
+        if error:
+            stats['errors'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+
+class HttpSession(requests.Session):
+    """
+    requests.Session with a default timeout and per-endpoint latency and error counts.
+    """
+
+    def __init__(self, timeout=None):
+        super(HttpSession, self).__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        endpoint = endpoint_name(url)
+        start = time.time()
+        try:
+            response = super(HttpSession, self).request(method, url, **kwargs)
+        except requests.RequestException:
+            _record_http_call(endpoint, time.time() - start, True)
+            raise
+        _record_http_call(endpoint, time.time() - start, response.status_code >= 400)
+        return response
+
+
+def _retry_policy():
+    retry_args = dict(total=_int_property(http_retries, 3), backoff_factor=_float_property(http_backoff_factor, 0.5),
+                      status_forcelist=(429, 502, 503, 504), raise_on_status=False)
+    # Read errors and retryable statuses are only retried for urllib3's default idempotent methods (GET, PUT, DELETE
+    # and so on). A POST, such as creating an OHDSI cohort or running CQL, may already have taken effect when the
+    # response is lost, so POSTs are only retried when the connection couldn't be made.
+    return Retry(**retry_args)
+
+
+def http_session():
+    """
+    The process-wide HTTP session, with pooled keep-alive connections, retries with backoff and default timeouts
+    from the [http] section of project.cfg. A new session is created after a fork, so worker processes never share
+    sockets with their parent.
+    """
+    global _http_session, _http_pid
+    pid = os.getpid()
+    if _http_session is not None and _http_pid == pid:
+        return _http_session
+
+    with _http_lock:
+        if _http_session is None or _http_pid != pid:
+            pool_size = _int_property(http_pool_size, 20)
+            session = HttpSession(timeout=(_float_property(http_connect_timeout, 10.0),
+                                           _float_property(http_read_timeout, 300.0)))
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=_retry_policy())
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if _http_pid != pid:
+                _http_stats.clear()
+            _http_session = session
+            _http_pid = pid
+        return _http_session
+
+
+def get_http_stats():
+    with _http_lock:
+        stats = dict()
+        for endpoint, s in _http_stats.items():
+            stats[endpoint] = dict(s)
+            stats[endpoint]['avg_seconds'] = s['total_seconds'] / s['requests'] if s['requests'] > 0 else 0.0
+        return stats